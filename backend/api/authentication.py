@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+SHARED_KEY = 'auth_token:{}'
+USER_VERSION_KEY = 'auth_user_version:{}'
+JWT_KEY = 'jwt:{}'
+
+
+class TokenCache:
+    """
+    LRU «ключ токена → (пользователь, токен)» в памяти процесса
+    с ограниченным размером и временем жизни записей, при
+    AUTH_TOKEN_SHARED_CACHE — ещё и в общем кеше. Тогда запись из
+    памяти действует, пока не сменилась версия пользователя в общем
+    кеше, поэтому выход и деактивация видны всем процессам сразу.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._items = OrderedDict()
+
+    @staticmethod
+    def shared_key(key):
+        return SHARED_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+    @staticmethod
+    def user_version(user_id):
+        if not settings.AUTH_TOKEN_SHARED_CACHE:
+            return None
+        return cache.get(USER_VERSION_KEY.format(user_id))
+
+    @staticmethod
+    def copy(value):
+        """Каждый запрос получает свой экземпляр пользователя."""
+
+        user, token = value
+        return copy.copy(user), token
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+        if item is not None:
+            expires, version, value = item
+            if (expires > time.monotonic()
+                    and version == self.user_version(value[0].id)):
+                return self.copy(value)
+            with self._lock:
+                if self._items.get(key) is item:
+                    del self._items[key]
+        if settings.AUTH_TOKEN_SHARED_CACHE:
+            value = cache.get(self.shared_key(key))
+            if value is not None:
+                self._store(key, value)
+                return self.copy(value)
+        return None
+
+    def _store(self, key, value):
+        version = self.user_version(value[0].id)
+        with self._lock:
+            self._items[key] = (
+                time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL,
+                version,
+                value,
+            )
+            self._items.move_to_end(key)
+            while len(self._items) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._items.popitem(last=False)
+
+    def set(self, key, value):
+        self._store(key, value)
+        if settings.AUTH_TOKEN_SHARED_CACHE:
+            cache.set(
+                self.shared_key(key), value, settings.AUTH_TOKEN_CACHE_TTL
+            )
+        return self.copy(value)
+
+    def discard_user(self, user_id, keys=()):
+        """
+        Записи пользователя: найденные в памяти и переданные ключи.
+        Новая версия пользователя сбрасывает его записи в памяти
+        других процессов.
+        """
+
+        with self._lock:
+            keys = {*keys, JWT_KEY.format(user_id), *(
+                key for key, (_, _, (user, _)) in self._items.items()
+                if user.id == user_id
+            )}
+            for key in keys:
+                self._items.pop(key, None)
+        if settings.AUTH_TOKEN_SHARED_CACHE:
+            # Версия живёт не меньше записей в памяти процессов.
+            cache.set(
+                USER_VERSION_KEY.format(user_id), uuid.uuid4().hex,
+                settings.AUTH_TOKEN_CACHE_TTL,
+            )
+            cache.delete_many([self.shared_key(key) for key in keys])
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к БД на повторных запросах:
+    пользователь берётся из token_cache.
+    """
+
+    def authenticate_credentials(self, key):
+        if settings.AUTH_TOKEN_CACHE_TTL <= 0:
+            return super().authenticate_credentials(key)
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = token_cache.set(
+                key, super().authenticate_credentials(key)
+            )
+        return cached
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Подписанный токен без обращения к БД за самим токеном. Пользователь
+    с проверкой is_active берётся из token_cache по id из токена, при
+    промахе — одним запросом. Отозвать такой токен нельзя, поэтому срок
+    жизни короткий.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('В токене нет id пользователя.')
+        if settings.AUTH_TOKEN_CACHE_TTL <= 0:
+            return super().get_user(validated_token)
+        key = JWT_KEY.format(user_id)
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = token_cache.set(
+                key, (super().get_user(validated_token), None)
+            )
+        return cached[0]
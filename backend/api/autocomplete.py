@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """
+    Префиксный индекс каталога ингредиентов в памяти процесса:
+    отсортированный массив названий, поиск префикса — двоичный.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._items = None
+        self._keys = None
+
+    def _load(self):
+        with self._lock:
+            if self._items is None:
+                items = sorted(
+                    (name.casefold(), pk, name, unit)
+                    for pk, name, unit in Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit'
+                    )
+                )
+                self._keys = [item[0] for item in items]
+                self._items = items
+        return self._keys, self._items
+
+    def reset(self):
+        with self._lock:
+            self._items = None
+            self._keys = None
+
+    def search(self, query, limit):
+        keys, items = self._load()
+        query = query.casefold()
+        found = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and len(found) < limit
+               and keys[position].startswith(query)):
+            found.append(items[position])
+            position += 1
+        if len(found) < limit:
+            for item in items:
+                if query in item[0] and not item[0].startswith(query):
+                    found.append(item)
+                    if len(found) == limit:
+                        break
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in found
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def autocomplete_ingredients(query, limit):
+    """
+    До limit ингредиентов, содержащих query: сначала совпадения
+    по началу названия, затем по подстроке.
+    """
+
+    if settings.INGREDIENT_AUTOCOMPLETE_IN_MEMORY:
+        return ingredient_index.search(query, limit)
+    return list(Ingredient.objects.filter(
+        name__icontains=query
+    ).annotate(
+        rank=Case(
+            When(name__istartswith=query, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('rank', 'name').values(
+        'id', 'name', 'measurement_unit'
+    )[:limit])
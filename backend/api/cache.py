@@ -0,0 +1,174 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Version
+
+CATALOG_VERSION_KEY = 'catalog_version'
+FEED_VERSION_KEY = 'anonymous_feed_version'
+LOCAL_VERSIONS_SIZE = 10000
+
+# Ключ версии -> (момент устаревания, версия) в памяти процесса.
+local_versions = {}
+
+
+def get_version(key, cached=True):
+    """
+    Версия набора данных из таблицы api.Version (0, пока её не
+    сбрасывали). Прочитанная версия VERSION_LOCAL_TTL секунд
+    берётся из памяти процесса, если не указано cached=False.
+    """
+
+    now = time.monotonic()
+    local = local_versions.get(key)
+    if cached and local is not None and local[0] > now:
+        return local[1]
+    version = Version.objects.filter(key=key).values_list(
+        'value', flat=True
+    ).first() or 0
+    if settings.VERSION_LOCAL_TTL > 0:
+        if len(local_versions) >= LOCAL_VERSIONS_SIZE:
+            local_versions.clear()
+        local_versions[key] = (now + settings.VERSION_LOCAL_TTL, version)
+    return version
+
+
+def invalidate_versions(keys):
+    """Увеличивает версии; строка ключа создаётся при первом сбросе."""
+
+    keys = list(dict.fromkeys(keys))
+    for key in keys:
+        local_versions.pop(key, None)
+    updated = Version.objects.filter(key__in=keys).update(
+        value=F('value') + 1
+    )
+    if updated < len(keys):
+        Version.objects.bulk_create(
+            (Version(key=key, value=1) for key in keys),
+            ignore_conflicts=True,
+        )
+
+
+def bump_version(key, expected):
+    """
+    Увеличивает версию, только если она всё ещё равна expected
+    (UPDATE ... WHERE value = expected). Возвращает False, если
+    версию успел сменить другой процесс.
+    """
+
+    local_versions.pop(key, None)
+    if Version.objects.filter(key=key, value=expected).update(
+        value=F('value') + 1
+    ):
+        return True
+    if expected:
+        return False
+    _, created = Version.objects.get_or_create(
+        key=key, defaults={'value': 1}
+    )
+    return created
+
+
+def etag_matches(request, etag):
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    return etag in if_none_match or '*' in if_none_match
+
+
+def cache_catalog_response(method):
+    """
+    Кеширование ответов справочников (теги, ингредиенты): сильный ETag
+    от версии каталога и адреса запроса, 304 без обращения к ORM и
+    готовые байты JSON в кеше 'catalog'.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = hashlib.md5(
+            f'{get_version(CATALOG_VERSION_KEY)}:'
+            f'{request.get_full_path()}'.encode()
+        ).hexdigest()
+        etag = f'"{key}"'
+        if etag_matches(request, etag):
+            response = HttpResponse(status=304)
+        else:
+            payload = caches['catalog'].get(key)
+            if payload is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                payload = JSONRenderer().render(response.data)
+                caches['catalog'].set(key, payload)
+            response = HttpResponse(
+                payload, content_type='application/json'
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f'public, max-age={settings.CATALOG_CACHE_MAX_AGE}'
+        )
+        return response
+    return wrapper
+
+
+def normalized_query(request):
+    """Параметры запроса в постоянном порядке, пустые отброшены."""
+
+    return urlencode(sorted(
+        (name, value) for name in request.query_params
+        for value in request.query_params.getlist(name) if value
+    ))
+
+
+def cache_anonymous_feed(method):
+    """
+    Кеш ответов ленты для анонимных запросов. Ключ — версия ленты
+    и нормализованный запрос, поэтому ?tags=b&tags=a и ?tags=a&tags=b
+    попадают в одну запись. Запись свежая ANONYMOUS_FEED_CACHE_TTL
+    секунд, ещё ANONYMOUS_FEED_STALE_TTL отдаётся устаревшей, пока
+    один запрос её пересчитывает. Запись рецепта меняет версию.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        ttl = settings.ANONYMOUS_FEED_CACHE_TTL
+        stale_ttl = settings.ANONYMOUS_FEED_STALE_TTL
+        if (ttl <= 0 or request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return method(self, request, *args, **kwargs)
+        key = 'anonymous_feed:' + hashlib.md5(
+            f'{get_version(FEED_VERSION_KEY)}:'
+            f'{request.build_absolute_uri(request.path)}?'
+            f'{normalized_query(request)}'.encode()
+        ).hexdigest()
+        cached = cache.get(key)
+        if cached is not None:
+            payload, created = cached
+            if (time.time() - created < ttl
+                    or not cache.add(f'{key}:refresh', 1, stale_ttl)):
+                return anonymous_feed_response(payload, ttl, stale_ttl)
+        response = method(self, request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        if hasattr(response, 'data'):
+            payload = JSONRenderer().render(response.data)
+        else:
+            payload = response.content
+        cache.set(key, (payload, time.time()), ttl + stale_ttl)
+        cache.delete(f'{key}:refresh')
+        return anonymous_feed_response(payload, ttl, stale_ttl)
+    return wrapper
+
+
+def anonymous_feed_response(payload, ttl, stale_ttl):
+    response = HttpResponse(payload, content_type='application/json')
+    response['Cache-Control'] = (
+        f'public, max-age={ttl}, stale-while-revalidate={stale_ttl}'
+    )
+    return response
@@ -0,0 +1,30 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscribtion, User
+
+# Модель-связь: (модель со счётчиком, внешний ключ на неё, поле счётчика).
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Subscribtion: (User, 'author_id', 'followers_count'),
+}
+
+
+def change_counters(sender, target_ids, delta):
+    """
+    Сдвигает счётчики одним UPDATE с F(), без чтения строк,
+    поэтому параллельные изменения не теряются.
+    """
+
+    model, _, field = COUNTERS[sender]
+    model.objects.filter(id__in=target_ids).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def change_counter_for(instance, delta):
+    sender = type(instance)
+    _, foreign_key, _ = COUNTERS[sender]
+    change_counters(sender, (getattr(instance, foreign_key),), delta)
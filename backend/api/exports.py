@@ -0,0 +1,203 @@
+import csv
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from openpyxl import Workbook
+
+from api.cache import etag_matches, get_version, invalidate_versions
+from recipes.models import ShoppingListItem
+from tasks.queue import task
+
+CART_VERSION_KEY = 'shopping_cart_version:{user_id}'
+FILENAME = 'shopping_list'
+EXPORT_TASK = 'export_shopping_list'
+HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Буфер, возвращающий записанную строку, для потоковой выдачи CSV."""
+
+    def write(self, value):
+        return value
+
+
+def render_txt(rows):
+    for name, unit, amount in rows:
+        yield f'{name}: {unit}, {amount}\n'
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_json(rows):
+    separator = '['
+    for name, unit, amount in rows:
+        yield separator + json.dumps({
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        }, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+def render_xlsx(rows):
+    """
+    XLSX собирается целиком (это zip-архив), поэтому строки пишутся
+    в режиме write_only во временный файл, который затем отдаётся потоком.
+    """
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Список покупок')
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
+
+
+class ExportStorage(FileSystemStorage):
+    """
+    Закрытое хранилище выгрузок в EXPORTS_ROOT. Публичного адреса
+    у файлов нет: их отдаёт владельцу TaskViewSet.download.
+    """
+
+    @property
+    def base_location(self):
+        return settings.EXPORTS_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        return None
+
+
+export_storage = ExportStorage()
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'json': ('application/json', render_json),
+    'xlsx': (
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        render_xlsx,
+    ),
+}
+
+
+def get_cart_version(user_id, cached=True):
+    """Версия корзины пользователя, меняется при любом её изменении."""
+
+    return get_version(CART_VERSION_KEY.format(user_id=user_id), cached)
+
+
+def invalidate_cart_versions(user_ids):
+    invalidate_versions(
+        CART_VERSION_KEY.format(user_id=user_id) for user_id in user_ids
+    )
+
+
+def shopping_list_rows(user):
+    """Строки списка покупок (название, единица, сумма) из курсора БД."""
+
+    return ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'total_amount',
+    ).order_by('ingredient__name').iterator(chunk_size=CHUNK_SIZE)
+
+
+def shopping_list_etag(user_id, file_format):
+    """
+    ETag включает id пользователя: версии корзин разных пользователей
+    совпадают, а их списки — нет.
+    """
+
+    return f'"{user_id}-{get_cart_version(user_id)}-{file_format}"'
+
+
+def shopping_list_response(request, file_format):
+    """
+    Потоковая выгрузка списка покупок. Повторный запрос с совпадающим
+    If-None-Match получает 304 без обращения к базе.
+    """
+
+    content_type, render = EXPORT_FORMATS[file_format]
+    etag = shopping_list_etag(request.user.id, file_format)
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        content = render(shopping_list_rows(request.user))
+        filename = f'{FILENAME}.{file_format}'
+        if file_format == 'xlsx':
+            response = FileResponse(
+                content, as_attachment=True, filename=filename,
+                content_type=content_type,
+            )
+        else:
+            response = StreamingHttpResponse(
+                content, content_type=content_type
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename={filename}'
+            )
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def export_file_response(name):
+    """Файл выгрузки из закрытого хранилища как вложение."""
+
+    file_format = os.path.splitext(name)[1][1:]
+    response = FileResponse(
+        export_storage.open(name), as_attachment=True,
+        filename=f'{FILENAME}.{file_format}',
+        content_type=EXPORT_FORMATS[file_format][0],
+    )
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@task(EXPORT_TASK)
+def export_shopping_list(user_id, file_format):
+    """
+    Выгрузка списка покупок в закрытое хранилище. Имя файла включает
+    версию корзины из БД, поэтому неизменённая корзина не выгружается
+    заново, а изменённая в любом процессе — выгружается.
+    """
+
+    _, render = EXPORT_FORMATS[file_format]
+    name = (
+        f'{user_id}/{FILENAME}_'
+        f'{get_cart_version(user_id, cached=False)}.{file_format}'
+    )
+    if not export_storage.exists(name):
+        content = render(shopping_list_rows(user_id))
+        if file_format != 'xlsx':
+            file = tempfile.TemporaryFile()
+            for part in content:
+                file.write(part.encode())
+            file.seek(0)
+            content = file
+        with content:
+            export_storage.save(name, File(content))
+    return {'file': name}
@@ -1,16 +1,19 @@
-import base64
-
-from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from api.images import decode_base64_image, srcset
+
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(
-                base64.b64decode(imgstr),
-                name='temp.' + ext
-            )
+            data = decode_base64_image(data)
         return super().to_internal_value(data)
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """srcset с адресами WebP-миниатюр изображения."""
+
+    def to_representation(self, value):
+        return srcset(
+            getattr(value, 'name', value), self.context.get('request')
+        )
@@ -1,3 +1,4 @@
+from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import (FilterSet, filters,
                                            ModelMultipleChoiceFilter)
 from recipes.models import Ingredient, Recipe, Tag
@@ -17,6 +18,19 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
 
+class StableOrderingFilter(filters.OrderingFilter):
+    """
+    Сортировка с id последним ключом: при равных значениях
+    страницы не перемешиваются между запросами.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, '-id')
+
+
 class RecipeFilter(FilterSet):
     """Фильтр рецептов."""
 
@@ -34,10 +48,19 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = filters.CharFilter(
+        method='filter_search',
+    )
+    ordering = StableOrderingFilter(
+        fields=('pub_date', 'favorites_count', 'cooking_time'),
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ordering',
+        )
 
     def filter_is_favorited(self, queryset, _, value):
         """Проверка наличия рецепта в избранном пользователя."""
@@ -58,3 +81,11 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, _, value):
+        """Полнотекстовый поиск, результаты упорядочены по релевантности."""
+
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.search(value)
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import RecipeListSerializer
+from api.user_state import get_user_state
+from recipes.models import Recipe
+
+FRAGMENT_KEY = 'recipe_fragment:{}'
+# Поля, которые зависят от пользователя или часто меняются: они не
+# кешируются, а дописываются к фрагменту при каждом ответе.
+RECIPE_OVERLAY = ('is_favorited', 'is_in_shopping_cart', 'favorites_count')
+AUTHOR_OVERLAY = ('is_subscribed', 'recipes_count', 'followers_count')
+
+renderer = JSONRenderer()
+
+
+def fragments_enabled(request):
+    return (settings.RECIPE_FRAGMENT_CACHE_TIMEOUT > 0
+            and request.accepted_renderer.format == 'json')
+
+
+def extend(encoded, extra):
+    """Дописывает поля extra в закодированный JSON-объект."""
+
+    return encoded[:-1] + b',' + renderer.render(extra)[1:]
+
+
+def build_fragment(data):
+    """JSON рецепта и отдельно автора без полей из *_OVERLAY."""
+
+    data = dict(data)
+    author = {
+        name: value for name, value in data.pop('author').items()
+        if name not in AUTHOR_OVERLAY
+    }
+    for name in RECIPE_OVERLAY:
+        data.pop(name, None)
+    return renderer.render(data), renderer.render(author)
+
+
+def get_overlay(recipe, request):
+    state = get_user_state(request)
+    author = recipe.author
+    is_favorited = getattr(recipe, 'is_favorited', None)
+    if is_favorited is None:
+        is_favorited = state.is_favorited(recipe.id)
+    is_in_shopping_cart = getattr(recipe, 'is_in_shopping_cart', None)
+    if is_in_shopping_cart is None:
+        is_in_shopping_cart = state.is_in_shopping_cart(recipe.id)
+    is_subscribed = getattr(recipe, 'author_is_subscribed', None)
+    if is_subscribed is None:
+        is_subscribed = state.is_subscribed(author.id)
+    return {
+        'is_favorited': is_favorited,
+        'is_in_shopping_cart': is_in_shopping_cart,
+        'favorites_count': recipe.favorites_count,
+    }, {
+        'is_subscribed': is_subscribed,
+        'recipes_count': author.recipes_count,
+        'followers_count': author.followers_count,
+    }
+
+
+def render_recipes(recipes, request, context):
+    """
+    JSON-массив рецептов из кеша фрагментов: сериализуются только
+    рецепты, которых нет в кеше, остальным дописываются флаги
+    текущего пользователя и счётчики.
+    """
+
+    origin = request.build_absolute_uri('/')
+    keys = {recipe.id: FRAGMENT_KEY.format(recipe.id) for recipe in recipes}
+    cached = {
+        key: value[1:] for key, value in cache.get_many(
+            list(keys.values())
+        ).items() if value[0] == origin
+    }
+    missing = [recipe for recipe in recipes if keys[recipe.id] not in cached]
+    if missing:
+        fresh = {
+            keys[recipe.id]: build_fragment(data) for recipe, data in zip(
+                missing,
+                RecipeListSerializer(missing, many=True, context=context).data
+            )
+        }
+        cache.set_many(
+            {key: (origin, *value) for key, value in fresh.items()},
+            settings.RECIPE_FRAGMENT_CACHE_TIMEOUT,
+        )
+        cached.update(fresh)
+    items = []
+    for recipe in recipes:
+        recipe_json, author_json = cached[keys[recipe.id]]
+        recipe_extra, author_extra = get_overlay(recipe, request)
+        items.append(
+            extend(recipe_json, recipe_extra)[:-1]
+            + b',"author":' + extend(author_json, author_extra) + b'}'
+        )
+    return b'[' + b','.join(items) + b']'
+
+
+def invalidate_fragments(recipe_ids):
+    if settings.RECIPE_FRAGMENT_CACHE_TIMEOUT > 0:
+        cache.delete_many([FRAGMENT_KEY.format(pk) for pk in recipe_ids])
+
+
+def invalidate_fragments_for(**lookup):
+    """Сброс фрагментов рецептов по условию, например tags=tag."""
+
+    if settings.RECIPE_FRAGMENT_CACHE_TIMEOUT <= 0:
+        return
+    invalidate_fragments(
+        Recipe.objects.filter(**lookup).values_list('id', flat=True)
+    )
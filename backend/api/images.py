@@ -0,0 +1,152 @@
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image
+from rest_framework import serializers
+
+from recipes.models import Recipe
+from recipes.storage import DIGEST_SIZE
+from tasks.queue import task
+
+# Размер порции base64 кратен 4, чтобы каждая декодировалась отдельно.
+CHUNK_SIZE = 64 * 1024 * 4
+THUMBNAILS_DIR = 'images/thumbs'
+
+
+def decode_base64_image(data):
+    """
+    Декодирует data:image/...;base64 порциями во временный файл,
+    попутно считая хеш содержимого, проверяет размеры изображения
+    по заголовку и возвращает файл с именем <хеш>.<расширение>
+    и хешем в content_digest.
+    """
+
+    header, encoded = data.split(';base64,', 1)
+    ext = header.split('/')[-1].lower()
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    file = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    try:
+        for start in range(0, len(encoded), CHUNK_SIZE):
+            chunk = base64.b64decode(
+                encoded[start:start + CHUNK_SIZE], validate=True
+            )
+            digest.update(chunk)
+            file.write(chunk)
+    except (binascii.Error, ValueError):
+        file.close()
+        raise serializers.ValidationError('Неверная кодировка изображения.')
+    file.seek(0)
+    validate_dimensions(file)
+    file.seek(0)
+    image = File(file, name=f'{digest.hexdigest()}.{ext}')
+    # Хранилище не читает файл второй раз ради того же хеша.
+    image.content_digest = digest.hexdigest()
+    return image
+
+
+def validate_dimensions(file):
+    """Проверка размеров по заголовку, без декодирования пикселей."""
+
+    try:
+        width, height = Image.open(file).size
+    except (OSError, Image.DecompressionBombError):
+        raise serializers.ValidationError(
+            'Загрузите корректное изображение.'
+        )
+    if (max(width, height) > settings.IMAGE_MAX_SIDE
+            or width * height > settings.IMAGE_MAX_PIXELS):
+        raise serializers.ValidationError(
+            f'Изображение больше допустимого: {width}x{height}.'
+        )
+
+
+def thumbnail_name(name, width):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{THUMBNAILS_DIR}/{stem}_{width}.webp'
+
+
+@task('make_thumbnails')
+def make_thumbnails(name):
+    """Уменьшенные копии изображения в WebP для всех ширин из настроек."""
+
+    missing = [
+        width for width in settings.IMAGE_THUMBNAIL_WIDTHS
+        if not default_storage.exists(thumbnail_name(name, width))
+    ]
+    if not missing:
+        return
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        image.draft('RGB', (max(missing), max(missing)))
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        for width in sorted(missing, reverse=True):
+            image.thumbnail((width, width * 4))
+            with tempfile.TemporaryFile() as thumbnail:
+                image.save(
+                    thumbnail, 'WEBP',
+                    quality=settings.IMAGE_THUMBNAIL_QUALITY, method=4,
+                )
+                thumbnail.seek(0)
+                default_storage.save(
+                    thumbnail_name(name, width), File(thumbnail)
+                )
+
+
+def schedule_thumbnails(name):
+    """
+    Генерация миниатюр воркером очереди задач или, если
+    IMAGE_THUMBNAILS_ASYNC выключен, прямо в запросе.
+    """
+
+    if settings.IMAGE_THUMBNAILS_ASYNC:
+        make_thumbnails.delay(name)
+    else:
+        make_thumbnails(name)
+
+
+def srcset(name, request=None):
+    """
+    Строка srcset из готовых миниатюр изображения. Пока воркер их
+    не построил, строка пустая и клиент показывает исходное image.
+    """
+
+    if not name:
+        return ''
+    urls = []
+    for width in settings.IMAGE_THUMBNAIL_WIDTHS:
+        thumbnail = thumbnail_name(name, width)
+        if not default_storage.exists(thumbnail):
+            continue
+        url = default_storage.url(thumbnail)
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        urls.append(f'{url} {width}w')
+    return ', '.join(urls)
+
+
+def delete_image(name):
+    """Удаляет файл изображения вместе с его миниатюрами."""
+
+    for path in (name, *(
+        thumbnail_name(name, width)
+        for width in settings.IMAGE_THUMBNAIL_WIDTHS
+    )):
+        default_storage.delete(path)
+
+
+def release_image(name):
+    """
+    Файлы общие для рецептов с одинаковым содержимым изображения,
+    поэтому удаляются, только когда на них не ссылается ни один рецепт.
+    """
+
+    if name and not Recipe.objects.filter(image=name).exists():
+        delete_image(name)
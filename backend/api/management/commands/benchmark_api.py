@@ -0,0 +1,449 @@
+import base64
+import csv
+import json
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from io import StringIO
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.exports import export_shopping_list
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import Subscribtion, User
+
+BATCH_SIZE = 5000
+PASSWORD = 'benchmark-password'
+IMAGE = 'images/temp.png'
+PIXEL = base64.b64encode(
+    bytes.fromhex(
+        '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+        '1f15c4890000000b49444154789c6360000200000500017a5eab3f00'
+        '00000049454e44ae426082'
+    )
+).decode()
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C94C', 'dessert'),
+    ('Выпечка', '#2F80ED', 'bakery'),
+    ('Суп', '#EB5757', 'soup'),
+)
+
+# Бюджет маршрута — число запросов к PostgreSQL на этих данных
+# (Case.queries) плюс BUDGET_MARGIN. Запас покрывает расхождения между
+# СУБД (в SQLite нет оценки числа строк, иначе устроены точки сохранения)
+# и мелкие правки, но меньше роста от N+1 на странице из 6 рецептов.
+# После намеренного изменения числа запросов Case.queries обновляется
+# по прогону на PostgreSQL.
+BUDGET_MARGIN = 2
+
+Case = namedtuple(
+    'Case', ('name', 'method', 'url', 'queries', 'data', 'cleanup'),
+    defaults=(None, None),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон API на синтетических данных: число запросов '
+        'к БД, задержки p50/p95 и выделенная память для каждого маршрута. '
+        'Завершается ошибкой при превышении бюджета запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Рецептов в корзине на пользователя.')
+        parser.add_argument('--subscriptions', type=int, default=15,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', dest='json_path',
+                            help='Сохранить результаты в JSON-файл.')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+                self.seed(options)
+                results = self.run_cases(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        failed = [
+            result for result in results
+            if result['queries'] > result['budget']
+        ]
+        if failed:
+            raise CommandError(
+                'Превышен бюджет запросов: ' + ', '.join(
+                    f'{result["name"]} ({result["queries"]} > '
+                    f'{result["budget"]})' for result in failed
+                )
+            )
+        return 'Все маршруты укладываются в бюджет запросов.'
+
+    def seed(self, options):
+        self.stdout.write('Заполнение базы синтетическими данными...')
+        path_to_file = f'{settings.BASE_DIR}/data/ingredients.csv'
+        with open(path_to_file, mode='r', encoding='utf-8') as csv_file:
+            Ingredient.objects.bulk_create(
+                (Ingredient(**row) for row in csv.DictReader(csv_file)),
+                batch_size=BATCH_SIZE,
+            )
+        Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in TAGS
+        )
+
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            ) for number in range(options['users'])),
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = list(User.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        self.user = User.objects.get(id=user_ids[0])
+        self.other_user = User.objects.get(id=user_ids[-1])
+
+        Recipe.objects.bulk_create(
+            (Recipe(
+                name=f'Рецепт {number}',
+                author_id=(
+                    user_ids[0] if number == 0 else random.choice(user_ids)
+                ),
+                image=IMAGE,
+                text=f'Описание рецепта {number}',
+                cooking_time=random.randint(1, 180),
+            ) for number in range(options['recipes'])),
+            batch_size=BATCH_SIZE,
+        )
+        recipe_ids = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        self.deep_page = max(1, len(recipe_ids) // 12)
+        self.own_recipe_id = recipe_ids[0]
+        self.free_recipe_id = recipe_ids[-1]
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list(
+            'id', flat=True
+        ))
+        self.ingredient_ids = ingredient_ids
+        self.tag_ids = tag_ids
+
+        recipe_tags = []
+        recipe_ingredients = []
+        for recipe_id in recipe_ids:
+            for tag_id in random.sample(tag_ids, random.randint(1, 3)):
+                recipe_tags.append(Recipe.tags.through(
+                    recipe_id=recipe_id, tag_id=tag_id
+                ))
+            for ingredient_id in random.sample(
+                ingredient_ids, random.randint(3, 12)
+            ):
+                recipe_ingredients.append(RecipeIngredients(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=random.randint(1, 500),
+                ))
+        Recipe.tags.through.objects.bulk_create(
+            recipe_tags, batch_size=BATCH_SIZE
+        )
+        RecipeIngredients.objects.bulk_create(
+            recipe_ingredients, batch_size=BATCH_SIZE
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            (Recipe.ingredients.through(
+                recipe_id=item.recipe_id, ingredient_id=item.ingredient_id
+            ) for item in recipe_ingredients),
+            batch_size=BATCH_SIZE,
+        )
+
+        interacting = recipe_ids[:-1]
+        authors = user_ids[1:-1]
+        favorites, cart, subscriptions = [], [], []
+        for user_id in user_ids:
+            for recipe_id in random.sample(interacting, min(
+                options['favorites'], len(interacting)
+            )):
+                favorites.append(Favorite(
+                    user_id=user_id, recipe_id=recipe_id
+                ))
+            for recipe_id in random.sample(interacting, min(
+                options['cart'], len(interacting)
+            )):
+                cart.append(ShoppingCart(
+                    user_id=user_id, recipe_id=recipe_id
+                ))
+            for author_id in random.sample(authors, min(
+                options['subscriptions'], len(authors)
+            )):
+                if author_id != user_id:
+                    subscriptions.append(Subscribtion(
+                        user_id=user_id, author_id=author_id
+                    ))
+        # Рецепт из избранного и корзины пользователя прогона: его автор
+        # и теги дают непустую выдачу со всеми фильтрами сразу.
+        self.matched_recipe_id = favorites[0].recipe_id
+        if not any(item.user_id == self.user.id
+                   and item.recipe_id == self.matched_recipe_id
+                   for item in cart):
+            cart.append(ShoppingCart(
+                user_id=self.user.id, recipe_id=self.matched_recipe_id
+            ))
+        Favorite.objects.bulk_create(favorites, batch_size=BATCH_SIZE)
+        ShoppingCart.objects.bulk_create(cart, batch_size=BATCH_SIZE)
+        # bulk_create не вызывает сигналы корзины: списки покупок
+        # собираются одним запросом по корзинам.
+        ShoppingListItem.objects.bulk_create(
+            (ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=total,
+            ) for user_id, ingredient_id, total
+                in ShoppingListItem.objects.live().iterator()),
+            batch_size=BATCH_SIZE,
+        )
+        Subscribtion.objects.bulk_create(
+            subscriptions, batch_size=BATCH_SIZE
+        )
+        call_command('build_recommendations', stdout=StringIO())
+        self.stdout.write(
+            f'Ингредиентов: {len(ingredient_ids)}, пользователей: '
+            f'{len(user_ids)}, рецептов: {len(recipe_ids)}, избранного: '
+            f'{len(favorites)}, в корзинах: {len(cart)}, подписок: '
+            f'{len(subscriptions)}.'
+        )
+
+    def get_cases(self):
+        recipe = self.own_recipe_id
+        free = self.free_recipe_id
+        author = self.other_user.id
+        tag = Tag.objects.first()
+        tags = '&'.join(
+            f'tags={slug}' for slug in Tag.objects.values_list(
+                'slug', flat=True
+            )[:3]
+        )
+        matched = Recipe.objects.get(id=self.matched_recipe_id)
+        matched_filters = '&'.join((
+            *(f'tags={slug}'
+              for slug in matched.tags.values_list('slug', flat=True)),
+            f'author={matched.author_id}',
+        ))
+        names = count()
+        task = export_shopping_list.delay(self.user.id, 'txt', user=self.user)
+
+        def recipe_data():
+            return {
+                'name': f'Новый рецепт {next(names)}',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': f'data:image/png;base64,{PIXEL}',
+                'tags': self.tag_ids[:2],
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': 10}
+                    for ingredient_id in self.ingredient_ids[:30]
+                ],
+            }
+
+        def user_data():
+            number = next(names)
+            return {
+                'email': f'new{number}@benchmark.ru',
+                'username': f'new{number}',
+                'first_name': 'Новый',
+                'last_name': 'Пользователь',
+                'password': PASSWORD,
+            }
+
+        def delete_created(client, response):
+            client.delete(f'/api/recipes/{response.data["id"]}/')
+
+        def delete_user(client, response):
+            User.objects.filter(id=response.data['id']).delete()
+
+        def undo(url):
+            return lambda client, response: client.delete(url)
+
+        def undo_batch(url, recipes):
+            return lambda client, response: client.delete(
+                url, data={'recipes': recipes}, format='json'
+            )
+
+        return (
+            Case('tags-list', 'get', '/api/tags/', 3),
+            Case('tags-detail', 'get', f'/api/tags/{tag.id}/', 2),
+            Case('ingredients-list', 'get', '/api/ingredients/', 2),
+            Case('ingredients-search', 'get',
+                 '/api/ingredients/?name=сах', 2),
+            Case('ingredients-autocomplete', 'get',
+                 '/api/ingredients/autocomplete/?name=сах', 2),
+            Case('ingredients-detail', 'get',
+                 f'/api/ingredients/{self.ingredient_ids[0]}/', 2),
+            Case('recipes-list', 'get', '/api/recipes/', 5),
+            Case('recipes-list-deep-page', 'get',
+                 f'/api/recipes/?page={self.deep_page}&limit=6', 5),
+            Case('recipes-list-cursor', 'get',
+                 '/api/recipes/?pagination=cursor&limit=6', 4),
+            Case('recipes-list-tags', 'get', f'/api/recipes/?{tags}', 6),
+            Case('recipes-list-author', 'get',
+                 f'/api/recipes/?author={author}', 5),
+            Case('recipes-list-favorited', 'get',
+                 '/api/recipes/?is_favorited=1', 5),
+            Case('recipes-list-in-cart', 'get',
+                 '/api/recipes/?is_in_shopping_cart=1', 5),
+            Case('recipes-list-all-filters', 'get',
+                 f'/api/recipes/?{matched_filters}'
+                 '&is_favorited=1&is_in_shopping_cart=1&limit=6', 6),
+            Case('recipes-search', 'get', '/api/recipes/?search=сахар', 5),
+            Case('recipes-list-ordering', 'get',
+                 '/api/recipes/?ordering=-favorites_count', 5),
+            Case('recipes-recommended', 'get', '/api/recipes/recommended/', 5),
+            Case('recipes-cookable', 'get',
+                 '/api/recipes/cookable/?ingredients='
+                 + ','.join(map(str, self.ingredient_ids[:5])), 7),
+            Case('recipes-detail', 'get', f'/api/recipes/{recipe}/', 4),
+            Case('recipes-create', 'post', '/api/recipes/', 18,
+                 recipe_data, delete_created),
+            Case('recipes-update', 'patch', f'/api/recipes/{recipe}/', 29,
+                 recipe_data),
+            Case('recipes-favorite-add', 'post',
+                 f'/api/recipes/{free}/favorite/', 4,
+                 cleanup=undo(f'/api/recipes/{free}/favorite/')),
+            Case('recipes-shopping-cart-add', 'post',
+                 f'/api/recipes/{free}/shopping_cart/', 7,
+                 cleanup=undo(f'/api/recipes/{free}/shopping_cart/')),
+            Case('recipes-favorite-batch', 'post', '/api/recipes/favorite/',
+                 3, {'recipes': [free]},
+                 undo_batch('/api/recipes/favorite/', [free])),
+            Case('recipes-shopping-cart-batch', 'post',
+                 '/api/recipes/shopping_cart/', 5, {'recipes': [free]},
+                 undo_batch('/api/recipes/shopping_cart/', [free])),
+            Case('recipes-download-shopping-cart', 'get',
+                 '/api/recipes/download_shopping_cart/', 3),
+            Case('tasks-detail', 'get', f'/api/tasks/{task.id}/', 2),
+            Case('users-list', 'get', '/api/users/', 4),
+            Case('users-create', 'post', '/api/users/', 4, user_data,
+                 delete_user),
+            Case('users-detail', 'get', f'/api/users/{author}/', 3),
+            Case('users-me', 'get', '/api/users/me/', 2),
+            Case('users-subscriptions', 'get',
+                 '/api/users/subscriptions/?recipes_limit=3', 4),
+            Case('users-subscribe', 'post',
+                 f'/api/users/{author}/subscribe/?recipes_limit=3', 7,
+                 cleanup=undo(f'/api/users/{author}/subscribe/')),
+            Case('auth-token-login', 'post', '/api/auth/token/login/', 5,
+                 {'email': self.other_user.email, 'password': PASSWORD}),
+        )
+
+    def run_cases(self, repeat):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        results = []
+        for case in self.get_cases():
+            timings = []
+            queries = 0
+            for _ in range(repeat):
+                data = case.data() if callable(case.data) else case.data
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = getattr(client, case.method)(
+                        case.url, data=data, format='json'
+                    )
+                    timings.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{case.name}: {response.status_code} '
+                        f'{getattr(response, "data", "")}'
+                    )
+                if self.is_empty(response):
+                    raise CommandError(
+                        f'{case.name}: пустая выдача, маршрут не измеряет '
+                        f'сериализацию.'
+                    )
+                queries = max(queries, len(context.captured_queries))
+                if case.cleanup:
+                    case.cleanup(client, response)
+
+            data = case.data() if callable(case.data) else case.data
+            tracemalloc.start()
+            response = getattr(client, case.method)(
+                case.url, data=data, format='json'
+            )
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if case.cleanup:
+                case.cleanup(client, response)
+
+            results.append({
+                'name': case.name,
+                'queries': queries,
+                'budget': case.queries + BUDGET_MARGIN,
+                'p50_ms': statistics.median(timings) * 1000,
+                'p95_ms': (
+                    statistics.quantiles(timings, n=20)[-1] * 1000
+                    if len(timings) > 1 else timings[0] * 1000
+                ),
+                'memory_kb': peak / 1024,
+            })
+        return results
+
+    @staticmethod
+    def is_empty(response):
+        data = getattr(response, 'data', None)
+        if isinstance(data, dict) and 'results' in data:
+            data = data['results']
+        return isinstance(data, list) and not data
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"маршрут":<32}{"запросы":>10}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"память, КБ":>12}'
+        )
+        for result in results:
+            line = (
+                f'{result["name"]:<32}'
+                f'{result["queries"]:>6}/{result["budget"]:<3}'
+                f'{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}'
+                f'{result["memory_kb"]:>12.0f}'
+            )
+            if result['queries'] > result['budget']:
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
@@ -0,0 +1,88 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from api.exports import EXPORT_TASK, export_storage
+from api.images import THUMBNAILS_DIR, delete_image, thumbnail_name
+from recipes.models import Recipe
+from tasks.models import Task
+
+IMAGES_DIR = 'images'
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаление файлов изображений и миниатюр, на которые '
+        'не ссылается ни один рецепт, и выгрузок списков покупок, '
+        'на которые не ссылается ни одна задача'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help=(
+                'Не трогать файлы моложе указанного числа секунд: '
+                'рецепт с только что загруженным изображением может '
+                'быть ещё не сохранён.'
+            ),
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        referenced = set(Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct().iterator())
+        thumbnails = {
+            thumbnail_name(name, width)
+            for name in referenced
+            for width in settings.IMAGE_THUMBNAIL_WIDTHS
+        }
+        # Задачи удаляются воркером через --keep-finished, после этого
+        # их файлы выгрузок становятся ненужными.
+        exports = {
+            result['file'] for result in Task.objects.filter(
+                name=EXPORT_TASK, status=Task.DONE
+            ).values_list('result', flat=True).iterator()
+            if result and 'file' in result
+        }
+        deadline = time.time() - options['grace']
+        removed = 0
+        for storage, directory, keep, delete in (
+            (default_storage, IMAGES_DIR, referenced, delete_image),
+            (default_storage, THUMBNAILS_DIR, thumbnails,
+             default_storage.delete),
+            *(
+                (export_storage, directory, exports, export_storage.delete)
+                for directory in self.export_directories()
+            ),
+        ):
+            # На новой установке каталогов ещё нет.
+            if not storage.exists(directory):
+                continue
+            _, files = storage.listdir(directory)
+            for filename in files:
+                name = f'{directory}/{filename}'
+                if name in keep or os.path.getmtime(
+                    storage.path(name)
+                ) > deadline:
+                    continue
+                removed += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(name)
+                if not options['dry_run']:
+                    delete(name)
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        return f'{action} неиспользуемых файлов: {removed}.'
+
+    @staticmethod
+    def export_directories():
+        """Каталоги выгрузок: по одному на пользователя."""
+
+        if not export_storage.exists(''):
+            return []
+        return export_storage.listdir('')[0]
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.images import make_thumbnails
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание недостающих WebP-миниатюр для изображений рецептов'
+
+    def handle(self, *args, **options):
+        names = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        total = 0
+        for name in names.iterator():
+            try:
+                make_thumbnails(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            total += 1
+        return f'Миниатюры проверены для {total} изображений.'
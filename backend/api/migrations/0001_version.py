@@ -0,0 +1,37 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+# Общие версии создаются сразу, остальные (корзины) — при первом сбросе.
+GLOBAL_KEYS = ('catalog_version', 'anonymous_feed_version',
+               'pantry_index_version')
+
+
+def create_global_versions(apps, schema_editor):
+    Version = apps.get_model('api', 'Version')
+    Version.objects.bulk_create(Version(key=key) for key in GLOBAL_KEYS)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Version',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'версия кеша',
+                'verbose_name_plural': 'Версии кешей',
+            },
+        ),
+        migrations.RunPython(
+            create_global_versions, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class Version(models.Model):
+    """
+    Версия набора данных для кешей (справочники, лента, корзины).
+    Хранится в БД, чтобы сброс из любого процесса видели все.
+    """
+
+    key = models.CharField(
+        max_length=200,
+        primary_key=True,
+        verbose_name='Ключ',
+    )
+    value = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия',
+    )
+
+    class Meta:
+        verbose_name = 'версия кеша'
+        verbose_name_plural = 'Версии кешей'
+
+    def __str__(self):
+        return f'{self.key}: {self.value}'
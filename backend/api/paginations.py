@@ -1,6 +1,164 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.db import estimate_count
 
 
 class CustomPagePagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_query_param = 'page'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу: следующая страница выбирается условием
+    на поля сортировки вместо OFFSET. Число записей отдаётся только
+    по запросу (?count=1), для запроса без фильтров — оценкой из
+    статистики PostgreSQL.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering, page_size=None):
+        self.ordering = ordering
+        self.page_size = page_size or api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_count(queryset)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        items = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            self.next_position = [
+                getattr(items[-1], field.lstrip('-'))
+                for field in self.ordering
+            ]
+        return items
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_count(self, queryset):
+        estimate = estimate_count(queryset)
+        if estimate is not None:
+            return estimate
+        return queryset.count()
+
+    def get_position_filter(self, position):
+        """(a, b) < (x, y) в виде a < x OR (a = x AND b < y)."""
+
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request, model):
+        """
+        Позиция из курсора; значения приводятся полями модели, чтобы
+        подделанный курсор давал 404, а не ошибку в запросе к БД.
+        """
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if (not isinstance(position, list)
+                    or len(position) != len(self.ordering)):
+                raise ValueError
+            return [
+                self.parse_value(model, field, value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def parse_value(model, field, value):
+        value = model._meta.get_field(field.lstrip('-')).to_python(value)
+        if value is None:
+            raise ValueError
+        return value
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(
+            json.dumps(position, default=str).encode()
+        ).decode()
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        )))
+
+
+class FeedPagination(CustomPagePagination):
+    """
+    Постраничная пагинация, которая переключается на пагинацию по ключу,
+    если в запросе передан cursor или pagination=cursor. Порядок,
+    заданный фильтрами (например, по релевантности поиска), сохраняется
+    в постраничном режиме; по ключу сортировка всегда по ordering.
+    """
+
+    ordering = ('-pub_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (KeysetPagination.cursor_query_param in request.query_params
+                or request.query_params.get('pagination') == 'cursor'):
+            self.keyset = KeysetPagination(self.ordering, self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        if not queryset.query.order_by:
+            queryset = queryset.order_by(*self.ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class SubscriptionPagination(FeedPagination):
+    page_size = 6
+    ordering = ('id',)
@@ -0,0 +1,140 @@
+from threading import Lock
+
+import numpy as np
+
+from api.cache import bump_version, get_version, invalidate_versions
+from recipes.models import Recipe, RecipeIngredients
+
+PANTRY_VERSION_KEY = 'pantry_index_version'
+EMPTY = np.empty(0, dtype=np.int32)
+
+
+class PantryIndex:
+    """
+    Обратный индекс «ингредиент → отсортированный массив id рецептов»
+    в памяти процесса (массивы int32), плюс число ингредиентов и время
+    приготовления каждого рецепта. Записи рецептов в этом процессе
+    обновляют индекс точечно, остальные процессы перестраивают его
+    по смене версии в общем кеше.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._postings = {}
+        self._ids = EMPTY
+        self._sizes = EMPTY
+        self._times = EMPTY
+
+    def _build(self):
+        recipes = np.array(
+            Recipe.objects.order_by('id').values_list('id', 'cooking_time'),
+            dtype=np.int32,
+        ).reshape(-1, 2)
+        pairs = np.unique(np.array(
+            RecipeIngredients.objects.values_list(
+                'ingredient_id', 'recipe_id'
+            ),
+            dtype=np.int32,
+        ).reshape(-1, 2), axis=0)
+        self._ids = recipes[:, 0].copy()
+        self._times = recipes[:, 1].copy()
+        pairs = pairs[np.isin(pairs[:, 1], self._ids)]
+        self._sizes = np.bincount(
+            np.searchsorted(self._ids, pairs[:, 1]),
+            minlength=len(self._ids),
+        ).astype(np.int32)
+        ingredients, starts = np.unique(pairs[:, 0], return_index=True)
+        self._postings = dict(zip(
+            ingredients.tolist(), np.split(pairs[:, 1], starts[1:])
+        ))
+
+    def _ensure_current(self):
+        version = get_version(PANTRY_VERSION_KEY)
+        if version != self._version:
+            self._build()
+            self._version = version
+
+    def _remove(self, recipe_id):
+        position = np.searchsorted(self._ids, recipe_id)
+        if position < len(self._ids) and self._ids[position] == recipe_id:
+            self._ids = np.delete(self._ids, position)
+            self._sizes = np.delete(self._sizes, position)
+            self._times = np.delete(self._times, position)
+        for ingredient_id, recipe_ids in self._postings.items():
+            position = np.searchsorted(recipe_ids, recipe_id)
+            if (position < len(recipe_ids)
+                    and recipe_ids[position] == recipe_id):
+                self._postings[ingredient_id] = np.delete(
+                    recipe_ids, position
+                )
+
+    def _insert(self, recipe_id, cooking_time, ingredient_ids):
+        position = np.searchsorted(self._ids, recipe_id)
+        self._ids = np.insert(self._ids, position, recipe_id)
+        self._sizes = np.insert(self._sizes, position, len(ingredient_ids))
+        self._times = np.insert(self._times, position, cooking_time)
+        for ingredient_id in ingredient_ids:
+            recipe_ids = self._postings.get(ingredient_id, EMPTY)
+            self._postings[ingredient_id] = np.insert(
+                recipe_ids, np.searchsorted(recipe_ids, recipe_id), recipe_id
+            )
+
+    def refresh(self, recipe_ids):
+        """Точечное обновление индекса после записи рецептов."""
+
+        if self._version is None:
+            invalidate_versions((PANTRY_VERSION_KEY,))
+            return
+        recipes = dict(Recipe.objects.filter(
+            id__in=recipe_ids
+        ).values_list('id', 'cooking_time'))
+        ingredients = {}
+        for recipe_id, ingredient_id in RecipeIngredients.objects.filter(
+            recipe_id__in=recipes
+        ).values_list('recipe_id', 'ingredient_id').distinct():
+            ingredients.setdefault(recipe_id, []).append(ingredient_id)
+        with self._lock:
+            # Точечная правка верна, только если индекс собран по текущей
+            # версии и никто не сменил её между чтением и увеличением.
+            version = get_version(PANTRY_VERSION_KEY, cached=False)
+            if version != self._version or not bump_version(
+                PANTRY_VERSION_KEY, version
+            ):
+                invalidate_versions((PANTRY_VERSION_KEY,))
+                self._version = None
+                return
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+                if recipe_id in recipes:
+                    self._insert(
+                        recipe_id, recipes[recipe_id],
+                        ingredients.get(recipe_id, ()),
+                    )
+            self._version = version + 1
+
+    def match(self, ingredient_ids):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов, по
+        возрастанию числа недостающих ингредиентов, затем времени
+        приготовления. Строки результата: (id рецепта, недостаёт).
+        """
+
+        with self._lock:
+            self._ensure_current()
+            postings = [
+                self._postings[pk] for pk in set(ingredient_ids)
+                if pk in self._postings
+            ]
+            if not postings:
+                return np.empty((0, 2), dtype=np.int32)
+            found, matched = np.unique(
+                np.concatenate(postings), return_counts=True
+            )
+            positions = np.searchsorted(self._ids, found)
+            missing = self._sizes[positions] - matched
+            order = np.lexsort((found, self._times[positions], missing))
+            return np.column_stack((found[order], missing[order]))
+
+
+pantry_index = PantryIndex()
@@ -1,11 +1,16 @@
+from django.db import transaction
+from django.urls import reverse
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
-from api.fields import Base64ImageField
+from api.exports import invalidate_cart_versions
+from api.fields import Base64ImageField, ImageSrcsetField
+from api.images import release_image
+from api.user_state import get_user_state
 from recipes.models import (
-    Favorite, Ingredient, Recipe,
-    RecipeIngredients, ShoppingCart, Tag)
-from users.models import Subscribtion, User
+    Ingredient, Recipe, RecipeIngredients, ShoppingListItem, Tag)
+from tasks.models import Task
+from users.models import User
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -31,19 +36,18 @@ class CustomUserSerializer(UserSerializer):
             'username',
             'first_name',
             'last_name',
-            'is_subscribed'
+            'is_subscribed',
+            'recipes_count',
+            'followers_count',
         )
 
     def get_is_subscribed(self, obj):
         """Проверка наличия подписки."""
 
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        return Subscribtion.objects.filter(
-            user=request.user,
-            author=obj
-        ).exists()
+        return get_user_state(request).is_subscribed(obj.id)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -118,6 +122,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     author = CustomUserSerializer()
     image = Base64ImageField(required=False, allow_null=True)
+    image_srcset = ImageSrcsetField(source='image')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -132,31 +137,32 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
             'text',
-            'cooking_time'
+            'cooking_time',
+            'favorites_count',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
         """Проверка наличия рецепта в избранном."""
 
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        return Favorite.objects.filter(
-            user=request.user,
-            recipe=obj
-        ).exists()
+        return get_user_state(request).is_favorited(obj.id)
 
     def get_is_in_shopping_cart(self, obj):
         """Проверка наличия рецепта в корзине."""
 
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(
-            user=request.user,
-            recipe=obj
-        ).exists()
+        return get_user_state(request).is_in_shopping_cart(obj.id)
 
 
 class RecipeListSerializer(RecipeSerializer):
@@ -173,11 +179,22 @@ class RecipeListSerializer(RecipeSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
             'text',
-            'cooking_time'
+            'cooking_time',
+            'favorites_count',
         )
 
 
+class CookableRecipeSerializer(RecipeListSerializer):
+    """Рецепт в подборке по имеющимся ингредиентам."""
+
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ('missing_ingredients',)
+
+
 class RecipeDetailSerializer(serializers.ModelSerializer):
     """Сериализатор для одного рецепта после создания."""
 
@@ -220,108 +237,151 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('author',)
 
-    def check_ingredients(self, data):
-        validated_items = []
-        existed = []
-        for item in data:
-            ingredient = Ingredient.objects.get(pk=item['id']).name
-            if ingredient in validated_items:
-                existed.append(ingredient)
-            validated_items.append(ingredient)
-        if existed:
+    def validate_ingredients(self, ingredients):
+        if not ingredients:
             raise serializers.ValidationError(
-                'Ингредиенты уже добавлены в рецепт'
+                'Необходимо добавить хотя бы 1 ингредиент.'
             )
-
-    def validate(self, data):
-        ingredients = data.get('ingredients')
-        self.check_ingredients(ingredients)
-        data['ingredients'] = ingredients
-        return data
-
-    def create_ingredients(self, ingredient_data, recipe):
-        ingredient = Ingredient.objects.get(pk=ingredient_data['id'])
-        if ingredient_data['amount'] < 1:
+        amounts = {}
+        try:
+            for item in ingredients:
+                amounts[int(item['id'])] = int(item['amount'])
+        except (KeyError, TypeError, ValueError):
             raise serializers.ValidationError(
-                'Необходимо добавить хотя бы 1 ингредиент.'
+                'Ингредиент задаётся полями id и amount.'
             )
-        if not Ingredient.objects.filter(id=ingredient.id).exists():
+        if any(amount < 1 for amount in amounts.values()):
             raise serializers.ValidationError(
-                'Ингредиента не сущетсвует.'
+                'Количество ингредиента должно быть не меньше 1.'
             )
-        RecipeIngredients.objects.create(
-            recipe=recipe,
-            ingredient=ingredient,
-            amount=ingredient_data['amount']
-        )
-        return ingredient
-
+        existing = Ingredient.objects.in_bulk(list(amounts))
+        if len(existing) != len(amounts):
+            raise serializers.ValidationError(
+                'Ингредиента не существует.'
+            )
+        names = [ingredient.name for ingredient in existing.values()]
+        if len(amounts) != len(ingredients) or len(names) != len(set(names)):
+            raise serializers.ValidationError(
+                'Ингредиенты уже добавлены в рецепт'
+            )
+        return amounts
+
+    def save_ingredients(self, recipe, amounts, current=None):
+        """
+        Приводит ингредиенты рецепта к amounts ({id ингредиента: количество})
+        пакетными запросами, затрагивая только изменившиеся строки.
+        """
+
+        current = current or {}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredients.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+            Recipe.ingredients.through.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        added = [
+            ingredient_id for ingredient_id in amounts
+            if ingredient_id not in current
+        ]
+        if added:
+            RecipeIngredients.objects.bulk_create(
+                RecipeIngredients(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=amounts[ingredient_id]
+                ) for ingredient_id in added
+            )
+            Recipe.ingredients.through.objects.bulk_create(
+                Recipe.ingredients.through(
+                    recipe=recipe, ingredient_id=ingredient_id
+                ) for ingredient_id in added
+            )
+        changed = [
+            RecipeIngredients(
+                id=row_id, amount=amounts[ingredient_id]
+            ) for ingredient_id, (row_id, amount) in current.items()
+            if ingredient_id in amounts and amounts[ingredient_id] != amount
+        ]
+        if changed:
+            RecipeIngredients.objects.bulk_update(changed, ('amount',))
+
+    @transaction.atomic
     def create(self, validated_data):
-        tags_list = []
-        ingredient_list = []
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=author, **validated_data)
-        for id in tags:
-            if id:
-                tag = Tag.objects.get(id=id)
-                tags_list.append(tag)
-        for ingredient_data in ingredients:
-            ingredient = self.create_ingredients(
-                ingredient_data,
-                recipe
-            )
-            ingredient_list.append(ingredient)
-        recipe.tags.set(tags_list)
-        recipe.ingredients.set(ingredient_list)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for tag_id in tags
+        )
+        self.save_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredient_list = []
-        ingredients = validated_data.get('ingredients')
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time',
-            instance.cooking_time
-        )
-        instance.image = validated_data.get('image', instance.image)
-        instance.tags.set(validated_data.get('tags', instance.tags))
-        RecipeIngredients.objects.filter(recipe=instance).delete()
-        for ingredient_data in ingredients:
-            ingredient = self.create_ingredients(
-                ingredient_data,
-                instance
-            )
-            ingredient_list.append(ingredient)
-
-        ingredient_list.append(ingredient)
-        instance.ingredients.set(ingredient_list)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        old_image = instance.image.name
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
         instance.save()
+        if instance.image.name != old_image:
+            transaction.on_commit(lambda: release_image(old_image))
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            # Рецепт загружен запросом ленты, ингредиенты уже в памяти.
+            current = {
+                item.ingredient_id: (item.id, item.amount)
+                for item in instance.recipe_ingredients.all()
+            }
+            self.save_ingredients(instance, ingredients, current)
+            self.update_shopping_lists(instance, ingredients, current)
         return instance
 
+    def update_shopping_lists(self, recipe, amounts, current):
+        """Переносит изменение ингредиентов в списки покупок."""
+
+        user_ids = ShoppingListItem.objects.change_recipe(recipe, {
+            ingredient_id: amount
+            for ingredient_id, (_, amount) in current.items()
+        }, amounts)
+        invalidate_cart_versions(user_ids)
+
     def to_representation(self, instance):
+        """
+        Рецепт перечитывается запросом ленты: теги и ингредиенты
+        загружаются пачкой, а флаги пользователя — подзапросами.
+        """
+
         request = self.context.get('request')
-        context = {'request': request}
-        serializer = RecipeListSerializer(instance, context=context)
-        data = serializer.data
-        data['is_favorited'] = serializer.get_is_favorited(instance)
-        data['is_in_shopping_cart'] = serializer.get_is_in_shopping_cart(
-            instance
-        )
-        return data
+        recipe = Recipe.objects.feed(request.user).get(id=instance.id)
+        return RecipeListSerializer(
+            recipe, context={'request': request}
+        ).data
 
     def validate_tags(self, tags):
-        tags_len = len(tags)
-        if tags_len == 0:
+        if not tags:
             raise serializers.ValidationError(
                 'Необходимо добавить хотя бы 1 тег.'
             )
-        if tags_len != len(set(tags)):
+        try:
+            tags = [int(tag_id) for tag_id in tags]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(
+                'Тег задаётся своим id.'
+            )
+        if len(tags) != len(set(tags)):
             raise serializers.ValidationError(
                 'Теги должны быть уникальными.'
             )
+        if len(Tag.objects.in_bulk(tags)) != len(tags):
+            raise serializers.ValidationError(
+                'Тега не существует.'
+            )
         return tags
 
 
@@ -329,6 +389,7 @@ class RecipeShortSerializer(serializers.ModelSerializer):
     """Короткий сериализатор рецепта."""
 
     image = Base64ImageField(required=False, allow_null=True)
+    image_srcset = ImageSrcsetField(source='image')
 
     class Meta:
         model = Recipe
@@ -336,23 +397,33 @@ class RecipeShortSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_srcset',
             'cooking_time'
         )
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления или удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
 class SubscriptionSerializer(CustomUserSerializer):
     """Сериализатор для подписок."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = CustomUserSerializer.Meta.fields + (
-            'recipes', 'recipes_count'
-        )
+        fields = CustomUserSerializer.Meta.fields + ('recipes',)
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'recipe_previews'):
+            return RecipeShortSerializer(obj.recipe_previews, many=True).data
         queryset = Recipe.objects.filter(author=obj)
         request = self.context.get('request')
         if request:
@@ -361,5 +432,26 @@ class SubscriptionSerializer(CustomUserSerializer):
                 queryset = queryset[:int(recipes_limit)]
         return RecipeShortSerializer(queryset, many=True).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author_id=obj.id).count()
+
+class TaskSerializer(serializers.ModelSerializer):
+    """Сериализатор статуса фоновой задачи."""
+
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = (
+            'id',
+            'name',
+            'status',
+            'result',
+            'download_url',
+            'created'
+        )
+
+    def get_download_url(self, obj):
+        if obj.status != Task.DONE or 'file' not in (obj.result or {}):
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('api:tasks-download', args=(obj.id,))
+        )
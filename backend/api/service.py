@@ -1,38 +1,129 @@
+from collections import defaultdict
 from http import HTTPStatus
 
+from django.db import connection, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from rest_framework import status
 from rest_framework.response import Response
 
-from api.serializers import RecipeShortSerializer
-from recipes.models import Recipe
+from api.counters import COUNTERS, change_counters
+from api.exports import invalidate_cart_versions
+from api.serializers import RecipeBatchSerializer, RecipeShortSerializer
+from api.user_state import USER_STATE_KINDS, invalidate_user_state
+from recipes.models import Recipe, ShoppingCart, ShoppingListItem
+
+
+def relations_changed(model, user_id, recipe_ids, sign):
+    """
+    Действия сигналов post_save/pre_delete для строк, вставленных
+    или удалённых одним SQL-запросом в обход ORM.
+    """
+
+    invalidate_user_state(USER_STATE_KINDS[model], user_id)
+    if model in COUNTERS:
+        change_counters(model, recipe_ids, sign)
+    if model is ShoppingCart:
+        ShoppingListItem.objects.add_recipes((user_id,), recipe_ids, sign)
+        invalidate_cart_versions((user_id,))
+
+
+def insert_relations(model, user_id, recipe_ids):
+    """
+    Добавляет существующие рецепты в избранное или корзину одним
+    INSERT ... ON CONFLICT DO NOTHING и возвращает id добавленных.
+    bulk_create(ignore_conflicts=True) не сообщает, какие строки
+    вставлены, поэтому запрос написан вручную.
+    """
+
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {model._meta.db_table} (user_id, recipe_id) '
+            f'SELECT %s, id FROM {Recipe._meta.db_table} '
+            f'WHERE id IN ({placeholders}) '
+            f'ON CONFLICT (user_id, recipe_id) DO NOTHING '
+            f'RETURNING recipe_id',
+            [user_id, *recipe_ids],
+        )
+        added = [row[0] for row in cursor.fetchall()]
+        if added:
+            relations_changed(model, user_id, added, 1)
+    return added
+
+
+def delete_relations(model, user_id, recipe_ids):
+    """Удаляет рецепты одним DELETE ... RETURNING, возвращает их id."""
+
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {model._meta.db_table} '
+            f'WHERE user_id = %s AND recipe_id IN ({placeholders}) '
+            f'RETURNING recipe_id',
+            [user_id, *recipe_ids],
+        )
+        removed = [row[0] for row in cursor.fetchall()]
+        if removed:
+            relations_changed(model, user_id, removed, -1)
+    return removed
 
 
 def add_recipe(self, request, pk, model):
+    if not str(pk).isdigit():
+        raise Http404
     recipe = get_object_or_404(Recipe, id=pk)
-
-    if model.objects.filter(
-            recipe=recipe,
-            user=request.user,
-    ).exists():
+    if not insert_relations(model, request.user.id, (recipe.id,)):
         return Response(status=HTTPStatus.BAD_REQUEST)
-    model.objects.create(recipe=recipe, user=request.user)
     serializer = RecipeShortSerializer(recipe)
-
-    if recipe is None:
-        return Response(status=status.HTTP_400_BAD_REQUEST)
     return Response(data=serializer.data, status=HTTPStatus.CREATED)
 
 
 def delete_recipe(self, request, pk, model):
-    recipe = get_object_or_404(Recipe, id=pk)
-    if model.objects.filter(
-            user=request.user,
-            recipe=recipe,
-    ).exists():
-        model.objects.filter(
-            user=request.user,
-            recipe=recipe,
-        ).delete()
+    if not str(pk).isdigit():
+        raise Http404
+    if delete_relations(model, request.user.id, (int(pk),)):
         return Response(status=HTTPStatus.NO_CONTENT)
+    get_object_or_404(Recipe, id=pk)
     return Response(status=HTTPStatus.BAD_REQUEST)
+
+
+def change_recipes(self, request, model):
+    """Добавление (POST) или удаление (DELETE) нескольких рецептов."""
+
+    serializer = RecipeBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    recipe_ids = serializer.validated_data['recipes']
+    if request.method == 'POST':
+        added = insert_relations(model, request.user.id, recipe_ids)
+        return Response(
+            data={'added': added},
+            status=HTTPStatus.CREATED if added else HTTPStatus.OK,
+        )
+    removed = delete_relations(model, request.user.id, recipe_ids)
+    return Response(data={'removed': removed}, status=HTTPStatus.OK)
+
+
+def attach_recipe_previews(authors, request):
+    """
+    Подставляет авторам превью рецептов (с учётом recipes_limit)
+    одним запросом на всех.
+    """
+
+    try:
+        limit = max(int(request.query_params['recipes_limit']), 0)
+    except (KeyError, ValueError):
+        limit = None
+    previews = defaultdict(list)
+    for recipe in Recipe.objects.previews(
+        (author.id for author in authors), limit
+    ):
+        previews[recipe.author_id].append(recipe)
+    for author in authors:
+        author.recipe_previews = previews[author.id]
+    return authors
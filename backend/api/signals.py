@@ -0,0 +1,222 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.autocomplete import ingredient_index
+from api.cache import (CATALOG_VERSION_KEY, FEED_VERSION_KEY,
+                       invalidate_versions)
+from api.counters import change_counter_for
+from api.exports import invalidate_cart_versions
+from api.fragments import invalidate_fragments, invalidate_fragments_for
+from api.images import release_image, schedule_thumbnails
+from api.pantry import PANTRY_VERSION_KEY, pantry_index
+from api.tasks import schedule_catalog_warmup
+from api.user_state import USER_STATE_KINDS, invalidate_user_state
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from tasks.models import Task
+from users.models import Subscribtion, User
+
+# Поля автора, которые входят во фрагмент рецепта.
+AUTHOR_FRAGMENT_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribtion)
+@receiver(post_delete, sender=Subscribtion)
+def reset_user_state(sender, instance, **kwargs):
+    """Сброс кеша состояния пользователя при изменении его связей."""
+
+    invalidate_user_state(USER_STATE_KINDS[sender], instance.user_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscribtion)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter_for(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscribtion)
+def decrement_counter(sender, instance, **kwargs):
+    change_counter_for(instance, -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def reset_cart_version(sender, instance, **kwargs):
+    """Новая версия корзины для ETag выгрузки списка покупок."""
+
+    invalidate_cart_versions((instance.user_id,))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipes(
+            (instance.user_id,), (instance.recipe_id,)
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    """
+    pre_delete срабатывает до удаления строк каскадом, поэтому
+    ингредиенты рецепта ещё доступны и при удалении самого рецепта.
+    """
+
+    ShoppingListItem.objects.add_recipes(
+        (instance.user_id,), (instance.recipe_id,), sign=-1
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_ingredient_index(sender, **kwargs):
+    ingredient_index.reset()
+
+
+@receiver(post_delete, sender=Ingredient)
+def reset_pantry_index(sender, **kwargs):
+    """Ингредиент удалён из рецептов каскадом, минуя refresh."""
+
+    invalidate_versions((PANTRY_VERSION_KEY,))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_pantry_index(sender, instance, **kwargs):
+    """
+    Ингредиенты рецепта пишутся после сохранения самого рецепта,
+    поэтому индекс обновляется после фиксации транзакции.
+    """
+
+    recipe_id = instance.id
+    transaction.on_commit(lambda: pantry_index.refresh((recipe_id,)))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_catalog_version(sender, **kwargs):
+    """Новая версия справочников: старые ETag и ответы устаревают."""
+
+    invalidate_versions((CATALOG_VERSION_KEY,))
+    schedule_catalog_warmup()
+
+
+@receiver(post_save, sender=Recipe)
+def create_thumbnails(sender, instance, created, **kwargs):
+    """
+    Миниатюры строятся после фиксации транзакции с рецептом, только
+    для новой картинки: правка текста или ингредиентов их не трогает.
+    """
+
+    name = instance.image.name
+    if name and (created or instance.image_changed()):
+        transaction.on_commit(lambda: schedule_thumbnails(name))
+    instance.remember_image()
+
+
+@receiver(post_save, sender=Task)
+def reset_thumbnail_responses(sender, instance, **kwargs):
+    """
+    Готовые миниатюры попадают в srcset: закешированные фрагменты
+    рецептов с этой картинкой и анонимная лента устаревают.
+    """
+
+    if instance.name == 'make_thumbnails' and instance.status == Task.DONE:
+        invalidate_fragments_for(image=instance.args[0])
+        invalidate_versions((FEED_VERSION_KEY,))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: release_image(name))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reset_recipe_fragment(sender, instance, **kwargs):
+    """
+    Теги и ингредиенты пишутся после сохранения рецепта, поэтому
+    фрагмент сбрасывается ещё раз после фиксации транзакции.
+    """
+
+    recipe_id = instance.id
+    invalidate_fragments((recipe_id,))
+    transaction.on_commit(lambda: invalidate_fragments((recipe_id,)))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def reset_tag_fragments(sender, instance, **kwargs):
+    invalidate_fragments_for(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def reset_ingredient_fragments(sender, instance, **kwargs):
+    invalidate_fragments_for(recipe_ingredients__ingredient=instance)
+
+
+@receiver(post_save, sender=User)
+def reset_author_fragments(sender, instance, created, update_fields,
+                           **kwargs):
+    """Вход пользователя сохраняет только last_login, его пропускаем."""
+
+    if created:
+        return
+    if update_fields is None or AUTHOR_FRAGMENT_FIELDS & set(update_fields):
+        invalidate_fragments_for(author=instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_feed_version(sender, **kwargs):
+    """
+    Новая версия анонимной ленты: закешированные страницы устаревают.
+    Версия в БД меняется в той же транзакции, что и данные.
+    """
+
+    invalidate_versions((FEED_VERSION_KEY,))
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    """Выход через djoser удаляет токены: из кеша они уходят сразу."""
+
+    token_cache.discard_user(instance.user_id, (instance.key,))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, update_fields, **kwargs):
+    """
+    Деактивация и правка профиля сбрасывают закешированного
+    пользователя; сохранение одного last_login при входе — нет.
+    """
+
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    keys = ()
+    if settings.AUTH_TOKEN_SHARED_CACHE:
+        keys = Token.objects.filter(user=instance).values_list(
+            'key', flat=True
+        )
+    token_cache.discard_user(instance.id, keys)
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import transaction
+from django.test import RequestFactory
+
+from api.views import IngredientViewSet, TagViewSet
+from tasks.queue import task
+
+CATALOG_VIEWS = (
+    ('/api/tags/', TagViewSet),
+    ('/api/ingredients/', IngredientViewSet),
+)
+# Кеши, которые видит только заполнивший их процесс.
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@task('warm_catalog_cache', max_attempts=1)
+def warm_catalog_cache():
+    """Заполняет кеш справочников после смены их версии."""
+
+    factory = RequestFactory()
+    for path, viewset in CATALOG_VIEWS:
+        viewset.as_view({'get': 'list'})(factory.get(path))
+    return {'warmed': [path for path, _ in CATALOG_VIEWS]}
+
+
+def schedule_catalog_warmup():
+    """
+    Прогрев ставится в очередь после фиксации транзакции и только при
+    общем кеше 'catalog': свой кеш воркера веб-процессам не поможет.
+    """
+
+    if settings.CACHES['catalog']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        transaction.on_commit(warm_catalog_cache.delay)
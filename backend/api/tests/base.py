@@ -0,0 +1,105 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import caches
+from django.test import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import token_cache
+from api.cache import local_versions
+from api.pantry import pantry_index
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+EXPORTS_ROOT = tempfile.mkdtemp()
+
+
+def image_data(color='red', size=(400, 300)):
+    """Картинка PNG в виде data:image/png;base64,..."""
+
+    file = BytesIO()
+    Image.new('RGB', size, color).save(file, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        file.getvalue()
+    ).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, EXPORTS_ROOT=EXPORTS_ROOT)
+class FoodgramAPITestCase(APITestCase):
+    """
+    Общие данные тестов API. Кеши и индексы в памяти процесса
+    сбрасываются перед каждым тестом: откат транзакции теста
+    возвращает версии в БД, и старые записи совпали бы с новыми.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for root in (MEDIA_ROOT, EXPORTS_ROOT):
+            shutil.rmtree(root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('user')
+        cls.author = cls.create_user('author')
+        cls.breakfast = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.dinner = Tag.objects.create(
+            name='Ужин', color='#49B64E', slug='dinner'
+        )
+        cls.egg, cls.milk, cls.flour, cls.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('яйца', 'шт'), ('молоко', 'мл'), ('мука', 'г'),
+                ('сахар', 'г'),
+            )
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        local_versions.clear()
+        with token_cache._lock:
+            token_cache._items.clear()
+        pantry_index._version = None
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username,
+            email=f'{username}@foodgram.ru',
+            first_name=username,
+            last_name=username,
+            password='Pass-1234',
+        )
+
+    def login(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return token
+
+    def create_recipe(self, name, ingredients, author=None, tags=(),
+                      cooking_time=10, text='Описание'):
+        """Рецепт с ингредиентами {ингредиент: количество}."""
+
+        recipe = Recipe.objects.create(
+            name=name,
+            author=author or self.author,
+            text=text,
+            cooking_time=cooking_time,
+            image='images/test.png',
+        )
+        recipe.tags.set(tags)
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                              amount=amount)
+            for ingredient, amount in ingredients.items()
+        )
+        recipe.ingredients.set(ingredients)
+        return recipe
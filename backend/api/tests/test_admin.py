@@ -0,0 +1,73 @@
+from http import HTTPStatus
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribtion, User
+
+
+class AdminInputFilterTests(FoodgramAPITestCase):
+    """Фильтры списков админки по введённому id, email или названию."""
+
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.ru', password='Pass-1234',
+            first_name='admin', last_name='admin',
+        )
+        self.client.force_login(admin)
+        self.omelette = self.create_recipe('Омлет', {self.egg: 3})
+        self.pancakes = self.create_recipe('Блины', {self.egg: 2})
+        self.cart = ShoppingCart.objects.create(
+            user=self.user, recipe=self.omelette
+        )
+        ShoppingCart.objects.create(user=self.author, recipe=self.pancakes)
+
+    def results(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return list(response.context['cl'].result_list)
+
+    def test_user_filter(self):
+        url = '/admin/recipes/shoppingcart/'
+        for value in (self.user.id, self.user.email, self.user.username,
+                      f' {self.user.username} '):
+            with self.subTest(value=value):
+                self.assertEqual(self.results(url, {'user': value}),
+                                 [self.cart])
+        self.assertEqual(self.results(url, {'user': 'nobody'}), [])
+        self.assertEqual(len(self.results(url, {'user': ''})), 2)
+
+    def test_recipe_filter(self):
+        url = '/admin/recipes/shoppingcart/'
+        for value in (self.omelette.id, 'Омлет'):
+            with self.subTest(value=value):
+                self.assertEqual(self.results(url, {'recipe': value}),
+                                 [self.cart])
+        self.assertEqual(self.results(url, {'recipe': 'омл'}), [])
+
+    def test_filters_combine(self):
+        Favorite.objects.create(user=self.user, recipe=self.pancakes)
+        url = '/admin/recipes/favorite/'
+        self.assertEqual(self.results(url, {
+            'user': self.user.email, 'recipe': self.omelette.id,
+        }), [])
+        response = self.client.get(url, {
+            'user': self.user.email, 'recipe': self.pancakes.id,
+        })
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+        # Поле ввода одного фильтра сохраняет значение другого.
+        self.assertContains(
+            response,
+            f'<input type="hidden" name="recipe" value="{self.pancakes.id}">',
+        )
+
+    def test_subscription_filters(self):
+        subscription = Subscribtion.objects.create(
+            user=self.user, author=self.author
+        )
+        url = '/admin/users/subscribtion/'
+        self.assertEqual(
+            self.results(url, {'author': self.author.username}),
+            [subscription],
+        )
+        self.assertEqual(self.results(url, {'user': self.author.id}), [])
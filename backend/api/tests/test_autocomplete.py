@@ -0,0 +1,63 @@
+from django.test import override_settings
+
+from api.autocomplete import ingredient_index
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Ingredient
+
+
+class IngredientAutocompleteTests(FoodgramAPITestCase):
+    """Подсказки ингредиентов: сначала по началу названия."""
+
+    url = '/api/ingredients/autocomplete/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('сахарная пудра', 'ванильный сахар', 'соль')
+        )
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.reset()
+
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        return [item['name'] for item in response.json()]
+
+    def check_ranking(self):
+        self.assertEqual(
+            self.names(name='сах'),
+            ['сахар', 'сахарная пудра', 'ванильный сахар'],
+        )
+        self.assertEqual(self.names(name='сах', limit=2), [
+            'сахар', 'сахарная пудра',
+        ])
+        self.assertEqual(self.names(name=' '), [])
+        self.assertEqual(self.names(name='сах', limit=0), [])
+
+    def test_ranking(self):
+        self.check_ranking()
+
+    @override_settings(INGREDIENT_AUTOCOMPLETE_IN_MEMORY=True)
+    def test_in_memory_ranking(self):
+        self.check_ranking()
+        self.assertEqual(self.names(name='СОЛЬ'), ['соль'])
+
+    @override_settings(INGREDIENT_AUTOCOMPLETE_IN_MEMORY=True)
+    def test_in_memory_index_follows_changes(self):
+        self.assertEqual(self.names(name='соль'), ['соль'])
+        Ingredient.objects.create(name='соль морская', measurement_unit='г')
+        self.assertEqual(self.names(name='соль'), ['соль', 'соль морская'])
+
+    def test_limit_is_capped(self):
+        with override_settings(INGREDIENT_AUTOCOMPLETE_LIMIT=1):
+            self.assertEqual(self.names(name='сах', limit=10), ['сахар'])
+
+    def test_filter_by_prefix(self):
+        response = self.client.get('/api/ingredients/', {'name': 'сах'})
+        self.assertEqual(
+            [item['name'] for item in response.json()],
+            ['сахар', 'сахарная пудра'],
+        )
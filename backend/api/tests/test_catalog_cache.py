@@ -0,0 +1,79 @@
+from http import HTTPStatus
+
+from django.test import override_settings
+
+from api.cache import (CATALOG_VERSION_KEY, get_version, invalidate_versions,
+                       local_versions)
+from api.models import Version
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Tag
+
+
+class CatalogCacheTests(FoodgramAPITestCase):
+    """ETag справочников меняется вместе с их данными."""
+
+    def test_tags_not_modified(self):
+        response = self.client.get('/api/tags/')
+        self.assertIn('public', response['Cache-Control'])
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_cached_payload(self):
+        first = self.client.get('/api/ingredients/', {'name': 'мо'}).json()
+        with self.assertNumQueries(0):
+            second = self.client.get(
+                '/api/ingredients/', {'name': 'мо'}
+            ).json()
+        self.assertEqual(first, second)
+        self.assertEqual([item['name'] for item in second], ['молоко'])
+
+    def test_tag_change_resets_cache(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        Tag.objects.create(name='Обед', color='#8775D2', slug='lunch')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('lunch', [tag['slug'] for tag in response.json()])
+
+    def test_ingredient_rename_resets_cache(self):
+        self.client.get('/api/ingredients/', {'name': 'сах'})
+        self.sugar.name = 'сахарная пудра'
+        self.sugar.save()
+        response = self.client.get('/api/ingredients/', {'name': 'сах'})
+        self.assertEqual(
+            [item['name'] for item in response.json()], ['сахарная пудра']
+        )
+
+    @override_settings(VERSION_LOCAL_TTL=0)
+    def test_version_change_in_other_process(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        # Другой процесс сбросил версию: память этого процесса не знает.
+        Version.objects.update_or_create(
+            key=CATALOG_VERSION_KEY, defaults={'value': 100}
+        )
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class VersionTests(FoodgramAPITestCase):
+    """Версии наборов данных в таблице api.Version."""
+
+    def test_invalidate_creates_and_increments(self):
+        self.assertEqual(get_version('test', cached=False), 0)
+        invalidate_versions(('test', 'test'))
+        self.assertEqual(get_version('test', cached=False), 1)
+        invalidate_versions(('test', 'other'))
+        self.assertEqual(get_version('test', cached=False), 2)
+        self.assertEqual(get_version('other', cached=False), 1)
+
+    @override_settings(VERSION_LOCAL_TTL=60)
+    def test_local_version_is_reused(self):
+        get_version('test')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_version('test'), 0)
+        Version.objects.create(key='test', value=5)
+        self.assertEqual(get_version('test'), 0)
+        self.assertEqual(get_version('test', cached=False), 5)
+        local_versions.clear()
+        self.assertEqual(get_version('test'), 5)
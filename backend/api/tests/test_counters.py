@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+class CounterTests(FoodgramAPITestCase):
+    """Денормализованные счётчики избранного, рецептов и подписчиков."""
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe('Омлет', {self.egg: 3})
+        self.login(self.user)
+
+    def reconcile(self, **options):
+        stdout, stderr = StringIO(), StringIO()
+        result = call_command(
+            'reconcile_counters', stdout=stdout, stderr=stderr, **options
+        )
+        return result, stderr.getvalue()
+
+    def test_counters(self):
+        self.client.post(f'/api/recipes/{self.omelette.id}/favorite/')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        author = self.client.get(f'/api/users/{self.author.id}/').data
+        self.assertEqual(author['recipes_count'], 1)
+        self.assertEqual(author['followers_count'], 1)
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{self.omelette.id}/').data[
+                'favorites_count'
+            ],
+            1,
+        )
+
+    def test_full_save_keeps_counters(self):
+        author = User.objects.get(id=self.author.id)
+        recipe = Recipe.objects.get(id=self.omelette.id)
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.client.post(f'/api/recipes/{self.omelette.id}/favorite/')
+        author.first_name = 'Автор'
+        author.save()
+        recipe.name = 'Фриттата'
+        recipe.save()
+        author.refresh_from_db()
+        recipe.refresh_from_db()
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.first_name, 'Автор')
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.name, 'Фриттата')
+
+    def test_ordering_by_favorites(self):
+        pancakes = self.create_recipe('Блины', {self.egg: 2})
+        Favorite.objects.create(user=self.user, recipe=pancakes)
+        Recipe.objects.filter(id=pancakes.id).update(favorites_count=1)
+        response = self.client.get(
+            '/api/recipes/', {'ordering': '-favorites_count'}
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [pancakes.id, self.omelette.id],
+        )
+
+    def test_ordering_by_cooking_time(self):
+        recipes = [
+            self.create_recipe(f'Рецепт {number}', {self.egg: 1},
+                               cooking_time=50 - number)
+            for number in range(3)
+        ]
+        response = self.client.get('/api/recipes/', {
+            'ordering': 'cooking_time', 'author': self.author.id,
+        })
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.omelette.id, *(recipe.id for recipe in reversed(recipes))],
+        )
+
+    def test_reconcile_counters(self):
+        Favorite.objects.create(user=self.user, recipe=self.omelette)
+        Recipe.objects.filter(id=self.omelette.id).update(favorites_count=5)
+        User.objects.filter(id=self.author.id).update(
+            recipes_count=0, followers_count=2
+        )
+
+        result, report = self.reconcile(dry_run=True)
+        self.assertEqual(result, 'Расхождений в счётчиках: 3.')
+        self.assertIn('favorites_count = 5, фактически 1', report)
+        self.assertEqual(
+            Recipe.objects.get(id=self.omelette.id).favorites_count, 5
+        )
+
+        result, _ = self.reconcile()
+        self.assertEqual(result, 'Исправлено счётчиков: 3.')
+        self.assertEqual(
+            Recipe.objects.get(id=self.omelette.id).favorites_count, 1
+        )
+        self.assertEqual(
+            User.objects.values_list(
+                'recipes_count', 'followers_count'
+            ).get(id=self.author.id),
+            (1, 0),
+        )
+        self.assertEqual(
+            self.reconcile()[0], 'Расхождений в счётчиках: 0.'
+        )
+
+    def test_reconcile_is_one_update_per_counter(self):
+        Recipe.objects.filter(id=self.omelette.id).update(favorites_count=5)
+        with self.assertNumQueries(6):
+            self.reconcile()
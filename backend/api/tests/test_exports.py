@@ -0,0 +1,85 @@
+import json
+from http import HTTPStatus
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import ShoppingCart
+
+
+class ShoppingListExportTests(FoodgramAPITestCase):
+    """Выгрузка списка покупок и её ETag."""
+
+    url = '/api/recipes/download_shopping_cart/'
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3, self.milk: 100}
+        )
+        self.pancakes = self.create_recipe(
+            'Блины', {self.egg: 2, self.flour: 200}
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=self.omelette)
+        self.login(self.user)
+
+    def download(self, file_format, **headers):
+        response = self.client.get(self.url, {'type': file_format}, **headers)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return b''.join(response.streaming_content)
+
+    def test_formats(self):
+        self.assertEqual(
+            self.download('txt').decode(), 'молоко: мл, 100\nяйца: шт, 3\n'
+        )
+        self.assertEqual(self.download('csv').decode().splitlines(), [
+            'Ингредиент,Единица измерения,Количество',
+            'молоко,мл,100',
+            'яйца,шт,3',
+        ])
+        self.assertEqual(json.loads(self.download('json')), [
+            {'name': 'молоко', 'measurement_unit': 'мл', 'amount': 100},
+            {'name': 'яйца', 'measurement_unit': 'шт', 'amount': 3},
+        ])
+        sheet = load_workbook(BytesIO(self.download('xlsx'))).active
+        self.assertEqual(list(sheet.values)[1:], [
+            ('молоко', 'мл', 100), ('яйца', 'шт', 3),
+        ])
+
+    def test_empty_list(self):
+        ShoppingCart.objects.all().delete()
+        self.assertEqual(json.loads(self.download('json')), [])
+
+    def test_unknown_format(self):
+        response = self.client.get(self.url, {'type': 'pdf'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_private_response(self):
+        response = self.client.get(self.url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_not_modified_until_cart_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        self.client.post(f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('мука', b''.join(response.streaming_content).decode())
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get(self.url)['ETag']
+        ShoppingCart.objects.create(user=self.author, recipe=self.pancakes)
+        self.login(self.author)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('мука', b''.join(response.streaming_content).decode())
+
+    def test_requires_login(self):
+        self.client.credentials()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribtion
+
+
+class RecipeFeedQueryTests(FoodgramAPITestCase):
+    """Лента рецептов одним набором запросов."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [
+            self.create_recipe(
+                f'Рецепт {number}', {self.egg: 1, self.milk: number + 1},
+                tags=(self.breakfast, self.dinner),
+            ) for number in range(6)
+        ]
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), int(
+            url.rsplit('=', 1)[1]
+        ))
+        return len(context.captured_queries)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        self.login(self.user)
+        self.client.get('/api/users/me/')
+        self.assertEqual(
+            self.count_queries('/api/recipes/?limit=1'),
+            self.count_queries('/api/recipes/?limit=6'),
+        )
+
+    def test_anonymous_queries_do_not_depend_on_page_size(self):
+        self.assertEqual(
+            self.count_queries('/api/recipes/?limit=1'),
+            self.count_queries('/api/recipes/?limit=6'),
+        )
+
+    def test_flags_are_annotated(self):
+        recipe = self.recipes[0]
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        Subscribtion.objects.create(user=self.user, author=self.author)
+        feed = Recipe.objects.feed(self.user)
+        self.assertEqual(
+            feed.values_list(
+                'is_favorited', 'is_in_shopping_cart', 'author_is_subscribed'
+            ).get(id=recipe.id),
+            (True, True, True),
+        )
+        self.assertEqual(
+            feed.values_list('is_favorited', flat=True).get(
+                id=self.recipes[1].id
+            ),
+            False,
+        )
+
+    def test_detail_reads_prefetched_relations(self):
+        response = self.client.get(f'/api/recipes/{self.recipes[2].id}/')
+        self.assertEqual(
+            [tag['slug'] for tag in response.data['tags']],
+            ['breakfast', 'dinner'],
+        )
+        self.assertEqual(
+            {item['name']: item['amount']
+             for item in response.data['ingredients']},
+            {self.egg.name: 1, self.milk.name: 3},
+        )
+        self.assertEqual(
+            response.data['author']['username'], self.author.username
+        )
@@ -0,0 +1,83 @@
+import time
+from unittest import mock
+
+from django.test import override_settings
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Recipe
+
+
+@override_settings(ANONYMOUS_FEED_CACHE_TTL=30, ANONYMOUS_FEED_STALE_TTL=60)
+class AnonymousFeedCacheTests(FoodgramAPITestCase):
+    """Кеш страниц ленты для анонимных запросов."""
+
+    url = '/api/recipes/'
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3}, tags=(self.breakfast, self.dinner)
+        )
+
+    def rename_quietly(self, name):
+        """Правка в обход сигналов: версия ленты не меняется."""
+
+        Recipe.objects.filter(id=self.omelette.id).update(name=name)
+
+    def names(self, response):
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_cached_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['Cache-Control'],
+            'public, max-age=30, stale-while-revalidate=60',
+        )
+        self.rename_quietly('Яичница')
+        self.assertEqual(self.names(self.client.get(self.url)), ['Омлет'])
+
+    @override_settings(ANONYMOUS_FEED_CACHE_TTL=0)
+    def test_disabled_by_default(self):
+        self.assertNotIn('public', self.client.get(self.url).get(
+            'Cache-Control', ''
+        ))
+        self.rename_quietly('Яичница')
+        self.assertEqual(self.names(self.client.get(self.url)), ['Яичница'])
+
+    def test_recipe_change_resets_pages(self):
+        self.client.get(self.url)
+        self.omelette.name = 'Яичница'
+        self.omelette.save()
+        self.assertEqual(self.names(self.client.get(self.url)), ['Яичница'])
+
+    def test_query_is_normalized(self):
+        self.client.get(self.url, {'tags': ['breakfast', 'dinner']})
+        self.rename_quietly('Яичница')
+        self.assertEqual(self.names(self.client.get(
+            self.url, {'tags': ['dinner', 'breakfast']}
+        )), ['Омлет'])
+        self.assertEqual(self.names(self.client.get(
+            self.url, {'tags': ['dinner']}
+        )), ['Яичница'])
+
+    def test_authenticated_requests_are_not_cached(self):
+        self.client.get(self.url)
+        self.rename_quietly('Яичница')
+        self.login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(self.names(response), ['Яичница'])
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+
+    def test_stale_page_while_refreshing(self):
+        self.client.get(self.url)
+        self.rename_quietly('Яичница')
+        later = time.time() + 45
+        with mock.patch('api.cache.time.time', return_value=later):
+            # Запись устарела, но её уже пересчитывает другой запрос.
+            with mock.patch('api.cache.cache.add', return_value=False):
+                self.assertEqual(
+                    self.names(self.client.get(self.url)), ['Омлет']
+                )
+            self.assertEqual(
+                self.names(self.client.get(self.url)), ['Яичница']
+            )
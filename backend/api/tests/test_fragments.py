@@ -0,0 +1,66 @@
+from django.test import override_settings
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribtion
+
+
+@override_settings(RECIPE_FRAGMENT_CACHE_TIMEOUT=60)
+class RecipeFragmentTests(FoodgramAPITestCase):
+    """Ответы из кеша фрагментов совпадают с ответами сериализатора."""
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3, self.milk: 100}, tags=(self.breakfast,)
+        )
+        self.pancakes = self.create_recipe(
+            'Блины', {self.egg: 2, self.flour: 200}, author=self.user,
+            tags=(self.breakfast, self.dinner),
+        )
+        Favorite.objects.create(user=self.user, recipe=self.omelette)
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        Subscribtion.objects.create(user=self.user, author=self.author)
+
+    def assertSameAsSerializer(self, url):
+        """Ответ без кеша, с заполнением кеша и из кеша одинаковы."""
+
+        with self.settings(RECIPE_FRAGMENT_CACHE_TIMEOUT=0):
+            expected = self.client.get(url).json()
+        self.assertEqual(self.client.get(url).json(), expected)
+        self.assertEqual(self.client.get(url).json(), expected)
+        return expected
+
+    def test_same_output(self):
+        for login in (False, True):
+            if login:
+                self.login(self.user)
+            for url in ('/api/recipes/', f'/api/recipes/{self.omelette.id}/',
+                        '/api/recipes/?pagination=cursor&limit=1'):
+                with self.subTest(url=url, login=login):
+                    self.assertSameAsSerializer(url)
+
+    def test_overlay_follows_user_state(self):
+        self.login(self.user)
+        url = f'/api/recipes/{self.omelette.id}/'
+        self.assertTrue(self.assertSameAsSerializer(url)['is_favorited'])
+        self.client.delete(f'{url}favorite/')
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        recipe = self.assertSameAsSerializer(url)
+        self.assertFalse(recipe['is_favorited'])
+        self.assertEqual(recipe['favorites_count'], 0)
+        self.assertFalse(recipe['author']['is_subscribed'])
+
+    def test_recipe_and_tag_changes_reset_fragments(self):
+        url = '/api/recipes/'
+        self.client.get(url)
+        self.login(self.user)
+        self.client.patch(
+            f'/api/recipes/{self.pancakes.id}/', {'name': 'Оладьи'},
+            format='json',
+        )
+        self.dinner.name = 'Обед'
+        self.dinner.save()
+        recipes = self.assertSameAsSerializer(url)['results']
+        self.assertEqual(recipes[0]['name'], 'Оладьи')
+        self.assertIn('Обед', [tag['name'] for tag in recipes[0]['tags']])
@@ -0,0 +1,180 @@
+import os
+import shutil
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+
+from api.images import decode_base64_image, release_image, thumbnail_name
+from api.tests.base import MEDIA_ROOT, FoodgramAPITestCase, image_data
+from recipes.models import Recipe
+from recipes.storage import content_storage
+from tasks.models import Task
+from tasks.queue import execute
+
+
+class RecipeImageTests(FoodgramAPITestCase):
+    """Загрузка картинки рецепта и её миниатюры."""
+
+    url = '/api/recipes/'
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.author)
+
+    def create(self, image):
+        return self.client.post(self.url, {
+            'name': 'Омлет',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': image,
+            'tags': [self.breakfast.id],
+            'ingredients': [{'id': self.egg.id, 'amount': 3}],
+        }, format='json')
+
+    def run_tasks(self):
+        for task in Task.objects.claim(10, 60):
+            execute(task)
+
+    def test_invalid_images(self):
+        for image in ('data:image/png;base64,%%%',
+                      'data:image/png;base64,' + 'QUJD' * 10):
+            with self.subTest(image=image[:30]):
+                response = self.create(image)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertIn('image', response.data)
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_too_large_image(self):
+        response = self.create(image_data('navy'))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('400x300', str(response.data['image']))
+
+    def test_thumbnails_after_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.create(image_data('olive'))
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.data['image_srcset'], '')
+        self.run_tasks()
+
+        recipe = Recipe.objects.get(id=response.data['id'])
+        for width in (160, 320, 640):
+            name = thumbnail_name(recipe.image.name, width)
+            with default_storage.open(name) as file:
+                image = Image.open(file)
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.width, min(width, 400))
+        srcset = self.client.get(
+            f'{self.url}{recipe.id}/'
+        ).data['image_srcset']
+        self.assertEqual(srcset.count('.webp'), 3)
+        self.assertTrue(srcset.startswith('http://testserver/media/'))
+
+    @override_settings(IMAGE_THUMBNAILS_ASYNC=False)
+    def test_sync_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.create(image_data('teal'))
+        self.assertFalse(Task.objects.exists())
+        self.assertIn('160w', self.client.get(
+            f'{self.url}{response.data["id"]}/'
+        ).data['image_srcset'])
+
+    def test_thumbnails_only_for_new_image(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_id = self.create(image_data('maroon')).data['id']
+        self.assertEqual(Task.objects.count(), 1)
+        url = f'{self.url}{recipe_id}/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'name': 'Яичница'}, format='json')
+            recipe = Recipe.objects.get(id=recipe_id)
+            recipe.cooking_time = 5
+            recipe.save()
+        self.assertEqual(Task.objects.count(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                url, {'image': image_data('purple')}, format='json'
+            )
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(
+            Task.objects.latest('id').args,
+            [Recipe.objects.get(id=recipe_id).image.name],
+        )
+
+    @override_settings(RECIPE_FRAGMENT_CACHE_TIMEOUT=60)
+    def test_cached_recipe_gets_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_id = self.create(image_data('lime')).data['id']
+        url = f'{self.url}{recipe_id}/'
+        self.assertEqual(self.client.get(url).json()['image_srcset'], '')
+        self.run_tasks()
+        self.assertIn('640w', self.client.get(url).json()['image_srcset'])
+
+
+class ImageStorageTests(FoodgramAPITestCase):
+    """Общие файлы изображений и сборка неиспользуемых."""
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def save_recipe_image(self, recipe, color):
+        recipe.image = decode_base64_image(image_data(color))
+        recipe.save()
+        return recipe.image.name
+
+    def collect(self):
+        return call_command(
+            'collect_images', grace=0, verbosity=0, stdout=StringIO()
+        )
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_recipe('Омлет', {self.egg: 3})
+        second = self.create_recipe('Яичница', {self.egg: 2})
+        name = self.save_recipe_image(first, 'olive')
+        self.assertEqual(self.save_recipe_image(second, 'olive'), name)
+        self.assertEqual(os.listdir(os.path.join(MEDIA_ROOT, 'images')),
+                         [os.path.basename(name)])
+
+        second.delete()
+        release_image(name)
+        self.assertTrue(default_storage.exists(name))
+        first.delete()
+        release_image(name)
+        self.assertFalse(default_storage.exists(name))
+
+    def test_decoded_digest_is_reused(self):
+        image = decode_base64_image(image_data('navy'))
+        self.assertEqual(
+            content_storage.save('images/upload.png', image),
+            f'images/{image.content_digest}.png',
+        )
+        # Без готового хеша хранилище считает его само.
+        content = ContentFile(b'content')
+        content.content_digest = None
+        self.assertRegex(
+            content_storage.save('images/other.PNG', content),
+            r'^images/[0-9a-f]{32}\.png$',
+        )
+
+    def test_collect_images(self):
+        recipe = self.create_recipe('Омлет', {self.egg: 3})
+        kept = self.save_recipe_image(recipe, 'teal')
+        orphan = content_storage.save(
+            'images/orphan.png', ContentFile(b'orphan')
+        )
+        thumbnail = default_storage.save(
+            thumbnail_name(orphan, 160), ContentFile(b'thumbnail')
+        )
+        self.assertEqual(self.collect(), 'Удалено неиспользуемых файлов: 1.')
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(thumbnail))
+
+    def test_collect_images_without_directories(self):
+        self.assertEqual(self.collect(), 'Удалено неиспользуемых файлов: 0.')
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Ingredient, RecipeIngredients
+
+
+class ImportDataTests(FoodgramAPITestCase):
+    """Импорт ингредиентов без удаления существующих строк."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.omelette = self.create_recipe('Омлет', {self.egg: 3})
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, path, **options):
+        stdout = StringIO()
+        result = call_command(
+            'import_data', file=path, stdout=stdout, **options
+        )
+        return result, stdout.getvalue()
+
+    def catalog(self):
+        return set(Ingredient.objects.values_list(
+            'name', 'measurement_unit'
+        ))
+
+    def test_import_keeps_existing_rows(self):
+        path = self.write('ingredients.csv', (
+            'name,measurement_unit\n'
+            'яйца,шт\n'
+            ' соль , г \n'
+            'соль,г\n'
+            'перец,\n'
+            'перец,г\n'
+        ))
+        before = self.catalog()
+        result, output = self.load(path, batch_size=2)
+        self.assertEqual(result, 'Импорт всех данных завершен.')
+        # Строка без единицы измерения пропускается.
+        self.assertIn('прочитано 4, записано 2', output)
+        self.assertEqual(
+            self.catalog(), before | {('соль', 'г'), ('перец', 'г')}
+        )
+        self.assertTrue(RecipeIngredients.objects.filter(
+            recipe=self.omelette, ingredient=self.egg
+        ).exists())
+        response = self.client.get('/api/ingredients/', {'name': 'сол'})
+        self.assertEqual([item['name'] for item in response.json()],
+                         ['соль'])
+
+    def test_repeated_import_in_one_transaction(self):
+        path = self.write('ingredients.csv', 'name,measurement_unit\nсоль,г\n')
+        with transaction.atomic():
+            self.load(path)
+            self.assertIn('записано 0', self.load(path)[1])
+        self.assertIn(('соль', 'г'), self.catalog())
+
+    def test_json_formats(self):
+        rows = [{'name': 'соль', 'measurement_unit': 'г'},
+                {'name': 'перец', 'measurement_unit': 'г'}]
+        for name, content in (
+            ('catalog.json', json.dumps(rows, ensure_ascii=False)),
+            ('catalog.jsonl', '\n'.join(
+                json.dumps(row, ensure_ascii=False) for row in rows
+            )),
+        ):
+            with self.subTest(name=name):
+                Ingredient.objects.filter(measurement_unit='г').exclude(
+                    name__in=('мука', 'сахар')
+                ).delete()
+                self.load(self.write(name, content))
+                self.assertTrue(
+                    {('соль', 'г'), ('перец', 'г')} <= self.catalog()
+                )
+
+    def test_dry_run(self):
+        before = self.catalog()
+        result, output = self.load(
+            self.write('ingredients.csv', 'name,measurement_unit\nсоль,г\n'),
+            dry_run=True,
+        )
+        self.assertEqual(
+            result, 'Пробный импорт завершен, изменения отменены.'
+        )
+        self.assertIn('будет записано 1', output)
+        self.assertEqual(self.catalog(), before)
+
+    def test_invalid_files(self):
+        for name, content in (
+            ('ingredients.csv', 'title,unit\nсоль,г\n'),
+            ('ingredients.json', '[{"name": "соль", '),
+            ('ingredients.json', '[1, 2]'),
+            ('ingredients.xml', '<ingredients/>'),
+        ):
+            with self.subTest(name=name, content=content):
+                with self.assertRaises(CommandError):
+                    self.load(self.write(name, content))
@@ -0,0 +1,26 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Favorite, ShoppingCart
+
+
+class IndexTests(FoodgramAPITestCase):
+    """Ограничения уникальности и индексы горячих запросов."""
+
+    def test_relations_are_unique(self):
+        recipe = self.create_recipe('Омлет', {self.egg: 3})
+        for model in (Favorite, ShoppingCart):
+            model.objects.create(user=self.user, recipe=recipe)
+            with self.subTest(model=model.__name__), self.assertRaises(
+                IntegrityError
+            ), transaction.atomic():
+                model.objects.create(user=self.user, recipe=recipe)
+
+    def test_hot_queries_use_indexes(self):
+        self.create_recipe('Омлет', {self.egg: 3}, tags=(self.breakfast,))
+        output = StringIO()
+        call_command('explain_queries', stdout=output)
+        self.assertNotIn('[без индекса]', output.getvalue())
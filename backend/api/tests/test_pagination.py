@@ -0,0 +1,85 @@
+import base64
+import json
+from http import HTTPStatus
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Recipe
+from users.models import Subscribtion
+
+
+def cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class KeysetPaginationTests(FoodgramAPITestCase):
+    """Пагинация ленты и подписок по ключу."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [
+            self.create_recipe(f'Рецепт {number}', {self.egg: 1})
+            for number in range(5)
+        ]
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_keyset_pagination(self):
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+        self.assertEqual(
+            self.walk('/api/recipes/?pagination=cursor&limit=2'), expected
+        )
+
+    def test_count_on_request(self):
+        url = '/api/recipes/?pagination=cursor&limit=2'
+        self.assertIsNone(self.client.get(url).data['count'])
+        self.assertEqual(self.client.get(url + '&count=1').data['count'], 5)
+
+    def test_subscriptions(self):
+        authors = [self.author] + [
+            self.create_user(f'author{number}') for number in range(3)
+        ]
+        Subscribtion.objects.bulk_create(
+            Subscribtion(user=self.user, author=author) for author in authors
+        )
+        self.login(self.user)
+        self.assertEqual(
+            self.walk('/api/users/subscriptions/?pagination=cursor&limit=2'),
+            sorted(author.id for author in authors),
+        )
+
+    def test_rejects_bad_cursor(self):
+        for value in ('broken', cursor({'id': 1}), cursor([1]),
+                      cursor(['zzz', 'q']), cursor([None, None]),
+                      cursor(['2026-01-01T00:00:00+00:00', 'q']),
+                      cursor([[], {}])):
+            with self.subTest(cursor=value):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': value}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_accepts_handmade_cursor(self):
+        newest = Recipe.objects.order_by('-pub_date', '-id').first()
+        response = self.client.get('/api/recipes/', {
+            'cursor': cursor([str(newest.pub_date), str(newest.id)]),
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn(
+            newest.id, [item['id'] for item in response.data['results']]
+        )
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_page_pagination(self):
+        response = self.client.get('/api/recipes/?page=2&limit=2')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
@@ -0,0 +1,111 @@
+from http import HTTPStatus
+from unittest import mock
+
+from api.cache import bump_version, get_version
+from api.models import Version
+from api.pantry import PANTRY_VERSION_KEY, PantryIndex
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import RecipeIngredients
+
+
+class CookableTests(FoodgramAPITestCase):
+    """Подборка «что приготовить» по индексу ингредиентов."""
+
+    url = '/api/recipes/cookable/'
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3, self.milk: 100}, cooking_time=10
+        )
+        self.pancakes = self.create_recipe(
+            'Блины', {self.egg: 2, self.milk: 500, self.flour: 200},
+            cooking_time=30,
+        )
+        self.cake = self.create_recipe(
+            'Бисквит', {self.egg: 4, self.flour: 150, self.sugar: 150},
+            cooking_time=60,
+        )
+
+    def cookable(self, *ingredients):
+        response = self.client.get(self.url, {
+            'ingredients': ','.join(str(item.id) for item in ingredients)
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [
+            (recipe['id'], recipe['missing_ingredients'])
+            for recipe in response.data['results']
+        ]
+
+    def test_orders_by_missing_ingredients(self):
+        self.assertEqual(self.cookable(self.egg, self.milk), [
+            (self.omelette.id, 0), (self.pancakes.id, 1), (self.cake.id, 2),
+        ])
+
+    def test_sees_new_recipes(self):
+        self.cookable(self.egg)
+        with self.captureOnCommitCallbacks(execute=True):
+            sweet_milk = self.create_recipe('Сладкое молоко', {
+                self.milk: 200, self.sugar: 5,
+            })
+        self.assertEqual(
+            self.cookable(self.milk, self.sugar)[0], (sweet_milk.id, 0)
+        )
+
+    def test_requires_ingredients(self):
+        for params in ({}, {'ingredients': 'a,b'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class PantryIndexTests(FoodgramAPITestCase):
+    """Точечное обновление индекса и смена его версии."""
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe('Омлет', {self.egg: 3})
+        self.index = PantryIndex()
+        self.index.match((self.egg.id,))
+
+    def test_refresh_patches_current_index(self):
+        RecipeIngredients.objects.create(
+            recipe=self.omelette, ingredient=self.milk, amount=100
+        )
+        version = get_version(PANTRY_VERSION_KEY, cached=False)
+        with mock.patch.object(
+            self.index, '_build', wraps=self.index._build
+        ) as build:
+            self.index.refresh((self.omelette.id,))
+            self.assertEqual(
+                self.index.match((self.milk.id,)).tolist(),
+                [[self.omelette.id, 1]],
+            )
+        build.assert_not_called()
+        self.assertEqual(
+            get_version(PANTRY_VERSION_KEY, cached=False), version + 1
+        )
+
+    def test_refresh_after_foreign_change_rebuilds(self):
+        # Другой процесс сменил версию, не обновив этот индекс.
+        Version.objects.update_or_create(
+            key=PANTRY_VERSION_KEY, defaults={'value': 10}
+        )
+        self.index.refresh((self.omelette.id,))
+        self.assertIsNone(self.index._version)
+        self.assertEqual(get_version(PANTRY_VERSION_KEY, cached=False), 11)
+
+    def test_refresh_loses_race_for_version(self):
+        version = get_version(PANTRY_VERSION_KEY, cached=False)
+        with mock.patch('api.pantry.bump_version', return_value=False):
+            self.index.refresh((self.omelette.id,))
+        self.assertIsNone(self.index._version)
+        self.assertEqual(
+            get_version(PANTRY_VERSION_KEY, cached=False), version + 1
+        )
+
+    def test_bump_version(self):
+        self.assertFalse(bump_version('test', 1))
+        self.assertTrue(bump_version('test', 0))
+        self.assertFalse(bump_version('test', 0))
+        self.assertTrue(bump_version('test', 1))
+        self.assertEqual(get_version('test', cached=False), 2)
@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+
+from api.images import decode_base64_image
+from api.tests.base import FoodgramAPITestCase, image_data
+from recipes.models import Ingredient, Recipe, RecipeIngredients
+
+
+class RecipeDatasetTests(FoodgramAPITestCase):
+    """Выгрузка и загрузка рецептов в JSONL и Parquet."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3, self.milk: 100},
+            tags=(self.breakfast, self.dinner), cooking_time=15,
+        )
+        self.omelette.image = decode_base64_image(image_data('olive'))
+        self.omelette.save()
+        self.pancakes = self.create_recipe(
+            'Блины', {self.flour: 200}, author=self.user
+        )
+
+    def call(self, name, *args, **options):
+        return call_command(
+            name, *args, stdout=StringIO(), stderr=StringIO(), **options
+        )
+
+    def snapshot(self):
+        return {
+            recipe.name: (
+                recipe.author_id, recipe.text, recipe.cooking_time,
+                recipe.pub_date, recipe.image.name,
+                sorted(recipe.tags.values_list('slug', flat=True)),
+                sorted(RecipeIngredients.objects.filter(
+                    recipe=recipe
+                ).values_list('ingredient__name', 'amount')),
+                sorted(recipe.ingredients.values_list('name', flat=True)),
+            ) for recipe in Recipe.objects.all()
+        }
+
+    def test_round_trip(self):
+        expected = self.snapshot()
+        for extension in ('jsonl', 'parquet'):
+            with self.subTest(format=extension):
+                path = os.path.join(self.directory, f'recipes.{extension}')
+                self.assertEqual(
+                    self.call('export_recipes', path, images=True),
+                    f'Выгружено рецептов: 2 в {path}.',
+                )
+                Recipe.objects.all().delete()
+                default_storage.delete(self.omelette.image.name)
+                self.assertEqual(
+                    self.call('import_recipes', path, workers=1),
+                    'Загружено рецептов: 2, пропущено: 0, '
+                    'новых ингредиентов: 0.',
+                )
+                self.assertEqual(self.snapshot(), expected)
+                self.assertTrue(
+                    default_storage.exists(self.omelette.image.name)
+                )
+                self.author.refresh_from_db()
+                self.assertEqual(self.author.recipes_count, 1)
+
+    def test_import_resolves_references(self):
+        path = os.path.join(self.directory, 'recipes.jsonl')
+        records = [{
+            'name': 'Омлет',
+            'author': self.author.email,
+            'text': 'Уже есть',
+            'cooking_time': 5,
+        }, {
+            'name': 'Солёный омлет',
+            'author': 'nobody@foodgram.ru',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'tags': ['breakfast', 'unknown'],
+            'ingredients': [
+                {'name': 'яйца', 'measurement_unit': 'шт', 'amount': 2},
+                {'name': 'соль', 'measurement_unit': 'г', 'amount': 3},
+            ],
+        }]
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+
+        self.assertEqual(
+            self.call('import_recipes', path, workers=1),
+            'Загружено рецептов: 0, пропущено: 2, новых ингредиентов: 0.',
+        )
+        self.assertEqual(
+            self.call('import_recipes', path, workers=1,
+                      default_author=self.user.email),
+            'Загружено рецептов: 1, пропущено: 1, новых ингредиентов: 1.',
+        )
+        recipe = Recipe.objects.get(name='Солёный омлет')
+        self.assertEqual(recipe.author, self.user)
+        self.assertEqual(
+            list(recipe.tags.values_list('slug', flat=True)), ['breakfast']
+        )
+        self.assertTrue(
+            Ingredient.objects.filter(name='соль', measurement_unit='г')
+            .exists()
+        )
+        self.assertEqual(
+            Recipe.objects.get(name='Омлет').text, self.omelette.text
+        )
+
+    def test_unknown_format(self):
+        path = os.path.join(self.directory, 'recipes.csv')
+        for command in ('export_recipes', 'import_recipes'):
+            with self.subTest(command=command):
+                with self.assertRaises(CommandError):
+                    self.call(command, path)
@@ -0,0 +1,153 @@
+from http import HTTPStatus
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Ingredient, Recipe, RecipeIngredients
+
+PIXEL = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+    'AAAAC0lEQVR4nGNgAAIAAAUAAXpeqz8AAAAASUVORK5CYII='
+)
+
+
+class RecipeWriteTests(FoodgramAPITestCase):
+    """Создание и изменение рецепта пакетными запросами."""
+
+    url = '/api/recipes/'
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.author)
+
+    def recipe_data(self, ingredients=None, tags=None, **fields):
+        data = {
+            'name': 'Омлет',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': PIXEL,
+            'tags': [self.breakfast.id] if tags is None else tags,
+            'ingredients': [
+                {'id': self.egg.id, 'amount': 3},
+                {'id': self.milk.id, 'amount': 100},
+            ] if ingredients is None else ingredients,
+        }
+        data.update(fields)
+        return data
+
+    def create(self, **kwargs):
+        return self.client.post(
+            self.url, self.recipe_data(**kwargs), format='json'
+        )
+
+    def test_create(self):
+        response = self.create(tags=[self.breakfast.id, self.dinner.id])
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = Recipe.objects.get(id=response.data['id'])
+        self.assertEqual(
+            dict(recipe.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            )),
+            {self.egg.id: 3, self.milk.id: 100},
+        )
+        self.assertCountEqual(
+            recipe.ingredients.values_list('id', flat=True),
+            [self.egg.id, self.milk.id],
+        )
+        self.assertEqual(
+            [tag['slug'] for tag in response.data['tags']],
+            ['breakfast', 'dinner'],
+        )
+        self.assertFalse(response.data['is_favorited'])
+
+    def test_invalid_tags(self):
+        for tags in ([], [self.breakfast.id, str(self.breakfast.id)],
+                     ['x'], [{'id': 1}], [10 ** 6]):
+            with self.subTest(tags=tags):
+                response = self.create(tags=tags)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertIn('tags', response.data)
+        response = self.create(
+            tags=[self.breakfast.id, str(self.breakfast.id)]
+        )
+        self.assertEqual(
+            response.data['tags'], ['Теги должны быть уникальными.']
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_invalid_ingredients(self):
+        for ingredients in (
+            [],
+            [{'id': self.egg.id}],
+            [{'id': 'x', 'amount': 1}],
+            [{'id': self.egg.id, 'amount': 0}],
+            [{'id': 10 ** 6, 'amount': 1}],
+            [{'id': self.egg.id, 'amount': 1},
+             {'id': str(self.egg.id), 'amount': 2}],
+        ):
+            with self.subTest(ingredients=ingredients):
+                response = self.create(ingredients=ingredients)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertIn('ingredients', response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_queries_do_not_depend_on_ingredients(self):
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(30)
+        )
+        ingredient_ids = Ingredient.objects.filter(
+            name__startswith='ингредиент'
+        ).values_list('id', flat=True)
+        self.assertEqual(len(ingredient_ids), len(ingredients))
+        self.client.get('/api/users/me/')
+        counts = []
+        for size in (2, 30):
+            with CaptureQueriesContext(connection) as context:
+                response = self.create(ingredients=[
+                    {'id': ingredient_id, 'amount': 5}
+                    for ingredient_id in ingredient_ids[:size]
+                ], name=f'Рецепт на {size}')
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+            self.assertEqual(len(response.data['ingredients']), size)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_changes_only_different_rows(self):
+        recipe = Recipe.objects.get(id=self.create().data['id'])
+        egg = recipe.recipe_ingredients.get(ingredient=self.egg)
+        response = self.client.patch(
+            f'{self.url}{recipe.id}/',
+            self.recipe_data(ingredients=[
+                {'id': self.egg.id, 'amount': 3},
+                {'id': self.flour.id, 'amount': 200},
+            ]),
+            format='json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            dict(recipe.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            )),
+            {self.egg.id: 3, self.flour.id: 200},
+        )
+        self.assertTrue(RecipeIngredients.objects.filter(id=egg.id).exists())
+        self.assertCountEqual(
+            recipe.ingredients.values_list('id', flat=True),
+            [self.egg.id, self.flour.id],
+        )
+
+    def test_invalid_update_keeps_recipe(self):
+        recipe_id = self.create().data['id']
+        response = self.client.patch(
+            f'{self.url}{recipe_id}/',
+            self.recipe_data(name='Новое', tags=['x']),
+            format='json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(Recipe.objects.get(id=recipe_id).name, 'Омлет')
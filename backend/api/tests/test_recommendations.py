@@ -0,0 +1,100 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Favorite, RecipeNeighbor, ShoppingCart
+
+
+class RecommendationTests(FoodgramAPITestCase):
+    """Похожие рецепты и рекомендации по ним."""
+
+    url = '/api/recipes/recommended/'
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe('Омлет', {self.egg: 3})
+        self.pancakes = self.create_recipe('Блины', {self.egg: 2})
+        self.cake = self.create_recipe('Бисквит', {self.egg: 4})
+
+    def favorite(self, user, *recipes):
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe) for recipe in recipes
+        )
+
+    def build(self, **options):
+        call_command('build_recommendations', stdout=StringIO(), **options)
+        return {
+            (neighbor.recipe_id, neighbor.neighbor_id): neighbor.score
+            for neighbor in RecipeNeighbor.objects.all()
+        }
+
+    def recommended(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_recommended(self):
+        self.favorite(self.user, self.omelette)
+        RecipeNeighbor.objects.bulk_create([
+            RecipeNeighbor(
+                recipe=self.omelette, neighbor=self.pancakes, score=0.9
+            ),
+            RecipeNeighbor(
+                recipe=self.omelette, neighbor=self.cake, score=0.2
+            ),
+            RecipeNeighbor(
+                recipe=self.pancakes, neighbor=self.omelette, score=0.9
+            ),
+        ])
+        self.login(self.user)
+        self.assertEqual(
+            self.recommended(), [self.pancakes.id, self.cake.id]
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        self.assertEqual(self.recommended(), [self.cake.id])
+
+    def test_recommended_requires_login(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_build_recommendations(self):
+        first, second = (self.create_user(f'fan{number}') for number in (1, 2))
+        self.favorite(first, self.omelette, self.pancakes)
+        self.favorite(second, self.omelette, self.cake)
+        ShoppingCart.objects.create(user=second, recipe=self.pancakes)
+        scores = self.build()
+        self.assertEqual(set(scores), {
+            (self.omelette.id, self.pancakes.id),
+            (self.pancakes.id, self.omelette.id),
+            (self.omelette.id, self.cake.id),
+            (self.cake.id, self.omelette.id),
+            (self.pancakes.id, self.cake.id),
+            (self.cake.id, self.pancakes.id),
+        })
+        self.assertEqual(
+            scores[(self.omelette.id, self.pancakes.id)],
+            scores[(self.pancakes.id, self.omelette.id)],
+        )
+        self.assertGreater(
+            scores[(self.omelette.id, self.pancakes.id)],
+            scores[(self.omelette.id, self.cake.id)],
+        )
+        self.assertEqual(self.build(chunk_pairs=1), scores)
+
+        top = self.build(top_k=1)
+        self.assertEqual(
+            [key for key in top if key[0] == self.omelette.id],
+            [(self.omelette.id, self.pancakes.id)],
+        )
+
+        self.favorite(self.user, self.omelette)
+        self.login(self.user)
+        self.assertEqual(self.recommended(), [self.pancakes.id])
+
+    def test_build_without_interactions_clears_neighbors(self):
+        RecipeNeighbor.objects.create(
+            recipe=self.omelette, neighbor=self.cake, score=1
+        )
+        self.assertEqual(self.build(), {})
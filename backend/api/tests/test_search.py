@@ -0,0 +1,64 @@
+from http import HTTPStatus
+
+from api.tests.base import FoodgramAPITestCase
+
+
+class RecipeSearchTests(FoodgramAPITestCase):
+    """Полнотекстовый поиск рецептов с ранжированием."""
+
+    url = '/api/recipes/'
+
+    def search(self, text, **params):
+        response = self.client.get(self.url, {'search': text, **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_search(self):
+        soup = self.create_recipe(
+            'Грибной суп', {self.milk: 300}, text='Суп из белых грибов'
+        )
+        self.create_recipe('Омлет', {self.egg: 3})
+        self.assertEqual(self.search('суп'), [soup.id])
+
+    def test_name_ranks_above_text(self):
+        in_name = self.create_recipe('Суп', {self.milk: 300})
+        in_text = self.create_recipe(
+            'Обед', {self.flour: 100}, text='Подавать вместо супа'
+        )
+        self.assertEqual(self.search('суп'), [in_name.id, in_text.id])
+
+    def test_search_by_ingredient_and_filters(self):
+        omelette = self.create_recipe(
+            'Омлет', {self.egg: 3}, tags=(self.breakfast,)
+        )
+        self.create_recipe('Яичница', {self.egg: 2}, tags=(self.dinner,))
+        self.assertEqual(
+            self.search('яйца', tags='breakfast'), [omelette.id]
+        )
+
+    def test_search_sees_ingredient_rename(self):
+        soup = self.create_recipe('Суп', {self.milk: 300})
+        self.milk.name = 'кокосовое молоко'
+        self.milk.save()
+        self.assertEqual(self.search('кокосовое'), [soup.id])
+
+    def test_search_sees_recipe_update(self):
+        recipe = self.create_recipe('Омлет', {self.egg: 3})
+        recipe.name = 'Фриттата'
+        recipe.save()
+        self.assertEqual(self.search('фриттата'), [recipe.id])
+        self.assertEqual(self.search('омлет'), [])
+
+    def test_blank_query_is_ignored(self):
+        recipes = [
+            self.create_recipe(f'Рецепт {number}', {self.egg: 1})
+            for number in range(2)
+        ]
+        for text in ('', '   '):
+            with self.subTest(text=text):
+                self.assertCountEqual(
+                    self.search(text), [recipe.id for recipe in recipes]
+                )
+        # Кавычки не ломают синтаксис запроса FTS5 и tsquery.
+        self.assertEqual(self.search('"'), [])
+        self.assertEqual(self.search('"рецепт'), self.search('рецепт'))
@@ -0,0 +1,205 @@
+import threading
+from http import HTTPStatus
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TransactionTestCase
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Ingredient, ShoppingCart, ShoppingListItem
+from users.models import User
+
+
+class ShoppingListTests(FoodgramAPITestCase):
+    """Список покупок следует за корзиной и ингредиентами рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3, self.milk: 100}, tags=(self.breakfast,)
+        )
+        self.pancakes = self.create_recipe(
+            'Блины', {self.egg: 2, self.milk: 500, self.flour: 200}
+        )
+        self.login(self.user)
+
+    def shopping_list(self, user=None):
+        return dict(ShoppingListItem.objects.filter(
+            user=user or self.user
+        ).values_list('ingredient_id', 'total_amount'))
+
+    def test_cart_changes(self):
+        self.client.post(f'/api/recipes/{self.omelette.id}/shopping_cart/')
+        self.client.post(f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(self.shopping_list(), {
+            self.egg.id: 5, self.milk.id: 600, self.flour.id: 200,
+        })
+        self.client.delete(f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(self.shopping_list(), {
+            self.egg.id: 3, self.milk.id: 100,
+        })
+        ShoppingCart.objects.get(user=self.user).delete()
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_recipe_update_changes_shopping_list(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.omelette)
+        ShoppingCart.objects.create(user=self.author, recipe=self.omelette)
+        self.login(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.omelette.id}/',
+            {
+                'name': 'Омлет',
+                'text': 'Описание',
+                'cooking_time': 5,
+                'tags': [self.breakfast.id],
+                'ingredients': [
+                    {'id': self.egg.id, 'amount': 4},
+                    {'id': self.sugar.id, 'amount': 10},
+                ],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        for user in (self.user, self.author):
+            self.assertEqual(self.shopping_list(user), {
+                self.egg.id: 4, self.sugar.id: 10,
+            })
+
+    def test_apply(self):
+        items = ShoppingListItem.objects
+        items.apply((self.user.id, self.user.id), {self.egg.id: 2})
+        items.apply((self.user.id, self.author.id), {
+            self.egg.id: 3, self.milk.id: -5, self.flour.id: 0,
+        })
+        self.assertEqual(self.shopping_list(), {self.egg.id: 5})
+        self.assertEqual(self.shopping_list(self.author), {self.egg.id: 3})
+        items.apply((self.user.id,), {self.egg.id: -5})
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_rebuild_matches_live_aggregation(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.omelette)
+        ShoppingListItem.objects.update(total_amount=1)
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertEqual(self.shopping_list(), {
+            self.egg.id: 3, self.milk.id: 100,
+        })
+
+
+class RecipeAdminShoppingListTests(FoodgramAPITestCase):
+    """Правка ингредиентов рецепта в админке доходит до списков покупок."""
+
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.ru', password='Pass-1234',
+            first_name='admin', last_name='admin',
+        )
+        self.client.force_login(admin)
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3, self.milk: 100}, tags=(self.breakfast,)
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=self.omelette)
+
+    def change_form(self, ingredients):
+        """Данные формы рецепта со вставками ингредиентов и тегов."""
+
+        rows = list(self.omelette.recipe_ingredients.order_by('id'))
+        data = {
+            'name': self.omelette.name,
+            'author': self.author.id,
+            'text': self.omelette.text,
+            'cooking_time': self.omelette.cooking_time,
+            'tags': [self.breakfast.id],
+            'ingredients': [ingredient.id for ingredient in ingredients],
+            'recipe_ingredients-TOTAL_FORMS': len(ingredients),
+            'recipe_ingredients-INITIAL_FORMS': len(rows),
+            'recipe_ingredients-MIN_NUM_FORMS': 1,
+            'recipe_ingredients-MAX_NUM_FORMS': 1000,
+            'Recipe_tags-TOTAL_FORMS': 0,
+            'Recipe_tags-INITIAL_FORMS': 0,
+        }
+        for number, (ingredient, amount) in enumerate(ingredients.items()):
+            prefix = f'recipe_ingredients-{number}-'
+            data[prefix + 'recipe'] = self.omelette.id
+            data[prefix + 'ingredient'] = ingredient.id
+            data[prefix + 'amount'] = amount
+            if number < len(rows):
+                data[prefix + 'id'] = rows[number].id
+        start = len(ingredients)
+        for number, row in enumerate(rows[start:], start):
+            prefix = f'recipe_ingredients-{number}-'
+            data.update({
+                prefix + 'id': row.id,
+                prefix + 'recipe': self.omelette.id,
+                prefix + 'ingredient': row.ingredient_id,
+                prefix + 'amount': row.amount,
+                prefix + 'DELETE': 'on',
+            })
+            data['recipe_ingredients-TOTAL_FORMS'] += 1
+        return data
+
+    def test_inline_changes_reach_shopping_list(self):
+        response = self.client.post(
+            f'/admin/recipes/recipe/{self.omelette.id}/change/',
+            self.change_form({self.egg: 5}),
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(user=self.user).values_list(
+                'ingredient_id', 'total_amount'
+            )),
+            {self.egg.id: 5},
+        )
+        self.assertEqual(
+            list(self.omelette.ingredients.values_list('id', flat=True)),
+            [self.egg.id],
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'нужны параллельные сеансы')
+class ConcurrentShoppingListTests(TransactionTestCase):
+    """Одновременное добавление новой позиции двумя запросами."""
+
+    def test_concurrent_insert_is_summed(self):
+        user = User.objects.create_user(
+            username='user', email='user@foodgram.ru', password='Pass-1234'
+        )
+        egg = Ingredient.objects.create(name='яйца', measurement_unit='шт')
+        applied = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def first():
+            try:
+                with transaction.atomic():
+                    ShoppingListItem.objects.apply((user.id,), {egg.id: 2})
+                    applied.set()
+                    release.wait(5)
+            finally:
+                connections.close_all()
+
+        def second():
+            try:
+                with transaction.atomic():
+                    ShoppingListItem.objects.apply((user.id,), {egg.id: 3})
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=first)]
+        threads[0].start()
+        applied.wait(5)
+        threads.append(threading.Thread(target=second))
+        threads[1].start()
+        # Второй запрос ждёт на уникальном индексе фиксации первого.
+        threads[1].join(0.5)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=user).total_amount, 5
+        )
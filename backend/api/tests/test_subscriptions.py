@@ -0,0 +1,92 @@
+from http import HTTPStatus
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.base import FoodgramAPITestCase
+from users.models import Subscribtion, User
+
+
+class SubscriptionTests(FoodgramAPITestCase):
+    """Подписки с превью рецептов одним запросом на всех авторов."""
+
+    url = '/api/users/subscriptions/'
+
+    def setUp(self):
+        super().setUp()
+        self.authors = [self.author] + [
+            self.create_user(f'author{number}') for number in range(3)
+        ]
+        self.recipes = {
+            author.id: [
+                self.create_recipe(f'{author.username} {number}',
+                                   {self.egg: 1}, author=author).id
+                for number in range(3)
+            ] for author in self.authors
+        }
+        self.login(self.user)
+        self.client.get('/api/users/me/')
+
+    def subscribe(self, authors):
+        Subscribtion.objects.bulk_create(
+            Subscribtion(user=self.user, author=author) for author in authors
+        )
+
+    def test_previews(self):
+        self.subscribe(self.authors)
+        response = self.client.get(self.url, {'recipes_limit': 2})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        for author in response.data['results']:
+            self.assertTrue(author['is_subscribed'])
+            self.assertEqual(author['recipes_count'], 3)
+            self.assertEqual(
+                [recipe['id'] for recipe in author['recipes']],
+                self.recipes[author['id']][:-3:-1],
+            )
+
+    def test_invalid_limit_is_ignored(self):
+        self.subscribe(self.authors[:1])
+        for limit in ('x', ''):
+            response = self.client.get(self.url, {'recipes_limit': limit})
+            self.assertEqual(
+                len(response.data['results'][0]['recipes']), 3
+            )
+
+    def test_queries_do_not_depend_on_authors(self):
+        counts = []
+        for authors in (self.authors[:1], self.authors[1:]):
+            Subscribtion.objects.all().delete()
+            self.subscribe(authors)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(self.url, {'recipes_limit': 2})
+            self.assertEqual(len(response.data['results']), len(authors))
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+        response = self.client.post(url + '?recipes_limit=1')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.data['followers_count'], 1)
+        self.assertEqual(
+            response.data['followers_count'],
+            User.objects.get(id=self.author.id).followers_count,
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['recipes']],
+            self.recipes[self.author.id][-1:],
+        )
+        self.assertEqual(
+            self.client.post(url).status_code, HTTPStatus.BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.delete(url).status_code, HTTPStatus.NO_CONTENT
+        )
+        self.assertEqual(
+            self.client.delete(url).status_code, HTTPStatus.BAD_REQUEST
+        )
+
+    def test_subscribe_to_self(self):
+        response = self.client.post(f'/api/users/{self.user.id}/subscribe/')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Subscribtion.objects.exists())
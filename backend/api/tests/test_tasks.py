@@ -0,0 +1,154 @@
+import os
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from api.exports import export_storage
+from api.tests.base import EXPORTS_ROOT, FoodgramAPITestCase
+from recipes.models import ShoppingCart
+from tasks.models import Task
+from tasks.queue import execute
+
+
+class ExportTaskTests(FoodgramAPITestCase):
+    """Фоновая выгрузка списка покупок и опрос её статуса."""
+
+    url = '/api/recipes/download_shopping_cart/'
+
+    def setUp(self):
+        super().setUp()
+        omelette = self.create_recipe('Омлет', {self.egg: 3})
+        ShoppingCart.objects.create(user=self.user, recipe=omelette)
+        self.login(self.user)
+
+    def run_tasks(self):
+        for task in Task.objects.claim(10, 60):
+            execute(task)
+
+    def test_async_export(self):
+        response = self.client.get(self.url, {'type': 'csv', 'async': 1})
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+        status_url = response.data['status_url']
+        self.assertEqual(
+            self.client.get(status_url).data['status'], Task.PENDING
+        )
+
+        self.assertIsNone(self.client.get(status_url).data['download_url'])
+        self.assertEqual(
+            self.client.get(status_url + 'download/').status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+        self.run_tasks()
+        response = self.client.get(status_url)
+        self.assertEqual(response.data['status'], Task.DONE)
+        self.assertEqual(
+            response.data['download_url'], status_url + 'download/'
+        )
+        response = self.client.get(response.data['download_url'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('shopping_list.csv', response['Content-Disposition'])
+        self.assertIn('яйца,шт,3', b''.join(response).decode())
+
+    @override_settings(EXPORT_ASYNC_THRESHOLD=0)
+    def test_large_list_is_exported_in_background(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+
+    def test_export_file_follows_cart(self):
+        self.client.get(self.url, {'async': 1})
+        self.run_tasks()
+        first = Task.objects.get().result['file']
+        omelette = ShoppingCart.objects.get().recipe
+        self.client.delete(f'/api/recipes/{omelette.id}/shopping_cart/')
+        self.client.get(self.url, {'async': 1})
+        self.run_tasks()
+        second = Task.objects.latest('id').result['file']
+        self.assertNotEqual(first, second)
+
+    def test_tasks_are_private(self):
+        status_url = self.client.get(
+            self.url, {'async': 1}
+        ).data['status_url']
+        self.run_tasks()
+        self.login(self.author)
+        for url in (status_url, status_url + 'download/'):
+            self.assertEqual(
+                self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+            )
+        self.client.credentials()
+        self.assertEqual(
+            self.client.get(status_url + 'download/').status_code,
+            HTTPStatus.UNAUTHORIZED,
+        )
+
+    def test_export_is_not_public(self):
+        self.client.get(self.url, {'async': 1})
+        self.run_tasks()
+        name = Task.objects.get().result['file']
+        self.assertTrue(export_storage.path(name).startswith(EXPORTS_ROOT))
+        with self.assertRaises(ValueError):
+            export_storage.url(name)
+
+    def test_collect_unused_exports(self):
+        self.client.get(self.url, {'async': 1})
+        self.run_tasks()
+        kept = Task.objects.get().result['file']
+        stale = export_storage.save(
+            f'{self.user.id}/shopping_list_0.txt', StringIO('old')
+        )
+        call_command('collect_images', grace=0, stdout=StringIO())
+        self.assertTrue(export_storage.exists(kept))
+        self.assertFalse(export_storage.exists(stale))
+        Task.objects.all().delete()
+        call_command('collect_images', grace=0, stdout=StringIO())
+        self.assertEqual(
+            os.listdir(os.path.join(EXPORTS_ROOT, str(self.user.id))), []
+        )
+
+
+class TaskQueueTests(FoodgramAPITestCase):
+    """Выборка задач воркером."""
+
+    def create_task(self, **kwargs):
+        return Task.objects.create(name='export_shopping_list', **kwargs)
+
+    def test_claim_takes_due_tasks(self):
+        due = self.create_task()
+        self.create_task(run_after=timezone.now() + timedelta(hours=1))
+        claimed = Task.objects.claim(10, 60)
+        self.assertEqual([task.id for task in claimed], [due.id])
+        due.refresh_from_db()
+        self.assertEqual(due.status, Task.RUNNING)
+        self.assertEqual(due.attempts, 1)
+        self.assertEqual(Task.objects.claim(10, 60), [])
+
+    def test_expired_task_is_retried_until_attempts_run_out(self):
+        expired = timezone.now() - timedelta(minutes=1)
+        retried = self.create_task(
+            status=Task.RUNNING, attempts=1, locked_until=expired
+        )
+        exhausted = self.create_task(
+            status=Task.RUNNING, attempts=3, locked_until=expired
+        )
+        claimed = Task.objects.claim(10, 60)
+        self.assertEqual([task.id for task in claimed], [retried.id])
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, Task.FAILED)
+
+    def test_purge_keeps_recent_and_pending_tasks(self):
+        old = timezone.now() - timedelta(days=10)
+        done = self.create_task(status=Task.DONE)
+        pending = self.create_task()
+        recent = self.create_task(status=Task.FAILED)
+        Task.objects.filter(id__in=(done.id, pending.id)).update(created=old)
+        self.assertEqual(Task.objects.purge(7 * 24 * 3600), 1)
+        self.assertCountEqual(
+            Task.objects.values_list('id', flat=True),
+            [pending.id, recent.id],
+        )
@@ -0,0 +1,106 @@
+from http import HTTPStatus
+
+from api.tests.base import FoodgramAPITestCase
+from recipes.models import Favorite, ShoppingCart
+
+
+class RecipeToggleTests(FoodgramAPITestCase):
+    """Избранное и корзина: одиночные и пакетные изменения."""
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe(
+            'Омлет', {self.egg: 3, self.milk: 100}
+        )
+        self.pancakes = self.create_recipe(
+            'Блины', {self.egg: 2, self.milk: 500, self.flour: 200}
+        )
+        self.login(self.user)
+
+    def test_toggle(self):
+        for name, model in (('favorite', Favorite),
+                            ('shopping_cart', ShoppingCart)):
+            with self.subTest(name=name):
+                url = f'/api/recipes/{self.omelette.id}/{name}/'
+                response = self.client.post(url)
+                self.assertEqual(response.status_code, HTTPStatus.CREATED)
+                self.assertEqual(response.data['name'], 'Омлет')
+                self.assertEqual(
+                    self.client.post(url).status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertEqual(model.objects.count(), 1)
+                self.assertEqual(
+                    self.client.delete(url).status_code,
+                    HTTPStatus.NO_CONTENT,
+                )
+                self.assertEqual(
+                    self.client.delete(url).status_code,
+                    HTTPStatus.BAD_REQUEST,
+                )
+
+    def test_toggle_missing_recipe(self):
+        for method in ('post', 'delete'):
+            for pk in (10 ** 6, 'x'):
+                response = getattr(self.client, method)(
+                    f'/api/recipes/{pk}/favorite/'
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_favorite_batch(self):
+        recipes = [self.omelette.id, self.pancakes.id, 10 ** 6]
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': recipes}, format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertCountEqual(
+            response.data['added'], [self.omelette.id, self.pancakes.id]
+        )
+        self.omelette.refresh_from_db()
+        self.assertEqual(self.omelette.favorites_count, 1)
+
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': recipes}, format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data['added'], [])
+
+        response = self.client.delete(
+            '/api/recipes/favorite/', {'recipes': [self.omelette.id]},
+            format='json',
+        )
+        self.assertEqual(response.data['removed'], [self.omelette.id])
+        self.omelette.refresh_from_db()
+        self.assertEqual(self.omelette.favorites_count, 0)
+        self.assertEqual(
+            list(Favorite.objects.values_list('recipe_id', flat=True)),
+            [self.pancakes.id],
+        )
+
+    def test_shopping_cart_batch(self):
+        response = self.client.post(
+            '/api/recipes/shopping_cart/',
+            {'recipes': [self.omelette.id, self.pancakes.id]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/', {'recipes': [self.pancakes.id]},
+            format='json',
+        )
+        self.assertEqual(response.data['removed'], [self.pancakes.id])
+        self.assertEqual(
+            list(ShoppingCart.objects.values_list('recipe_id', flat=True)),
+            [self.omelette.id],
+        )
+
+    def test_batch_rejects_invalid_ids(self):
+        for recipes in (['x'], [], [0], list(range(1, 102))):
+            with self.subTest(recipes=len(recipes)):
+                response = self.client.post(
+                    '/api/recipes/shopping_cart/', {'recipes': recipes},
+                    format='json',
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+        self.assertFalse(ShoppingCart.objects.exists())
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import AnonymousUser
+from django.test import override_settings
+
+from api.tests.base import FoodgramAPITestCase
+from api.user_state import UserState
+from recipes.models import Favorite
+
+
+class UserStateTests(FoodgramAPITestCase):
+    """Флаги пользователя в ленте следуют за его действиями."""
+
+    def setUp(self):
+        super().setUp()
+        self.omelette = self.create_recipe('Омлет', {self.egg: 3})
+        self.login(self.user)
+
+    def flags(self):
+        recipe = self.client.get(f'/api/recipes/{self.omelette.id}/').data
+        return (
+            recipe['is_favorited'],
+            recipe['is_in_shopping_cart'],
+            recipe['author']['is_subscribed'],
+        )
+
+    def check_flags_follow_changes(self):
+        self.assertEqual(self.flags(), (False, False, False))
+        self.client.post(f'/api/recipes/{self.omelette.id}/favorite/')
+        self.client.post(f'/api/recipes/{self.omelette.id}/shopping_cart/')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.flags(), (True, True, True))
+        self.client.delete(f'/api/recipes/{self.omelette.id}/favorite/')
+        self.assertEqual(self.flags(), (False, True, True))
+
+    def test_flags_follow_changes(self):
+        self.check_flags_follow_changes()
+
+    @override_settings(USER_STATE_CACHE_TIMEOUT=60)
+    def test_cached_flags_follow_changes(self):
+        self.check_flags_follow_changes()
+
+    @override_settings(USER_STATE_CACHE_TIMEOUT=60)
+    def test_cached_flags_follow_orm_changes(self):
+        self.assertEqual(self.flags(), (False, False, False))
+        Favorite.objects.create(user=self.user, recipe=self.omelette)
+        self.assertEqual(self.flags(), (True, False, False))
+
+    def test_each_set_is_loaded_once(self):
+        state = UserState(self.user)
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                self.assertFalse(state.is_favorited(self.omelette.id))
+
+    def test_anonymous_state_is_empty(self):
+        Favorite.objects.create(user=self.user, recipe=self.omelette)
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                UserState(AnonymousUser()).is_favorited(self.omelette.id)
+            )
+        self.client.credentials()
+        self.assertEqual(self.flags(), (False, False, False))
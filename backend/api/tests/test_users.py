@@ -0,0 +1,157 @@
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import StatelessJWTAuthentication, token_cache
+from api.tests.base import FoodgramAPITestCase
+from users.models import User
+
+
+class UserAuthTests(FoodgramAPITestCase):
+    """Регистрация и вход; кеш токенов по умолчанию выключен."""
+
+    def test_create_user_and_login(self):
+        response = self.client.post('/api/users/', {
+            'email': 'new@foodgram.ru',
+            'username': 'new',
+            'first_name': 'Новый',
+            'last_name': 'Пользователь',
+            'password': 'Pass-1234-new',
+        })
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(
+            self.client.get('/api/users/').data['count'], 3
+        )
+        response = self.client.post('/api/auth/token/login/', {
+            'email': 'new@foodgram.ru', 'password': 'Pass-1234-new',
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['username'], 'new')
+
+    def test_token_is_checked_every_request(self):
+        token = self.login(self.user)
+        self.client.get('/api/users/me/')
+        self.assertIsNone(token_cache.get(token.key))
+        token.delete()
+        self.assertEqual(
+            self.client.get('/api/users/me/').status_code,
+            HTTPStatus.UNAUTHORIZED,
+        )
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=30)
+class TokenCacheTests(FoodgramAPITestCase):
+    """Кеш токенов: выход и деактивация отзывают записи."""
+
+    def test_cached_token_saves_queries(self):
+        self.login(self.user)
+        counts = []
+        for ttl in (0, 30):
+            with self.settings(AUTH_TOKEN_CACHE_TTL=ttl):
+                self.client.get('/api/users/me/')
+                with CaptureQueriesContext(connection) as context:
+                    self.client.get('/api/users/me/')
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0] - counts[1], 1)
+
+    def test_logout_revokes_cached_token(self):
+        token = self.login(self.user)
+        self.assertEqual(
+            self.client.get('/api/users/me/').status_code, HTTPStatus.OK
+        )
+        self.assertIsNotNone(token_cache.get(token.key))
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertEqual(
+            self.client.get('/api/users/me/').status_code,
+            HTTPStatus.UNAUTHORIZED,
+        )
+
+    def test_deactivation_revokes_cached_token(self):
+        self.login(self.user)
+        self.client.get('/api/users/me/')
+        user = User.objects.get(id=self.user.id)
+        user.is_active = False
+        user.save()
+        self.assertEqual(
+            self.client.get('/api/users/me/').status_code,
+            HTTPStatus.UNAUTHORIZED,
+        )
+
+    def test_cached_user_is_copied_per_request(self):
+        token = self.login(self.user)
+        self.client.get('/api/users/me/')
+        first, _ = token_cache.get(token.key)
+        first.first_name = 'Изменено'
+        second, _ = token_cache.get(token.key)
+        self.assertEqual(second.first_name, self.user.first_name)
+
+    def test_profile_change_is_visible(self):
+        self.login(self.user)
+        self.client.get('/api/users/me/')
+        User.objects.filter(id=self.user.id).update(first_name='Иван')
+        user = User.objects.get(id=self.user.id)
+        user.save()
+        self.assertEqual(
+            self.client.get('/api/users/me/').data['first_name'], 'Иван'
+        )
+
+    def logout_in_other_process(self):
+        """
+        Выход в другом процессе: память этого процесса сохраняет
+        запись, которую не сбросил сигнал.
+        """
+
+        self.login(self.user)
+        self.client.get('/api/users/me/')
+        with token_cache._lock:
+            items = token_cache._items.copy()
+        self.client.post('/api/auth/token/logout/')
+        with token_cache._lock:
+            token_cache._items.update(items)
+        return self.client.get('/api/users/me/').status_code
+
+    def test_local_cache_delays_revocation(self):
+        self.assertEqual(self.logout_in_other_process(), HTTPStatus.OK)
+
+    @override_settings(AUTH_TOKEN_SHARED_CACHE=True)
+    def test_shared_cache_revokes_everywhere(self):
+        self.assertEqual(
+            self.logout_in_other_process(), HTTPStatus.UNAUTHORIZED
+        )
+
+
+class StatelessJWTTests(FoodgramAPITestCase):
+    """Пользователь подписанного токена загружается целиком."""
+
+    def authenticate(self, user):
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+        return StatelessJWTAuthentication().authenticate(request)
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=30)
+    def test_full_user(self):
+        user, _ = self.authenticate(self.user)
+        self.assertEqual(user.get_deferred_fields(), set())
+        with self.assertNumQueries(0):
+            self.assertEqual(user.email, self.user.email)
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+    def test_inactive_user_rejected(self):
+        token = AccessToken.for_user(self.user)
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        with self.assertRaises(AuthenticationFailed):
+            StatelessJWTAuthentication().authenticate(request)
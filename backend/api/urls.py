@@ -1,8 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .views import (TagViewSet, RecipeViewSet,
-                    IngredientViewSet, UserListViewSet)
+from .views import (TagViewSet, RecipeViewSet, IngredientViewSet,
+                    TaskViewSet, UserListViewSet)
 
 app_name = 'api'
 
@@ -11,6 +12,7 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', UserListViewSet, basename='users')
+router.register('tasks', TaskViewSet, basename='tasks')
 
 
 urlpatterns = [
@@ -18,3 +20,6 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.AUTH_STATELESS_TOKENS:
+    urlpatterns.append(path('auth/', include('djoser.urls.jwt')))
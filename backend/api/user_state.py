@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribtion
+
+CACHE_KEY = 'user_state:{kind}:{user_id}'
+
+SOURCES = {
+    'favorites': (Favorite, 'user_id', 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'user_id', 'recipe_id'),
+    'subscriptions': (Subscribtion, 'user_id', 'author_id'),
+}
+USER_STATE_KINDS = {
+    model: kind for kind, (model, _, _) in SOURCES.items()
+}
+
+
+class UserState:
+    """
+    Множества id избранных рецептов, рецептов в корзине и авторов,
+    на которых подписан пользователь. Каждое множество загружается
+    одним запросом при первом обращении.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._sets = {}
+
+    def _get(self, kind):
+        if kind not in self._sets:
+            self._sets[kind] = self._load(kind)
+        return self._sets[kind]
+
+    def _load(self, kind):
+        if not self.user.is_authenticated:
+            return frozenset()
+        timeout = settings.USER_STATE_CACHE_TIMEOUT
+        key = CACHE_KEY.format(kind=kind, user_id=self.user.id)
+        if timeout:
+            ids = cache.get(key)
+            if ids is not None:
+                return frozenset(ids)
+        model, user_field, value_field = SOURCES[kind]
+        ids = sorted(model.objects.filter(
+            **{user_field: self.user.id}
+        ).values_list(value_field, flat=True))
+        if timeout:
+            cache.set(key, ids, timeout)
+        return frozenset(ids)
+
+    def is_favorited(self, recipe_id):
+        return recipe_id in self._get('favorites')
+
+    def is_in_shopping_cart(self, recipe_id):
+        return recipe_id in self._get('shopping_cart')
+
+    def is_subscribed(self, author_id):
+        return author_id in self._get('subscriptions')
+
+
+def get_user_state(request):
+    """Состояние пользователя, общее для всех сериализаторов запроса."""
+
+    state = getattr(request, '_user_state', None)
+    if state is None or state.user != request.user:
+        state = UserState(request.user)
+        request._user_state = state
+    return state
+
+
+def invalidate_user_state(kind, user_id):
+    """Сбрасывает закешированное множество пользователя."""
+
+    cache.delete(CACHE_KEY.format(kind=kind, user_id=user_id))
@@ -1,25 +1,38 @@
-from django.db.models import Sum
+from django.conf import settings
+from django.db.models import BooleanField, Value
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import views
 
-from rest_framework import permissions, status, viewsets
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from api.autocomplete import autocomplete_ingredients
+from api.cache import (cache_anonymous_feed, cache_catalog_response,
+                       etag_matches)
+from api.exports import (EXPORT_FORMATS, export_file_response,
+                         export_shopping_list, export_storage,
+                         shopping_list_etag, shopping_list_response)
 from api.filters import IngredientFilter, RecipeFilter
-from api.paginations import CustomPagePagination
+from api.fragments import fragments_enabled, render_recipes
+from api.paginations import (CustomPagePagination, FeedPagination,
+                             SubscriptionPagination)
+from api.pantry import pantry_index
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (
-    CustomUserSerializer, IngredientDetailSerializer, RecipeCreateSerializer,
-    RecipeListSerializer, RecipeSerializer, SubscriptionSerializer,
-    TagSerializer)
-from api.service import add_recipe, delete_recipe
-from recipes.models import (
-    Favorite, Ingredient, Recipe,
-    RecipeIngredients, ShoppingCart, Tag)
+    CookableRecipeSerializer, CustomUserSerializer, IngredientDetailSerializer,
+    RecipeCreateSerializer, RecipeListSerializer, RecipeSerializer,
+    SubscriptionSerializer, TagSerializer, TaskSerializer)
+from api.service import (add_recipe, attach_recipe_previews, change_recipes,
+                         delete_recipe)
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from tasks.models import Task
 from users.models import Subscribtion, User
 
 
@@ -28,6 +41,9 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    list = cache_catalog_response(viewsets.ReadOnlyModelViewSet.list)
+    retrieve = cache_catalog_response(viewsets.ReadOnlyModelViewSet.retrieve)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -37,6 +53,22 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    list = cache_catalog_response(viewsets.ReadOnlyModelViewSet.list)
+    retrieve = cache_catalog_response(viewsets.ReadOnlyModelViewSet.retrieve)
+
+    @action(detail=False, methods=('get',), filter_backends=())
+    @cache_catalog_response
+    def autocomplete(self, request):
+        query = request.query_params.get('name', '').strip()
+        limit = settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        try:
+            limit = min(int(request.query_params.get('limit', limit)), limit)
+        except ValueError:
+            pass
+        if not query or limit < 1:
+            return Response([])
+        return Response(autocomplete_ingredients(query, limit))
+
 
 class UserListViewSet(views.UserViewSet):
     queryset = User.objects.all()
@@ -71,10 +103,15 @@ class UserListViewSet(views.UserViewSet):
         permission_classes=(permissions.IsAuthenticated,),
     )
     def subscriptions(self, request):
-        authors = User.objects.filter(following__user=request.user)
-        paginator = PageNumberPagination()
-        paginator.page_size = 6
-        result_page = paginator.paginate_queryset(authors, request)
+        authors = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
+        paginator = SubscriptionPagination()
+        result_page = attach_recipe_previews(
+            paginator.paginate_queryset(authors, request), request
+        )
         serializer = SubscriptionSerializer(
             result_page,
             many=True,
@@ -100,9 +137,12 @@ class UserListViewSet(views.UserViewSet):
                 content = {'error': 'такая подписка уже существует.'}
                 return Response(content, status=status.HTTP_400_BAD_REQUEST)
             Subscribtion.objects.create(user=request.user, author=author)
-            follows = get_object_or_404(User, id=id)
+            author.is_subscribed = True
+            # Счётчик увеличил сигнал подписки одним UPDATE.
+            author.refresh_from_db(fields=('followers_count',))
+            attach_recipe_previews((author,), request)
             serializer = SubscriptionSerializer(
-                follows,
+                author,
                 context={'request': request}
             )
             return Response(
@@ -124,13 +164,49 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = CustomPagePagination
+    pagination_class = FeedPagination
+
+    def get_queryset(self):
+        return Recipe.objects.feed(self.request.user)
+
+    @cache_anonymous_feed
+    def list(self, request, *args, **kwargs):
+        """
+        Страница собирается из кешированных фрагментов рецептов,
+        если кеш фрагментов включён и ответ нужен в JSON.
+        """
+
+        if not fragments_enabled(request):
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        envelope = JSONRenderer().render(
+            self.get_paginated_response([]).data
+        )
+        head, tail = envelope.rsplit(b'[]', 1)
+        return HttpResponse(
+            head + render_recipes(
+                page, request, self.get_serializer_context()
+            ) + tail,
+            content_type='application/json',
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not fragments_enabled(request):
+            return super().retrieve(request, *args, **kwargs)
+        content = render_recipes(
+            [self.get_object()], request, self.get_serializer_context()
+        )
+        return HttpResponse(content[1:-1], content_type='application/json')
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrive'):
+        if self.action in ('list', 'retrieve', 'recommended'):
             return RecipeListSerializer
         if self.action in ('create', 'update', 'partial_update'):
             return RecipeCreateSerializer
+        if self.action == 'cookable':
+            return CookableRecipeSerializer
         return RecipeSerializer
 
     @action(
@@ -169,38 +245,130 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ShoppingCart,
         )
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path='favorite',
+    )
+    def favorite_batch(self, request):
+        return change_recipes(self, request, Favorite)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path='shopping_cart',
+    )
+    def shopping_cart_batch(self, request):
+        return change_recipes(self, request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def recommended(self, request):
+        """
+        Рекомендации по избранному и корзине: соседи рецептов заранее
+        посчитаны командой build_recommendations.
+        """
+
+        queryset = self.filter_queryset(
+            self.get_queryset().recommended(request.user)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        filter_backends=(),
+        pagination_class=CustomPagePagination,
+    )
+    def cookable(self, request):
+        """
+        Что приготовить из имеющихся ингредиентов (?ingredients=1,2,3):
+        рецепты по числу недостающих ингредиентов и времени приготовления.
+        """
+
+        try:
+            ingredient_ids = {
+                int(pk)
+                for value in request.query_params.getlist('ingredients')
+                for pk in value.split(',') if pk.strip()
+            }
+        except ValueError:
+            ingredient_ids = None
+        if not ingredient_ids:
+            content = {'error': 'укажите id ингредиентов в ingredients'}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        page = [
+            (int(recipe_id), int(missing)) for recipe_id, missing in
+            self.paginate_queryset(pantry_index.match(ingredient_ids))
+        ]
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        results = []
+        for recipe_id, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.missing_ingredients = missing
+                results.append(recipe)
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(permissions.IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart = ShoppingCart.objects.filter(
-            user=user
-        ).values_list('recipe_id', flat=True)
-
-        ingredients = RecipeIngredients.objects.filter(
-            recipe_id__in=shopping_cart
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount')).order_by('ingredient__name')
-
-        shopping_list_content = []
-
-        for ingredient in ingredients:
-            shopping_list_content.append(
-                f'{ingredient["ingredient__name"]}:'
-                + f' {ingredient["ingredient__measurement_unit"]},'
-                + f' {ingredient["amount"]}\n'
+        file_format = request.query_params.get('type', 'txt')
+        if file_format not in EXPORT_FORMATS:
+            content = {
+                'error': 'доступные форматы: ' + ', '.join(EXPORT_FORMATS)
+            }
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        run_async = request.query_params.get('async') == '1'
+        if not run_async and not etag_matches(
+            request, shopping_list_etag(request.user.id, file_format)
+        ):
+            # Размер списка важен, только если ответ не 304.
+            run_async = ShoppingListItem.objects.filter(
+                user=request.user
+            ).count() > settings.EXPORT_ASYNC_THRESHOLD
+        if run_async:
+            task = export_shopping_list.delay(
+                request.user.id, file_format, user=request.user
             )
+            content = {
+                'id': task.id,
+                'status': task.status,
+                'status_url': request.build_absolute_uri(
+                    reverse('api:tasks-detail', args=(task.id,))
+                ),
+            }
+            return Response(content, status=status.HTTP_202_ACCEPTED)
+        return shopping_list_response(request, file_format)
 
-        shopping_list_string = ''.join(shopping_list_content)
-        filename = 'shopping_list.txt'
 
-        response = HttpResponse(
-            shopping_list_string, content_type='text/plain'
-        )
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-        return response
+class TaskViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = TaskSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return Task.objects.filter(user=self.request.user)
+
+    @action(detail=True)
+    def download(self, request, pk=None):
+        """Файл результата задачи; чужие задачи не находятся (404)."""
+
+        task = self.get_object()
+        name = (task.result or {}).get('file')
+        if (task.status != Task.DONE or not name
+                or not export_storage.exists(name)):
+            raise NotFound('Файл задачи не найден.')
+        return export_file_response(name)
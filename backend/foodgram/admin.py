@@ -0,0 +1,100 @@
+from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from foodgram.db import estimate_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Число записей списка без фильтров берётся из статистики
+    PostgreSQL вместо COUNT(*) по всей таблице.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None:
+            return estimate
+        return super().count
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """Админка больших таблиц: без точного подсчёта всех строк."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+def is_email(value):
+    return '@' in value
+
+
+class InputFilter(admin.ListFilter):
+    """
+    Фильтр в виде поля ввода: боковая панель не перечисляет
+    всех пользователей или рецепты, как это делает фильтр по FK.
+    Значение ищется в связи field по первому из lookups, чья проверка
+    прошла (None — без проверки); не подошёл ни один — список пуст.
+    """
+
+    template = 'admin/input_filter.html'
+    parameter_name = None
+    placeholder = ''
+    field = None
+    lookups = ((str.isdigit, 'id'),)
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.value = params.pop(self.parameter_name, '').strip()
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def get_condition(self, value):
+        for check, lookup in self.lookups:
+            if check is None or check(value):
+                return Q(**{f'{self.field}__{lookup}': value})
+        return Q(pk__in=[])
+
+    def queryset(self, request, queryset):
+        if not self.value:
+            return queryset
+        return queryset.filter(self.get_condition(self.value))
+
+    def choices(self, changelist):
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value,
+            'placeholder': self.placeholder,
+            'hidden_params': [
+                (name, value) for name, value in changelist.params.items()
+                if name not in (self.parameter_name, PAGE_VAR)
+            ],
+        }
+
+
+class UserInputFilter(InputFilter):
+    """Пользователь по id, email или логину: поиск по уникальным индексам."""
+
+    placeholder = 'id, email или логин'
+    lookups = (
+        (str.isdigit, 'id'),
+        (is_email, 'email'),
+        (None, 'username'),
+    )
+
+
+class RecipeInputFilter(InputFilter):
+    """Рецепт по id или точному названию."""
+
+    placeholder = 'id или название'
+    lookups = (
+        (str.isdigit, 'id'),
+        (None, 'name'),
+    )
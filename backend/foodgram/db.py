@@ -0,0 +1,45 @@
+from django.db import connections
+
+# Ниже этого числа строк оценка неточна (у ни разу не
+# анализированной таблицы она 0), а COUNT(*) и так дешёвый.
+EXACT_COUNT_LIMIT = 10000
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк таблицы из статистики PostgreSQL (reltuples)
+    для запроса без условий; None, если оценку получить нельзя
+    или таблица меньше EXACT_COUNT_LIMIT строк.
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row and row[0] > EXACT_COUNT_LIMIT:
+        return row[0]
+    return None
+
+
+class CounterFieldsMixin:
+    """
+    Поля-счётчики из COUNTER_FIELDS меняются только UPDATE с F(),
+    поэтому сохранение существующей строки их не перезаписывает.
+    """
+
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            skipped = self.get_deferred_fields().union(self.COUNTER_FIELDS)
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
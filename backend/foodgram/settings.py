@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'tasks.apps.TasksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -75,6 +76,45 @@ DATABASES = {
     }
 }
 
+if os.getenv('USE_SQLITE', default=False) == 'True':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Кеш 'default' по умолчанию свой у каждого процесса. Кеши пользователей,
+# фрагментов и токенов включаются только при общем кеше, например
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# и CACHE_LOCATION=/var/tmp/foodgram_cache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    },
+    'catalog': {
+        'BACKEND': os.getenv(
+            'CATALOG_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': int(os.getenv('CATALOG_CACHE_TIMEOUT', 3600)),
+    },
+}
+
+# Версии справочников, ленты и корзин хранятся в БД (api.Version), чтобы
+# их сброс видели все процессы. Сколько секунд процесс использует
+# прочитанную версию, не обращаясь к БД: изменения из других процессов
+# видны с такой задержкой, свои — сразу. 0 — читать при каждом обращении.
+VERSION_LOCAL_TTL = float(os.getenv('VERSION_LOCAL_TTL', 1))
+
+# Сколько секунд браузер может не перепроверять ответы справочников.
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -108,6 +148,10 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Выгрузки списков покупок: вне MEDIA_ROOT, отдаются только их
+# владельцу через /api/tasks/<id>/download/.
+EXPORTS_ROOT = os.getenv('EXPORTS_ROOT', os.path.join(BASE_DIR, 'exports'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
@@ -121,7 +165,7 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 5,
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -146,3 +190,69 @@ DJOSER = {
         'user_list': ['rest_framework.permissions.IsAuthenticatedOrReadOnly'],
     }
 }
+
+# Время жизни (в секундах) кеша избранного, корзины и подписок пользователя
+# между запросами. 0 — только в пределах запроса; включать при общем кеше.
+USER_STATE_CACHE_TIMEOUT = int(os.getenv('USER_STATE_CACHE_TIMEOUT', 0))
+
+# Время жизни (в секундах) кеша JSON-фрагментов рецептов для ленты
+# и страницы рецепта. 0 — выключен; включать только при общем кеше,
+# иначе сброс в одном воркере не доходит до остальных.
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_TIMEOUT', 0)
+)
+
+# Кеш ленты рецептов для анонимных запросов: сколько секунд страница
+# свежая и сколько ещё отдаётся устаревшей, пока пересчитывается.
+# 0 — выключен; как и остальные кеши, включается явно.
+ANONYMOUS_FEED_CACHE_TTL = int(os.getenv('ANONYMOUS_FEED_CACHE_TTL', 0))
+ANONYMOUS_FEED_STALE_TTL = int(os.getenv('ANONYMOUS_FEED_STALE_TTL', 60))
+
+# Автодополнение ингредиентов: максимум выдачи и поиск по индексу в памяти
+# процесса вместо запроса к БД. Каталог меняется импортом, после которого
+# воркеры нужно перезапустить.
+INGREDIENT_AUTOCOMPLETE_LIMIT = 10
+INGREDIENT_AUTOCOMPLETE_IN_MEMORY = os.getenv(
+    'INGREDIENT_AUTOCOMPLETE_IN_MEMORY', default=False
+) == 'True'
+
+# Изображения рецептов: предельные размеры загрузки и WebP-миниатюры.
+IMAGE_MAX_SIDE = 8000
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_THUMBNAIL_WIDTHS = (160, 320, 640)
+IMAGE_THUMBNAIL_QUALITY = 80
+IMAGE_THUMBNAILS_ASYNC = os.getenv(
+    'IMAGE_THUMBNAILS_ASYNC', default=True
+) != 'False'
+
+# Список покупок с большим числом позиций выгружается в фоне (ответ 202).
+EXPORT_ASYNC_THRESHOLD = int(os.getenv('EXPORT_ASYNC_THRESHOLD', 500))
+
+# Кеш токенов аутентификации: сколько записей и сколько секунд хранить
+# в памяти процесса. 0 — выключен, каждый запрос проверяет токен в БД.
+# Выход и деактивация сбрасывают записи сразу в своём процессе, а с общим
+# кешем (AUTH_TOKEN_SHARED_CACHE) — сразу во всех; без него в остальных
+# процессах отозванный токен действует ещё до AUTH_TOKEN_CACHE_TTL секунд,
+# поэтому кеш включается явно, лучше вместе с общим.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 0))
+AUTH_TOKEN_SHARED_CACHE = os.getenv(
+    'AUTH_TOKEN_SHARED_CACHE', default=False
+) == 'True'
+
+# Подписанные JWT (заголовок Authorization: Bearer, выдача через
+# /api/auth/jwt/create/) проверяются без запросов к БД. Такой токен
+# нельзя отозвать, поэтому срок жизни короткий.
+AUTH_STATELESS_TOKENS = os.getenv(
+    'AUTH_STATELESS_TOKENS', default=False
+) == 'True'
+if AUTH_STATELESS_TOKENS:
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].append(
+        'api.authentication.StatelessJWTAuthentication'
+    )
+SIMPLE_JWT = {
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 5))
+    ),
+}
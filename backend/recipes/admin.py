@@ -1,30 +1,85 @@
 from django.contrib import admin
+
+from api.exports import invalidate_cart_versions
+from foodgram.admin import (EstimatedCountAdmin, RecipeInputFilter,
+                            UserInputFilter)
 from .models import (Ingredient, Tag, Recipe, RecipeIngredients,
-                     ShoppingCart, Favorite)
+                     ShoppingCart, ShoppingListItem, Favorite)
+
+
+class AuthorFilter(UserInputFilter):
+    title = 'автор'
+    parameter_name = 'author'
+    field = 'author'
+
+
+class UserFilter(UserInputFilter):
+    title = 'пользователь'
+    parameter_name = 'user'
+    field = 'user'
+
+
+class RecipeFilter(RecipeInputFilter):
+    title = 'рецепт'
+    parameter_name = 'recipe'
+    field = 'recipe'
 
 
 class IngredientInline(admin.TabularInline):
     model = RecipeIngredients
     extra = 3
     min_num = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient'
+        )
 
 
 class RecipeTagsInLine(admin.TabularInline):
     model = Recipe.tags.through
     extra = 1
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('recipe', 'tag')
+
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(EstimatedCountAdmin):
     list_display = ('name', 'author', 'get_favorites')
-    list_filter = ('author', 'name', 'tags')
-    search_fields = ('name', 'author', 'tags')
+    list_filter = (AuthorFilter, 'tags')
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username', 'author__email')
+    autocomplete_fields = ('author',)
     inlines = (IngredientInline, RecipeTagsInLine)
     empty_value_display = 'Не задано'
 
+    def save_related(self, request, form, formsets, change):
+        """
+        Ингредиенты из вставки переносятся в связь ingredients и в списки
+        покупок так же, как при правке рецепта через API.
+        """
+
+        recipe = form.instance
+        before = self.ingredient_amounts(recipe) if change else {}
+        super().save_related(request, form, formsets, change)
+        after = self.ingredient_amounts(recipe)
+        recipe.ingredients.set(after)
+        invalidate_cart_versions(
+            ShoppingListItem.objects.change_recipe(recipe, before, after)
+        )
+
+    @staticmethod
+    def ingredient_amounts(recipe):
+        return dict(recipe.recipe_ingredients.values_list(
+            'ingredient_id', 'amount'
+        ))
+
     def get_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
     get_favorites.short_description = 'Добавлено в избранное'
+    get_favorites.admin_order_field = 'favorites_count'
 
 
 @admin.register(Tag)
@@ -36,24 +91,28 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(EstimatedCountAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     search_fields = ('name', )
     empty_value_display = 'Не задано'
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(EstimatedCountAdmin):
     list_display = ('recipe', 'user')
-    list_filter = ('recipe', 'user')
-    search_fields = ('author', )
+    list_filter = (RecipeFilter, UserFilter)
+    list_select_related = ('recipe', 'user')
+    search_fields = ('recipe__name', 'user__username', 'user__email')
+    autocomplete_fields = ('recipe', 'user')
     empty_value_display = 'Не задано'
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(EstimatedCountAdmin):
     list_display = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-    search_fields = ('author', 'recipe')
+    list_filter = (UserFilter, RecipeFilter)
+    list_select_related = ('recipe', 'user')
+    search_fields = ('recipe__name', 'user__username', 'user__email')
+    autocomplete_fields = ('recipe', 'user')
     empty_value_display = 'Не задано'
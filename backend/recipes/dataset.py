@@ -0,0 +1,99 @@
+import base64
+import json
+import os
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.utils.dateparse import parse_datetime
+
+# Рецепт в наборе данных. Связи записаны естественными ключами (email
+# автора, слаг тега, название и единица ингредиента), поэтому набор
+# переносится между базами с разными id.
+SCHEMA = pa.schema([
+    ('name', pa.string()),
+    ('author', pa.string()),
+    ('text', pa.string()),
+    ('cooking_time', pa.int32()),
+    ('pub_date', pa.timestamp('us', tz='UTC')),
+    ('image', pa.string()),
+    ('image_data', pa.binary()),
+    ('tags', pa.list_(pa.string())),
+    ('ingredients', pa.list_(pa.struct([
+        ('name', pa.string()),
+        ('measurement_unit', pa.string()),
+        ('amount', pa.int32()),
+    ]))),
+])
+FORMATS = {
+    '.jsonl': 'jsonl',
+    '.json': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+
+def detect_format(path):
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def to_json(record):
+    """В JSON дата пишется в ISO 8601, а изображение — в base64."""
+
+    record = dict(record)
+    record['pub_date'] = record['pub_date'].isoformat()
+    if record.get('image_data') is not None:
+        record['image_data'] = base64.b64encode(
+            record['image_data']
+        ).decode()
+    return json.dumps(record, ensure_ascii=False)
+
+
+def from_json(line):
+    record = json.loads(line)
+    if record.get('pub_date'):
+        record['pub_date'] = parse_datetime(record['pub_date'])
+    if record.get('image_data'):
+        record['image_data'] = base64.b64decode(record['image_data'])
+    return record
+
+
+class DatasetWriter:
+    """Запись порций рецептов: строки JSONL или группы строк Parquet."""
+
+    def __init__(self, path, data_format):
+        self.data_format = data_format
+        if data_format == 'parquet':
+            self.file = pq.ParquetWriter(path, SCHEMA, compression='zstd')
+        else:
+            self.file = open(path, mode='w', encoding='utf-8')
+
+    def write(self, records):
+        if self.data_format == 'parquet':
+            self.file.write_table(pa.Table.from_pylist(records, SCHEMA))
+        else:
+            self.file.writelines(to_json(record) + '\n' for record in records)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_chunks(path, data_format, chunk_size):
+    """Порции по chunk_size рецептов, файл целиком не читается."""
+
+    if data_format == 'parquet':
+        for batch in pq.ParquetFile(path).iter_batches(chunk_size):
+            yield batch.to_pylist()
+        return
+    with open(path, mode='r', encoding='utf-8') as file:
+        lines = (line for line in file if line.strip())
+        while True:
+            chunk = [from_json(line) for line in islice(lines, chunk_size)]
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,157 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Favorite, Recipe, RecipeNeighbor, ShoppingCart
+
+BATCH_SIZE = 5000
+FAVORITE_WEIGHT = 1.0
+CART_WEIGHT = 0.5
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт похожих рецептов: косинусное сходство по совместному '
+        'появлению в избранном и корзинах пользователей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=20,
+            help='Сколько похожих рецептов хранить для каждого рецепта.',
+        )
+        parser.add_argument(
+            '--max-user-items',
+            type=int,
+            default=500,
+            help='Учитывать не больше стольких новейших рецептов '
+                 'одного пользователя.',
+        )
+        parser.add_argument(
+            '--chunk-pairs',
+            type=int,
+            default=5_000_000,
+            help='Сколько пар рецептов обрабатывать за один шаг.',
+        )
+
+    def load_interactions(self, max_user_items):
+        """
+        Разреженная матрица пользователь × рецепт в виде отсортированных
+        по пользователю массивов (пользователь, рецепт, вес).
+        """
+
+        users, recipes, weights = [], [], []
+        for model, weight in (
+            (Favorite, FAVORITE_WEIGHT), (ShoppingCart, CART_WEIGHT),
+        ):
+            pairs = np.array(
+                model.objects.values_list('user_id', 'recipe_id'),
+                dtype=np.int64,
+            ).reshape(-1, 2)
+            users.append(pairs[:, 0])
+            recipes.append(pairs[:, 1])
+            weights.append(np.full(len(pairs), weight))
+        keys, inverse = np.unique(
+            np.column_stack((np.concatenate(users), np.concatenate(recipes))),
+            axis=0, return_inverse=True,
+        )
+        weights = np.bincount(
+            inverse.ravel(), weights=np.concatenate(weights)
+        )
+        starts, lengths = self.groups(keys[:, 0])
+        rank = np.arange(len(keys)) - np.repeat(starts, lengths)
+        keep = np.repeat(lengths, lengths) - rank <= max_user_items
+        return keys[keep, 0], keys[keep, 1], weights[keep]
+
+    @staticmethod
+    def groups(sorted_values):
+        """Начала и длины групп одинаковых значений."""
+
+        if not len(sorted_values):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        starts = np.flatnonzero(np.r_[True, np.diff(sorted_values) != 0])
+        return starts, np.diff(np.r_[starts, len(sorted_values)])
+
+    def co_occurrence(self, users, items, weights, n_items, chunk_pairs):
+        """
+        Сумма w(u, a) * w(u, b) по пользователям для каждой пары
+        рецептов (a, b), ключ пары — a * n_items + b.
+        """
+
+        starts, lengths = self.groups(users)
+        sizes = lengths ** 2
+        chunk_ids = (np.cumsum(sizes) - sizes) // chunk_pairs
+        keys = np.empty(0, dtype=np.int64)
+        sums = np.empty(0)
+        for chunk_id in np.unique(chunk_ids):
+            chunk = chunk_ids == chunk_id
+            chunk_starts, chunk_lengths = starts[chunk], lengths[chunk]
+            pair_counts = chunk_lengths ** 2
+            offsets = np.cumsum(pair_counts) - pair_counts
+            step = np.arange(pair_counts.sum()) - np.repeat(
+                offsets, pair_counts
+            )
+            length = np.repeat(chunk_lengths, pair_counts)
+            base = np.repeat(chunk_starts, pair_counts)
+            first, second = base + step // length, base + step % length
+            different = first != second
+            first, second = first[different], second[different]
+            chunk_keys, inverse = np.unique(np.concatenate((
+                keys, items[first] * n_items + items[second]
+            )), return_inverse=True)
+            sums = np.bincount(
+                inverse, weights=np.concatenate((
+                    sums, weights[first] * weights[second]
+                ))
+            )
+            keys = chunk_keys
+        return keys, sums
+
+    def handle(self, *args, **options):
+        users, recipes, weights = self.load_interactions(
+            options['max_user_items']
+        )
+        recipe_ids, items = np.unique(recipes, return_inverse=True)
+        n_items = len(recipe_ids)
+        if not n_items:
+            RecipeNeighbor.objects.all().delete()
+            return 'Нет избранного и корзин: похожие рецепты очищены.'
+        norms = np.sqrt(
+            np.bincount(items, weights=weights ** 2, minlength=n_items)
+        )
+        keys, sums = self.co_occurrence(
+            users, items.astype(np.int64), weights, n_items,
+            options['chunk_pairs'],
+        )
+        first, second = keys // n_items, keys % n_items
+        scores = sums / (norms[first] * norms[second])
+        order = np.lexsort((-scores, first))
+        first, second, scores = first[order], second[order], scores[order]
+        starts, lengths = self.groups(first)
+        rank = np.arange(len(first)) - np.repeat(starts, lengths)
+        top = rank < options['top_k']
+        first, second, scores = first[top], second[top], scores[top]
+        with transaction.atomic():
+            existing = np.array(
+                Recipe.objects.values_list('id', flat=True), dtype=np.int64
+            )
+            alive = (np.isin(recipe_ids[first], existing)
+                     & np.isin(recipe_ids[second], existing))
+            RecipeNeighbor.objects.all().delete()
+            RecipeNeighbor.objects.bulk_create(
+                (RecipeNeighbor(
+                    recipe_id=recipe_id, neighbor_id=neighbor_id, score=score
+                ) for recipe_id, neighbor_id, score in zip(
+                    recipe_ids[first[alive]].tolist(),
+                    recipe_ids[second[alive]].tolist(),
+                    scores[alive].tolist(),
+                )),
+                batch_size=BATCH_SIZE,
+            )
+        return (
+            f'Похожие рецепты пересчитаны: {int(alive.sum())} пар '
+            f'для {len(np.unique(first[alive]))} рецептов.'
+        )
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from users.models import Subscribtion, User
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN ANALYZE горячих запросов API с проверкой, '
+        'что каждый из них использует индекс'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--allow-seqscan',
+            action='store_true',
+            help=(
+                'Не запрещать планировщику PostgreSQL последовательное '
+                'чтение. По умолчанию оно запрещено, чтобы на маленькой '
+                'базе проверялось наличие подходящего индекса.'
+            ),
+        )
+
+    def get_queries(self):
+        user = User.objects.order_by('id').first()
+        user_id = user.id if user else 1
+        recipe = Recipe.objects.order_by('id').first()
+        recipe_id = recipe.id if recipe else 1
+        tag = Tag.objects.order_by('id').first()
+        slug = tag.slug if tag else 'breakfast'
+        queries = {
+            'лента рецептов': Recipe.objects.order_by(
+                '-pub_date', '-id'
+            )[:6],
+            'рецепт в избранном': Favorite.objects.filter(
+                user_id=user_id, recipe_id=recipe_id
+            ),
+            'рецепт в корзине': ShoppingCart.objects.filter(
+                user_id=user_id, recipe_id=recipe_id
+            ),
+            'фильтр is_favorited': Recipe.objects.filter(
+                favorites__user_id=user_id
+            ).order_by('-pub_date', '-id')[:6],
+            'фильтр is_in_shopping_cart': Recipe.objects.filter(
+                shopping_cart__user_id=user_id
+            ).order_by('-pub_date', '-id')[:6],
+            'фильтр по тегу': Recipe.objects.filter(
+                tags__slug=slug
+            ).values('id'),
+            'список покупок': ShoppingListItem.objects.filter(
+                user_id=user_id
+            ),
+            'подписки': Subscribtion.objects.filter(user_id=user_id),
+        }
+        if connection.vendor == 'postgresql':
+            queries['поиск ингредиента'] = Ingredient.objects.filter(
+                name__istartswith='сах'
+            )
+        return queries
+
+    def explain(self, queryset, allow_seqscan):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        with transaction.atomic():
+            if not allow_seqscan:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain(analyze=True)
+
+    def uses_index(self, plan):
+        if connection.vendor == 'postgresql':
+            return 'Seq Scan' not in plan
+        return all(
+            'USING' in line for line in plan.splitlines() if 'SCAN' in line
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset in self.get_queries().items():
+            plan = self.explain(queryset, options['allow_seqscan'])
+            if self.uses_index(plan):
+                self.stdout.write(self.style.SUCCESS(f'[индекс] {name}'))
+            else:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'[без индекса] {name}'))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                'Запросы без индекса: ' + ', '.join(failed)
+            )
+        return 'Все горячие запросы используют индексы.'
@@ -0,0 +1,110 @@
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.dataset import DatasetWriter, detect_format
+from recipes.models import Recipe, RecipeIngredients
+
+RECIPE_FIELDS = (
+    'id', 'name', 'author__email', 'text', 'cooking_time', 'pub_date',
+    'image',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгрузка рецептов с ингредиентами, тегами и изображениями '
+        'в JSONL или Parquet'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .parquet.')
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'parquet'),
+            help='Формат, если он не следует из расширения файла.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько рецептов читать из БД за раз.',
+        )
+        parser.add_argument(
+            '--images',
+            action='store_true',
+            help='Включить в выгрузку содержимое файлов изображений.',
+        )
+
+    def records(self, rows, with_images):
+        """
+        Записи набора данных для порции рецептов: теги и ингредиенты
+        всех рецептов порции читаются двумя запросами.
+        """
+
+        ids = [row[0] for row in rows]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredients.objects.filter(
+            recipe_id__in=ids
+        ).values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount',
+        ):
+            ingredients[recipe_id].append({
+                'name': name, 'measurement_unit': unit, 'amount': amount,
+            })
+        storage = Recipe._meta.get_field('image').storage
+        records = []
+        for pk, name, author, text, cooking_time, pub_date, image in rows:
+            image_data = None
+            if with_images and image:
+                try:
+                    with storage.open(image) as file:
+                        image_data = file.read()
+                except FileNotFoundError:
+                    self.stderr.write(f'Нет файла изображения {image}')
+            records.append({
+                'name': name,
+                'author': author,
+                'text': text,
+                'cooking_time': cooking_time,
+                'pub_date': pub_date,
+                'image': image,
+                'image_data': image_data,
+                'tags': tags[pk],
+                'ingredients': ingredients[pk],
+            })
+        return records
+
+    def handle(self, *args, **options):
+        data_format = options['format'] or detect_format(options['path'])
+        if data_format is None:
+            raise CommandError(
+                'Укажите --format или файл с расширением .jsonl/.parquet.'
+            )
+        chunk_size = options['chunk_size']
+        rows = Recipe.objects.order_by('id').values_list(
+            *RECIPE_FIELDS
+        ).iterator(chunk_size=chunk_size)
+        started = time.perf_counter()
+        written = 0
+        with DatasetWriter(options['path'], data_format) as writer:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                writer.write(self.records(chunk, options['images']))
+                written += len(chunk)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'  выгружено {written} рецептов, '
+                    f'{written / elapsed if elapsed else 0:.0f} в секунду'
+                )
+        return f'Выгружено рецептов: {written} в {options["path"]}.'
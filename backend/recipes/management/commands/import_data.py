@@ -1,38 +1,227 @@
 import csv
+import io
+import json
+import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import CATALOG_VERSION_KEY, invalidate_versions
+from api.tasks import schedule_catalog_warmup
 from recipes.models import Ingredient
 
 ModelsCSV = {
     Ingredient: 'ingredients.csv',
 }
 
-EXPECTED_HEADER = ['name', 'measurement_unit']
+# Загружаемые поля и поля, по которым строка считается уже существующей.
+IMPORT_FIELDS = {
+    Ingredient: ('name', 'measurement_unit'),
+}
+CONFLICT_FIELDS = {
+    Ingredient: ('name', 'measurement_unit'),
+}
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file, fields):
+    reader = csv.DictReader(file)
+    if not set(fields) <= set(reader.fieldnames or ()):
+        raise CommandError(
+            'Неверный формат файла: неправильные заголовки полей.'
+        )
+    for row in reader:
+        yield row
+
+
+def read_json(file, fields):
+    """
+    Объекты из JSON-массива или JSON Lines по одному, не загружая
+    файл целиком.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if not buffer:
+            if eof:
+                return
+            chunk = file.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        try:
+            row, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Неверный формат JSON-файла.')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        if not isinstance(row, dict):
+            raise CommandError('Ожидаются JSON-объекты с полями модели.')
+        yield row
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+    '.jsonl': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из csv файлов'
+    help = (
+        'Импорт справочников из csv/json файлов: новые строки добавляются, '
+        'существующие и связанные с ними рецепты не затрагиваются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir',
+            default=os.path.join(settings.BASE_DIR, 'data'),
+            help='Каталог с файлами из ModelsCSV.',
+        )
+        parser.add_argument(
+            '--file',
+            help='Файл вместо указанного в ModelsCSV (csv, json, jsonl).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Сколько строк отправлять в БД за раз.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Посчитать новые строки и откатить транзакцию.',
+        )
+
+    def read_rows(self, path, fields):
+        """Кортежи значений полей без пробелов по краям и пустых строк."""
+
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        with open(path, mode='r', encoding='utf-8', newline='') as file:
+            for row in reader(file, fields):
+                values = tuple(str(row.get(field) or '').strip()
+                               for field in fields)
+                if all(values):
+                    yield values
+
+    def batches(self, rows, batch_size):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def report(self, read, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  прочитано {read} строк, '
+            f'{read / elapsed if elapsed else 0:.0f} строк/с'
+        )
+
+    def load_postgresql(self, model, batches, started):
+        """
+        COPY порциями во временную таблицу, затем одна вставка
+        INSERT ... SELECT ... ON CONFLICT в основную.
+        """
+
+        fields = IMPORT_FIELDS[model]
+        conflict = CONFLICT_FIELDS[model]
+        table = model._meta.db_table
+        staging = f'import_{table}'
+        columns = ', '.join(fields)
+        update = [field for field in fields if field not in conflict]
+        read = 0
+        with connection.cursor() as cursor:
+            definitions = ', '.join(
+                f'{field} {model._meta.get_field(field).db_type(connection)}'
+                for field in fields
+            )
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging} ({definitions}) ON COMMIT DROP'
+            )
+            for batch in batches:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+                read += len(batch)
+                self.report(read, started)
+            action = 'DO NOTHING'
+            if update:
+                action = 'DO UPDATE SET ' + ', '.join(
+                    f'{field} = EXCLUDED.{field}' for field in update
+                )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON ({", ".join(conflict)}) {columns} '
+                f'FROM {staging} '
+                f'ON CONFLICT ({", ".join(conflict)}) {action}'
+            )
+            written = cursor.rowcount
+            # ON COMMIT DROP не сработает, если импорт идёт внутри
+            # внешней транзакции: второй импорт в ней не создал бы таблицу.
+            cursor.execute(f'DROP TABLE {staging}')
+            return read, written
+
+    def load_batched(self, model, batches, started):
+        """Для остальных СУБД: bulk_create порциями с пропуском дублей."""
+
+        fields = IMPORT_FIELDS[model]
+        before = model.objects.count()
+        read = 0
+        for batch in batches:
+            model.objects.bulk_create(
+                (model(**dict(zip(fields, values))) for values in batch),
+                batch_size=len(batch),
+                ignore_conflicts=True,
+            )
+            read += len(batch)
+            self.report(read, started)
+        return read, model.objects.count() - before
 
     def handle(self, *args, **options):
-        for model, csv_files in ModelsCSV.items():
-            model.objects.all().delete()
-            path_to_file = (f'{settings.BASE_DIR}/data/ingredients.csv')
-            print(f'Начат импорт данных из файла {path_to_file}')
-            with open(
-                path_to_file,
-                mode='r',
-                encoding='utf-8',
-            ) as csv_file:
-                reader = csv.DictReader(csv_file)
-
-                header = reader.fieldnames
-                if header != EXPECTED_HEADER:
-                    raise ValueError(
-                        'Неверный формат файла: неправильные заголовки полей.')
-
-                model.objects.bulk_create(model(**data) for data in reader)
+        load = (
+            self.load_postgresql if connection.vendor == 'postgresql'
+            else self.load_batched
+        )
+        for model, file_name in ModelsCSV.items():
+            path = options['file'] or os.path.join(
+                options['data_dir'], file_name
+            )
+            self.stdout.write(f'Начат импорт данных из файла {path}')
+            started = time.perf_counter()
+            rows = self.read_rows(path, IMPORT_FIELDS[model])
+            with transaction.atomic():
+                read, written = load(
+                    model, self.batches(rows, options['batch_size']), started
+                )
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+            elapsed = time.perf_counter() - started
             self.stdout.write(
-                f'Завершен импорт данных в модель {model.__name__}'
+                f'{model.__name__}: прочитано {read}, '
+                f'{"будет записано" if options["dry_run"] else "записано"} '
+                f'{written} за {elapsed:.1f} с'
             )
-            return 'Импорт всех данных завершен.'
+        if options['dry_run']:
+            return 'Пробный импорт завершен, изменения отменены.'
+        invalidate_versions((CATALOG_VERSION_KEY,))
+        schedule_catalog_warmup()
+        return 'Импорт всех данных завершен.'
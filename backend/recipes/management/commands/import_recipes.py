@@ -0,0 +1,297 @@
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from api.cache import (CATALOG_VERSION_KEY, FEED_VERSION_KEY,
+                       invalidate_versions)
+from api.counters import change_counters
+from api.images import schedule_thumbnails
+from api.pantry import PANTRY_VERSION_KEY
+from recipes.dataset import detect_format, read_chunks
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+def resolve_ingredients(keys):
+    """
+    id ингредиентов по (название, единица) одним запросом;
+    недостающие создаются.
+    """
+
+    def find(keys):
+        return {
+            (name, unit): pk for pk, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in keys}
+            ).values_list('id', 'name', 'measurement_unit')
+            if (name, unit) in keys
+        }
+
+    found = find(keys)
+    missing = keys - found.keys()
+    if missing:
+        # Общий порядок вставки: параллельные порции не ждут друг друга
+        # по кругу на уникальном индексе.
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=unit)
+             for name, unit in sorted(missing)),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        found.update(find(missing))
+    return found, len(missing)
+
+
+def save_image(storage, record):
+    """Имя файла изображения; переданное содержимое сохраняется."""
+
+    if not record.get('image_data'):
+        return record.get('image') or ''
+    name = os.path.basename(record.get('image') or '') or 'image.jpg'
+    return storage.save(f'images/{name}', ContentFile(record['image_data']))
+
+
+def import_chunk(records, default_author):
+    """
+    Порция рецептов в одной транзакции: авторы, теги и ингредиенты
+    разрешаются пачкой, строки пишутся bulk_create. Рецепты с уже
+    занятыми названиями пропускаются.
+    """
+
+    stats = Counter(read=len(records))
+    records = list({record['name']: record for record in records}.values())
+    for record in records:
+        record['tags'] = record.get('tags') or []
+        record['ingredients'] = record.get('ingredients') or []
+    stats['skipped'] += stats['read'] - len(records)
+    storage = Recipe._meta.get_field('image').storage
+    new_images = set()
+    with transaction.atomic():
+        existing = set(Recipe.objects.filter(
+            name__in=[record['name'] for record in records]
+        ).values_list('name', flat=True))
+        authors = dict(User.objects.filter(
+            email__in={record['author'] for record in records}
+        ).values_list('email', 'id'))
+        accepted = []
+        for record in records:
+            author = authors.get(record['author'], default_author)
+            if record['name'] in existing or author is None:
+                stats['skipped'] += 1
+                continue
+            accepted.append((author, record))
+        # Ингредиенты пропущенных рецептов в справочник не попадают.
+        tags = dict(Tag.objects.filter(slug__in={
+            slug for _, record in accepted for slug in record['tags']
+        }).values_list('slug', 'id'))
+        ingredients, stats['new_ingredients'] = resolve_ingredients({
+            (item['name'], item['measurement_unit'])
+            for _, record in accepted for item in record['ingredients']
+        })
+        recipes = []
+        for author, record in accepted:
+            image = save_image(storage, record)
+            if record.get('image_data'):
+                new_images.add(image)
+            recipes.append((Recipe(
+                name=record['name'],
+                author_id=author,
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=image,
+            ), record))
+        Recipe.objects.bulk_create(
+            (recipe for recipe, _ in recipes), batch_size=BATCH_SIZE
+        )
+        ids = dict(Recipe.objects.filter(
+            name__in=[recipe.name for recipe, _ in recipes]
+        ).values_list('name', 'id'))
+        recipe_tags, recipe_ingredients, dated = [], [], []
+        for recipe, record in recipes:
+            recipe_id = ids[recipe.name]
+            recipe.id = recipe_id
+            if record.get('pub_date'):
+                recipe.pub_date = record['pub_date']
+                dated.append(recipe)
+            for slug in record['tags']:
+                if slug not in tags:
+                    stats['unknown_tags'] += 1
+                    continue
+                recipe_tags.append(Recipe.tags.through(
+                    recipe_id=recipe_id, tag_id=tags[slug]
+                ))
+            for item in record['ingredients']:
+                recipe_ingredients.append(RecipeIngredients(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredients[
+                        (item['name'], item['measurement_unit'])
+                    ],
+                    amount=item['amount'],
+                ))
+        Recipe.tags.through.objects.bulk_create(
+            recipe_tags, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        RecipeIngredients.objects.bulk_create(
+            recipe_ingredients, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            (Recipe.ingredients.through(
+                recipe_id=item.recipe_id, ingredient_id=item.ingredient_id
+            ) for item in recipe_ingredients),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # auto_now_add подставил текущее время: даты из набора
+        # записываются отдельно.
+        Recipe.objects.bulk_update(dated, ('pub_date',), batch_size=BATCH_SIZE)
+        # Сигналы bulk_create не вызывает: счётчики рецептов авторов
+        # сдвигаются здесь, по одному UPDATE на каждое значение сдвига.
+        by_delta = {}
+        for author, count in Counter(
+            recipe.author_id for recipe, _ in recipes
+        ).items():
+            by_delta.setdefault(count, []).append(author)
+        for delta, author_ids in by_delta.items():
+            change_counters(Recipe, author_ids, delta)
+    for name in new_images:
+        schedule_thumbnails(name)
+    stats['created'] = len(recipes)
+    return stats
+
+
+def init_worker():
+    """Настройка Django в процессе, запущенном не через fork."""
+
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузка рецептов с ингредиентами, тегами и изображениями '
+        'из JSONL или Parquet'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .parquet.')
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'parquet'),
+            help='Формат, если он не следует из расширения файла.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько рецептов записывать в одной транзакции.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help=(
+                'Число процессов записи. По умолчанию по числу ядер '
+                'для PostgreSQL и один процесс для остальных СУБД.'
+            ),
+        )
+        parser.add_argument(
+            '--default-author',
+            help='Email автора для рецептов, автора которых нет в БД; '
+                 'без него такие рецепты пропускаются.',
+        )
+
+    def collect(self, totals, stats, started):
+        totals.update(stats)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  прочитано {totals["read"]}, создано {totals["created"]}, '
+            f'{totals["created"] / elapsed if elapsed else 0:.0f} '
+            f'рецептов/с'
+        )
+
+    def run_parallel(self, chunks, workers, default_author, totals,
+                     started):
+        """
+        Порции раздаются процессам, в очереди их не больше двух на
+        процесс, поэтому память не растёт с размером файла.
+        """
+
+        # Дочерние процессы не должны унаследовать открытое соединение.
+        connections.close_all()
+        with ProcessPoolExecutor(workers, initializer=init_worker) as pool:
+            pending = {}
+            for chunk in chunks:
+                if len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.finish(future, pending.pop(future), totals,
+                                    started)
+                pending[pool.submit(
+                    import_chunk, chunk, default_author
+                )] = len(chunk)
+            for future in wait(pending).done:
+                self.finish(future, pending[future], totals, started)
+
+    def finish(self, future, size, totals, started):
+        error = future.exception()
+        if error is None:
+            self.collect(totals, future.result(), started)
+            return
+        self.stderr.write(f'Порция из {size} рецептов не загружена: {error}')
+        self.collect(totals, Counter(read=size, failed=size), started)
+
+    def handle(self, *args, **options):
+        data_format = options['format'] or detect_format(options['path'])
+        if data_format is None:
+            raise CommandError(
+                'Укажите --format или файл с расширением .jsonl/.parquet.'
+            )
+        default_author = None
+        if options['default_author']:
+            default_author = User.objects.filter(
+                email=options['default_author']
+            ).values_list('id', flat=True).first()
+            if default_author is None:
+                raise CommandError(
+                    f'Пользователь {options["default_author"]} не найден.'
+                )
+        workers = options['workers'] or (
+            os.cpu_count() if connection.vendor == 'postgresql' else 1
+        )
+        chunks = read_chunks(
+            options['path'], data_format, options['chunk_size']
+        )
+        totals = Counter()
+        started = time.perf_counter()
+        if workers > 1:
+            self.run_parallel(
+                chunks, workers, default_author, totals, started
+            )
+        else:
+            for chunk in chunks:
+                self.collect(
+                    totals, import_chunk(chunk, default_author), started
+                )
+        # Версии хранятся в БД (api.Version), поэтому сброс из процесса
+        # команды видят и веб-процессы, и воркер.
+        if totals['created']:
+            invalidate_versions((FEED_VERSION_KEY, PANTRY_VERSION_KEY))
+        if totals['new_ingredients']:
+            invalidate_versions((CATALOG_VERSION_KEY,))
+        if totals['unknown_tags']:
+            self.stderr.write(
+                f'Пропущено связей с неизвестными тегами: '
+                f'{totals["unknown_tags"]}'
+            )
+        if totals['failed']:
+            self.stderr.write(f'Не загружено рецептов: {totals["failed"]}')
+        return (
+            f'Загружено рецептов: {totals["created"]}, '
+            f'пропущено: {totals["skipped"]}, '
+            f'новых ингредиентов: {totals["new_ingredients"]}.'
+        )
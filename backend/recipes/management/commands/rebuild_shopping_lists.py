@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Пересборка и проверка агрегированных списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить таблицу с агрегацией по корзинам.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify()
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=total,
+                ) for user_id, ingredient_id, total
+                    in ShoppingListItem.objects.live().iterator()),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(
+            f'Списки покупок пересобраны: '
+            f'{ShoppingListItem.objects.count()} позиций.'
+        )
+        return self.verify()
+
+    def verify(self):
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in ShoppingListItem.objects.live().iterator()
+        }
+        stored = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            ).iterator()
+        }
+        mismatched = [
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        ]
+        for user_id, ingredient_id in mismatched[:20]:
+            self.stderr.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected.get((user_id, ingredient_id))}, '
+                f'в таблице {stored.get((user_id, ingredient_id))}'
+            )
+        if mismatched:
+            raise CommandError(
+                f'Расхождений в списках покупок: {len(mismatched)}.'
+            )
+        return 'Списки покупок совпадают с корзинами.'
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscribtion, User
+
+# Модель со счётчиком, поле счётчика, модель-связь и её внешний ключ.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribtion, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Сверка счётчиков избранного, рецептов и подписчиков с таблицами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправлять.',
+        )
+
+    @staticmethod
+    def actual(related_model, foreign_key):
+        """Фактическое число связанных строк, коррелированный подзапрос."""
+
+        return Coalesce(Subquery(
+            related_model.objects.filter(
+                **{foreign_key: OuterRef('pk')}
+            ).order_by().values(foreign_key).annotate(
+                total=Count('pk')
+            ).values('total')
+        ), 0)
+
+    def handle(self, *args, **options):
+        fixed = 0
+        for model, field, related_model, foreign_key in COUNTERS:
+            drifted = model.objects.exclude(
+                **{field: self.actual(related_model, foreign_key)}
+            )
+            for pk, stored, total in drifted.annotate(
+                actual=self.actual(related_model, foreign_key)
+            ).values_list('pk', field, 'actual')[:20]:
+                self.stderr.write(
+                    f'{model._meta.verbose_name} {pk}: {field} = '
+                    f'{stored}, фактически {total}'
+                )
+            if options['dry_run']:
+                count = drifted.count()
+            else:
+                # Одна инструкция UPDATE ... SET поле = (подзапрос): число
+                # считается в момент записи, и параллельные изменения
+                # счётчика через F() не теряются, как при чтении и
+                # последующем bulk_update.
+                count = drifted.update(
+                    **{field: self.actual(related_model, foreign_key)}
+                )
+            self.stdout.write(
+                f'{model.__name__}.{field}: {count} расхождений.'
+            )
+            fixed += count
+        if options['dry_run'] or not fixed:
+            return f'Расхождений в счётчиках: {fixed}.'
+        return f'Исправлено счётчиков: {fixed}.'
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_shopping_lists(apps, schema_editor):
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, total_amount=total
+        ) for user_id, ingredient_id, total in RecipeIngredients.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values_list(
+            'recipe__shopping_cart__user_id', 'ingredient_id'
+        ).annotate(total=models.Sum('amount')).order_by().iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_auto_20240422_0617'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'позиция списка покупок',
+                'verbose_name_plural': 'Позиции списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(build_shopping_lists, migrations.RunPython.noop),
+    ]
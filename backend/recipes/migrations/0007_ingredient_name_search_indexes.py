@@ -0,0 +1,43 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:00
+
+from django.db import migrations
+
+CREATE_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_prefix_idx '
+    'ON recipes_ingredient (UPPER(name) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm_idx '
+    'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops)',
+)
+
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipes_ingredient_name_trgm_idx',
+    'DROP INDEX IF EXISTS recipes_ingredient_name_prefix_idx',
+)
+
+
+def run_postgresql(statements):
+    """
+    Индексы по UPPER(name) обслуживают istartswith и icontains,
+    которые Django переводит в UPPER(name) LIKE ...; только PostgreSQL.
+    """
+
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_postgresql(CREATE_INDEXES), run_postgresql(DROP_INDEXES)
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.16 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Без ограничения уникальности двойные клики оставляли дубликаты;
+    сохраняется самая ранняя запись. Если удалялись строки корзины,
+    агрегированные списки покупок пересчитываются.
+    """
+
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    removed_from_cart = 0
+    for model_name in ('Favorite', 'ShoppingCart'):
+        model = apps.get_model('recipes', model_name)
+        keep = model.objects.values('user_id', 'recipe_id').annotate(
+            first_id=models.Min('id')
+        ).values('first_id')
+        removed, _ = model.objects.exclude(id__in=keep).delete()
+        if model_name == 'ShoppingCart':
+            removed_from_cart = removed
+    if removed_from_cart:
+        ShoppingListItem.objects.all().delete()
+        ShoppingListItem.objects.bulk_create(
+            (ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total,
+            ) for user_id, ingredient_id, total
+                in RecipeIngredients.objects.filter(
+                    recipe__shopping_cart__isnull=False
+            ).values_list(
+                'recipe__shopping_cart__user_id', 'ingredient_id'
+            ).annotate(total=models.Sum('amount')).order_by().iterator()),
+            batch_size=5000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX recipes_recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipes_recipe_tags_tag_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,179 @@
+# Generated by Django 3.2.16 on 2026-10-18 15:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRESQL_CREATE = (
+    # Вектор собирается из названия (вес A), описания (B)
+    # и названий ингредиентов (C).
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector(
+        recipe_id bigint, name text, body text
+    ) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('russian', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(body, '')), 'B')
+            || setweight(to_tsvector('russian', coalesce((
+                SELECT string_agg(i.name, ' ')
+                FROM recipes_recipeingredients ri
+                JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+                WHERE ri.recipe_id = $1
+            ), '')), 'C')
+    $$ LANGUAGE sql STABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_trigger()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := recipes_recipe_search_vector(
+            NEW.id, NEW.name, NEW.text
+        );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search_update
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_trigger()
+    """,
+    # Ингредиенты пишутся bulk_create, поэтому триггер срабатывает
+    # один раз на оператор и пересчитывает затронутые рецепты.
+    """
+    CREATE OR REPLACE FUNCTION recipes_ingredients_search_trigger()
+    RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            UPDATE recipes_recipe r SET search_vector =
+                recipes_recipe_search_vector(r.id, r.name, r.text)
+            WHERE r.id IN (SELECT recipe_id FROM old_rows);
+        ELSE
+            UPDATE recipes_recipe r SET search_vector =
+                recipes_recipe_search_vector(r.id, r.name, r.text)
+            WHERE r.id IN (SELECT recipe_id FROM new_rows);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipes_ingredients_search_insert
+    AFTER INSERT ON recipes_recipeingredients
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredients_search_trigger()
+    """,
+    """
+    CREATE TRIGGER recipes_ingredients_search_update
+    AFTER UPDATE ON recipes_recipeingredients
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredients_search_trigger()
+    """,
+    """
+    CREATE TRIGGER recipes_ingredients_search_delete
+    AFTER DELETE ON recipes_recipeingredients
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredients_search_trigger()
+    """,
+    'UPDATE recipes_recipe SET search_vector = '
+    'recipes_recipe_search_vector(id, name, text)',
+    'CREATE INDEX recipes_recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+
+POSTGRESQL_DROP = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx',
+    'DROP TRIGGER IF EXISTS recipes_ingredients_search_delete '
+    'ON recipes_recipeingredients',
+    'DROP TRIGGER IF EXISTS recipes_ingredients_search_update '
+    'ON recipes_recipeingredients',
+    'DROP TRIGGER IF EXISTS recipes_ingredients_search_insert '
+    'ON recipes_recipeingredients',
+    'DROP FUNCTION IF EXISTS recipes_ingredients_search_trigger()',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_update ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector(bigint, text, text)',
+)
+
+SQLITE_INGREDIENTS = (
+    "(SELECT group_concat(i.name, ' ') "
+    'FROM recipes_recipeingredients ri '
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = {row}.recipe_id)'
+)
+
+SQLITE_CREATE = (
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+    "name, text, ingredients, tokenize = 'unicode61')",
+    'CREATE TRIGGER recipes_recipe_fts_insert AFTER INSERT ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients) '
+    "VALUES (new.id, new.name, new.text, ''); END",
+    'CREATE TRIGGER recipes_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON recipes_recipe '
+    'BEGIN UPDATE recipes_recipe_fts SET name = new.name, text = new.text '
+    'WHERE rowid = new.id; END',
+    'CREATE TRIGGER recipes_recipe_fts_delete AFTER DELETE ON recipes_recipe '
+    'BEGIN DELETE FROM recipes_recipe_fts WHERE rowid = old.id; END',
+    *(
+        f'CREATE TRIGGER recipes_ingredients_fts_{event.lower()} '
+        f'AFTER {event} ON recipes_recipeingredients '
+        'BEGIN UPDATE recipes_recipe_fts SET ingredients = '
+        f"coalesce({SQLITE_INGREDIENTS.format(row=row)}, '') "
+        f'WHERE rowid = {row}.recipe_id; END'
+        for event, row in (
+            ('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old'),
+        )
+    ),
+    'INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients) '
+    'SELECT r.id, r.name, r.text, coalesce(('
+    "SELECT group_concat(i.name, ' ') FROM recipes_recipeingredients ri "
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    "WHERE ri.recipe_id = r.id), '') FROM recipes_recipe r",
+)
+
+SQLITE_DROP = (
+    *(
+        f'DROP TRIGGER IF EXISTS recipes_ingredients_fts_{event}'
+        for event in ('insert', 'update', 'delete')
+    ),
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run_statements(postgresql, sqlite):
+    """
+    Поисковый индекс поддерживается триггерами в самой базе:
+    в PostgreSQL — колонка tsvector с GIN-индексом,
+    в SQLite — отдельная таблица FTS5.
+    """
+
+    def operation(apps, schema_editor):
+        statements = {
+            'postgresql': postgresql,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name='Поисковый вектор'
+            ),
+        ),
+        migrations.RunPython(
+            run_statements(POSTGRESQL_CREATE, SQLITE_CREATE),
+            run_statements(POSTGRESQL_DROP, SQLITE_DROP),
+        ),
+    ]
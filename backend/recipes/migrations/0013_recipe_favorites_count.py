@@ -0,0 +1,66 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# SQLite пересоздаёт таблицу при добавлении колонки, и триггеры
+# FTS5 на recipes_recipe из 0011 пропадают вместе со старой таблицей.
+SQLITE_TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert '
+    'AFTER INSERT ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients) '
+    "VALUES (new.id, new.name, new.text, ''); END",
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON recipes_recipe '
+    'BEGIN UPDATE recipes_recipe_fts SET name = new.name, text = new.text '
+    'WHERE rowid = new.id; END',
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete '
+    'AFTER DELETE ON recipes_recipe '
+    'BEGIN DELETE FROM recipes_recipe_fts WHERE rowid = old.id; END',
+)
+
+
+def fill_favorites_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Recipe.objects.update(favorites_count=Coalesce(Subquery(
+        Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0))
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SQLITE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipeneighbor'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            migrations.RunPython.noop, restore_search_triggers
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в избранное'),
+        ),
+        migrations.RunPython(
+            restore_search_triggers, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_favorites_count, migrations.RunPython.noop),
+    ]
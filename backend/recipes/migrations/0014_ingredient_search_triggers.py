@@ -0,0 +1,78 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:00
+
+from django.db import migrations
+
+# Названия ингредиентов входят в поисковый индекс рецептов, поэтому
+# переименование ингредиента пересчитывает индекс рецептов с ним.
+# Переходные таблицы нельзя объявить у триггера со списком колонок
+# (UPDATE OF name), поэтому изменение названия проверяется в функции.
+POSTGRESQL_CREATE = (
+    """
+    CREATE OR REPLACE FUNCTION recipes_ingredient_search_trigger()
+    RETURNS trigger AS $$
+    BEGIN
+        UPDATE recipes_recipe r SET search_vector =
+            recipes_recipe_search_vector(r.id, r.name, r.text)
+        WHERE r.id IN (
+            SELECT ri.recipe_id FROM recipes_recipeingredients ri
+            JOIN new_rows n ON n.id = ri.ingredient_id
+            JOIN old_rows o ON o.id = n.id
+            WHERE n.name IS DISTINCT FROM o.name
+        );
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipes_ingredient_search_update
+    AFTER UPDATE ON recipes_ingredient
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredient_search_trigger()
+    """,
+)
+
+POSTGRESQL_DROP = (
+    'DROP TRIGGER IF EXISTS recipes_ingredient_search_update '
+    'ON recipes_ingredient',
+    'DROP FUNCTION IF EXISTS recipes_ingredient_search_trigger()',
+)
+
+SQLITE_CREATE = (
+    'CREATE TRIGGER recipes_ingredient_fts_update '
+    'AFTER UPDATE OF name ON recipes_ingredient '
+    'BEGIN UPDATE recipes_recipe_fts SET ingredients = coalesce(('
+    "SELECT group_concat(i.name, ' ') FROM recipes_recipeingredients ri "
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    "WHERE ri.recipe_id = recipes_recipe_fts.rowid), '') "
+    'WHERE rowid IN (SELECT recipe_id FROM recipes_recipeingredients '
+    'WHERE ingredient_id = new.id); END',
+)
+
+SQLITE_DROP = (
+    'DROP TRIGGER IF EXISTS recipes_ingredient_fts_update',
+)
+
+
+def run_statements(postgresql, sqlite):
+    def operation(apps, schema_editor):
+        statements = {
+            'postgresql': postgresql,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements(POSTGRESQL_CREATE, SQLITE_CREATE),
+            run_statements(POSTGRESQL_DROP, SQLITE_DROP),
+        ),
+    ]
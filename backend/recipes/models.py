@@ -1,9 +1,22 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (BooleanField, Exists, F, FloatField, OuterRef,
+                              Prefetch, Q, Sum, Value)
+from django.db.models.expressions import RawSQL
+
+from foodgram.db import CounterFieldsMixin
+from recipes.storage import content_storage
+from users.models import Subscribtion
 
 User = get_user_model()
 
+SEARCH_CONFIG = 'russian'
+# Строк списка покупок в одном INSERT ... ON CONFLICT.
+UPSERT_BATCH_SIZE = 1000
+
 
 class Tag(models.Model):
     """Модель тега."""
@@ -59,7 +72,133 @@ class Ingredient(models.Model):
                 f'{self.measurement_unit}.')
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def feed(self, user):
+        """
+        Лента рецептов: автор, теги и ингредиенты загружаются заранее,
+        флаги текущего пользователя вычисляются подзапросами Exists.
+        """
+        queryset = self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+        if not user.is_authenticated:
+            false = Value(False, output_field=BooleanField())
+            return queryset.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false,
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Subscribtion.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def previews(self, author_ids, limit=None):
+        """
+        Последние рецепты авторов одним запросом: не больше limit
+        на автора, отбор через ROW_NUMBER() OVER (PARTITION BY author_id).
+        """
+
+        author_ids = list(author_ids)
+        if not author_ids:
+            return []
+        if limit is None:
+            return list(self.filter(author_id__in=author_ids).only(
+                'id', 'author_id', 'name', 'image', 'cooking_time'
+            ))
+        table = self.model._meta.db_table
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return list(self.raw(
+            f'SELECT id, author_id, name, image, cooking_time FROM ('
+            f'SELECT id, author_id, name, image, cooking_time, '
+            f'ROW_NUMBER() OVER (PARTITION BY author_id '
+            f'ORDER BY pub_date DESC, id DESC) AS position '
+            f'FROM {table} WHERE author_id IN ({placeholders})'
+            f') ranked WHERE position <= %s '
+            f'ORDER BY author_id, position',
+            [*author_ids, limit],
+        ))
+
+    def recommended(self, user):
+        """
+        Рецепты, похожие на избранное и корзину пользователя, по сумме
+        сходства из RecipeNeighbor; уже отмеченные и свои исключаются.
+        """
+
+        favorites = Favorite.objects.filter(user=user).values('recipe')
+        cart = ShoppingCart.objects.filter(user=user).values('recipe')
+        return self.filter(
+            Q(neighbor_of__recipe__in=favorites)
+            | Q(neighbor_of__recipe__in=cart)
+        ).exclude(
+            id__in=favorites
+        ).exclude(
+            id__in=cart
+        ).exclude(
+            author=user
+        ).annotate(
+            recommendation_score=Sum('neighbor_of__score')
+        ).order_by('-recommendation_score', '-pub_date', '-id')
+
+    def search(self, text):
+        """
+        Полнотекстовый поиск по названию, описанию и ингредиентам.
+        PostgreSQL: колонка search_vector (её поддерживают триггеры)
+        и ранжирование ts_rank; SQLite: таблица FTS5 и bm25.
+        """
+
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                text, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            return self.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-pub_date', '-id')
+        if connection.vendor == 'sqlite':
+            terms = ' '.join(
+                '"{}"*'.format(term.replace('"', ''))
+                for term in text.split()
+            )
+            if not terms:
+                return self
+            # bm25 меньше у более релевантных; совпадения отбираются
+            # подзапросом, поэтому пагинация видит их все.
+            table = self.model._meta.db_table
+            return self.filter(id__in=RawSQL(
+                'SELECT rowid FROM recipes_recipe_fts '
+                'WHERE recipes_recipe_fts MATCH %s', [terms]
+            )).annotate(rank=RawSQL(
+                'SELECT bm25(recipes_recipe_fts, 10.0, 5.0, 1.0) '
+                'FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s '
+                f'AND recipes_recipe_fts.rowid = {table}.id', [terms],
+                output_field=FloatField(),
+            )).order_by('rank', '-pub_date', '-id')
+        return self.filter(
+            Q(name__icontains=text)
+            | Q(text__icontains=text)
+            | Q(ingredients__name__icontains=text)
+        ).distinct()
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель рецепта."""
 
     name = models.CharField(
@@ -86,6 +225,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='images/',
+        storage=content_storage,
         blank=False
     )
     text = models.TextField(
@@ -100,15 +240,58 @@ class Recipe(models.Model):
         'Дата создания',
         auto_now_add=True,
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлено в избранное',
+        default=0,
+        editable=False,
+    )
+
+    COUNTER_FIELDS = ('favorites_count',)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(fields=('image',), name='recipe_image_idx'),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        recipe.remember_image()
+        return recipe
+
+    def remember_image(self):
+        """Запоминает имя картинки, сохранённое в БД."""
+
+        image = self.__dict__.get('image')
+        self._saved_image = getattr(image, 'name', image)
+
+    def image_changed(self):
+        """Картинка отличается от сохранённой или не загружалась из БД."""
+
+        saved = getattr(self, '_saved_image', None)
+        return saved is None or self.image.name != saved
+
 
 class RecipeIngredients(models.Model):
     """Модель количества ингредиентов в рецепте."""
@@ -162,6 +345,11 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = 'избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_favorite')
+        ]
 
     def __str__(self):
         return f'{self.recipe} добавлен в избранные пользователем {self.user}'
@@ -186,6 +374,164 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'список покупок'
         verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart')
+        ]
 
     def __str__(self):
         return f'Список покупок пользователя: {self.user}'
+
+
+class RecipeNeighbor(models.Model):
+    """Похожий рецепт, пересчитывается командой build_recommendations."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='neighbor_of',
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbor'],
+                name='unique_recipe_neighbor')
+        ]
+
+    def __str__(self):
+        return f'{self.neighbor} похож на {self.recipe}'
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """Набор запросов для агрегированного списка покупок."""
+
+    def apply(self, user_ids, deltas):
+        """
+        Прибавляет deltas ({id ингредиента: количество}) к спискам покупок
+        пользователей; отрицательные значения вычитаются, обнулившиеся
+        позиции удаляются. Позиции пишутся через INSERT ... ON CONFLICT
+        DO UPDATE: одновременно добавленная другим запросом позиция
+        суммируется, а не нарушает уникальность.
+        """
+
+        deltas = {key: value for key, value in deltas.items() if value}
+        if not deltas:
+            return
+        # Строки упорядочены, чтобы параллельные запросы блокировали
+        # их в одном порядке.
+        rows = [
+            (user_id, ingredient_id, deltas[ingredient_id])
+            for user_id in sorted(set(user_ids))
+            for ingredient_id in sorted(deltas)
+        ]
+        if not rows:
+            return
+        table = self.model._meta.db_table
+        # Точка сохранения не нужна: ошибку здесь никто не перехватывает,
+        # откатывается вся внешняя транзакция.
+        with transaction.atomic(using=self.db, savepoint=False):
+            with connections[self.db].cursor() as cursor:
+                for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                    batch = rows[start:start + UPSERT_BATCH_SIZE]
+                    values = ', '.join(['(%s, %s, %s)'] * len(batch))
+                    cursor.execute(
+                        f'INSERT INTO {table} '
+                        f'(user_id, ingredient_id, total_amount) '
+                        f'VALUES {values} '
+                        f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                        f'SET total_amount = '
+                        f'{table}.total_amount + EXCLUDED.total_amount',
+                        [value for row in batch for value in row],
+                    )
+            if min(deltas.values()) < 0:
+                self.filter(
+                    user_id__in={user_id for user_id, _, _ in rows},
+                    ingredient_id__in=deltas,
+                    total_amount__lte=0,
+                ).delete()
+
+    def add_recipes(self, user_ids, recipe_ids, sign=1):
+        """Добавляет (sign=-1 — убирает) ингредиенты рецептов."""
+
+        self.apply(user_ids, {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in RecipeIngredients.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('ingredient_id').annotate(
+                models.Sum('amount')
+            ).order_by()
+        })
+
+    def change_recipe(self, recipe, before, after):
+        """
+        Переносит смену ингредиентов рецепта ({id ингредиента: количество}
+        до и после) в списки покупок; возвращает id пользователей, у
+        которых рецепт в корзине.
+        """
+
+        deltas = dict(after)
+        for ingredient_id, amount in before.items():
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) - amount
+        user_ids = list(ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True))
+        self.apply(user_ids, deltas)
+        return user_ids
+
+    def live(self):
+        """Агрегация списков покупок по корзинам, как её хранит таблица."""
+
+        return RecipeIngredients.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values_list(
+            'recipe__shopping_cart__user_id', 'ingredient_id'
+        ).annotate(total=models.Sum('amount')).order_by()
+
+
+class ShoppingListItem(models.Model):
+    """
+    Сумма ингредиента по всем рецептам корзины пользователя.
+    Обновляется при изменении корзины и ингредиентов рецептов.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    total_amount = models.IntegerField(
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient}: {self.total_amount}'
@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DIGEST_SIZE = 16
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — BLAKE2-хеш его содержимого.
+    Одинаковые файлы хранятся один раз: повторная загрузка
+    возвращает имя уже существующего файла. Хеш, посчитанный при
+    чтении загрузки, передаётся в атрибуте content_digest файла.
+    """
+
+    chunk_size = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def get_digest(self, content):
+        digest = getattr(content, 'content_digest', None)
+        if digest:
+            return digest
+        digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        content.seek(0)
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        name = os.path.join(directory, f'{self.get_digest(content)}{ext}')
+        if self.exists(name):
+            return name
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            return name
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'created')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    raw_id_fields = ('user',)
+    empty_value_display = 'Не задано'
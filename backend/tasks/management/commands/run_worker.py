@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from tasks.models import Task
+from tasks.queue import execute
+
+PURGE_INTERVAL = 3600
+
+
+def run(task_obj):
+    try:
+        execute(task_obj)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых задач из очереди в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=300,
+            help=(
+                'Через сколько секунд незавершённая задача '
+                'снова станет доступной другим воркерам.'
+            ),
+        )
+        parser.add_argument(
+            '--keep-finished', type=int, default=7 * 24 * 3600,
+            help=(
+                'Сколько секунд хранить выполненные и упавшие задачи; '
+                '0 — не удалять.'
+            ),
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить доступные задачи и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Воркер запущен, потоков: {options["threads"]}.'
+        )
+        purged_at = 0
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            while True:
+                close_old_connections()
+                if (options['keep_finished'] > 0
+                        and time.monotonic() - purged_at > PURGE_INTERVAL):
+                    Task.objects.purge(options['keep_finished'])
+                    purged_at = time.monotonic()
+                claimed = Task.objects.claim(
+                    options['threads'], options['visibility_timeout']
+                )
+                if claimed:
+                    wait([pool.submit(run, task_obj) for task_obj in claimed])
+                    continue
+                if options['once']:
+                    return 'Очередь пуста.'
+                time.sleep(options['poll_interval'])
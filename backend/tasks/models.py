@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class TaskQuerySet(models.QuerySet):
+    """Набор запросов для очереди задач."""
+
+    def claim(self, limit, visibility_timeout):
+        """
+        Забирает до limit готовых к выполнению задач. Строки блокируются
+        через SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько
+        воркеров не получают одну задачу. Задача, не завершённая за
+        visibility_timeout секунд, снова становится доступной, пока не
+        исчерпаны попытки, затем помечается ошибкой.
+        """
+
+        now = timezone.now()
+        with transaction.atomic():
+            self.filter(
+                status=Task.RUNNING,
+                locked_until__lt=now,
+                attempts__gte=F('max_attempts'),
+            ).update(
+                status=Task.FAILED,
+                error='Превышено время выполнения на всех попытках.',
+            )
+            ids = list(self.select_for_update(skip_locked=True).filter(
+                Q(status=Task.PENDING, run_after__lte=now)
+                | Q(status=Task.RUNNING, locked_until__lt=now,
+                    attempts__lt=F('max_attempts'))
+            ).order_by('run_after').values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            self.filter(id__in=ids).update(
+                status=Task.RUNNING,
+                attempts=F('attempts') + 1,
+                locked_until=now + timedelta(seconds=visibility_timeout),
+            )
+        return list(self.filter(id__in=ids))
+
+    def purge(self, max_age):
+        """Удаляет выполненные и упавшие задачи старше max_age секунд."""
+
+        deleted, _ = self.filter(
+            status__in=(Task.DONE, Task.FAILED),
+            created__lt=timezone.now() - timedelta(seconds=max_age),
+        ).delete()
+        return deleted
+
+
+class Task(models.Model):
+    """Фоновая задача в очереди на базе таблицы."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Задача',
+    )
+    args = models.JSONField(
+        default=list,
+        verbose_name='Аргументы',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='tasks',
+        verbose_name='Пользователь',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попытки',
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=3,
+        verbose_name='Максимум попыток',
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Выполнить после',
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Заблокирована до',
+    )
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Результат',
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+    )
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=('status', 'run_after'),
+                name='task_status_run_after_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
@@ -0,0 +1,55 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.utils import timezone
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+RETRY_DELAY = 10
+
+
+def task(name, max_attempts=3):
+    """
+    Регистрирует функцию как фоновую задачу. Аргументы должны
+    сериализоваться в JSON; вызов func.delay(*args) ставит задачу в очередь.
+    """
+
+    def decorator(func):
+        def delay(*args, user=None):
+            return Task.objects.create(
+                name=name,
+                args=list(args),
+                user=user,
+                max_attempts=max_attempts,
+            )
+        func.delay = delay
+        registry[name] = func
+        return func
+    return decorator
+
+
+def execute(task_obj):
+    """Выполняет задачу и сохраняет результат или планирует повтор."""
+
+    try:
+        result = registry[task_obj.name](*task_obj.args)
+    except Exception:
+        logger.exception('Задача %s #%s', task_obj.name, task_obj.id)
+        task_obj.error = traceback.format_exc()
+        if task_obj.attempts < task_obj.max_attempts:
+            task_obj.status = Task.PENDING
+            task_obj.run_after = timezone.now() + timedelta(
+                seconds=RETRY_DELAY * 2 ** (task_obj.attempts - 1)
+            )
+        else:
+            task_obj.status = Task.FAILED
+        task_obj.save(update_fields=('status', 'run_after', 'error'))
+        return
+    task_obj.status = Task.DONE
+    task_obj.result = result
+    task_obj.save(update_fields=('status', 'result'))
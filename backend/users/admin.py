@@ -1,20 +1,39 @@
-
 from django.contrib import admin
 
+from foodgram.admin import EstimatedCountAdmin, UserInputFilter
 from .models import Subscribtion, User
 
 
+class AuthorFilter(UserInputFilter):
+    title = 'автор'
+    parameter_name = 'author'
+    field = 'author'
+
+
+class FollowerFilter(UserInputFilter):
+    title = 'подписчик'
+    parameter_name = 'user'
+    field = 'user'
+
+
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('first_name', 'last_name', 'username', 'email',)
-    list_filter = ('email', 'first_name', 'last_name')
-    search_fields = ('email', 'first_name', 'last_name')
+class UserAdmin(EstimatedCountAdmin):
+    list_display = (
+        'first_name', 'last_name', 'username', 'email',
+        'recipes_count', 'followers_count',
+    )
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('email', 'username', 'first_name', 'last_name')
     empty_value_display = 'Не задано'
 
 
 @admin.register(Subscribtion)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(EstimatedCountAdmin):
     list_display = ('author', 'user')
-    list_filter = ('author', 'user')
-    search_fields = ('author',)
+    list_filter = (AuthorFilter, FollowerFilter)
+    list_select_related = ('author', 'user')
+    search_fields = (
+        'author__username', 'author__email', 'user__username', 'user__email'
+    )
+    autocomplete_fields = ('author', 'user')
     empty_value_display = 'Не задано'
@@ -2,8 +2,10 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.db import models
 
+from foodgram.db import CounterFieldsMixin
 
-class User(AbstractUser):
+
+class User(CounterFieldsMixin, AbstractUser):
     """Кастомная модель пользователя."""
 
     email = models.EmailField(
@@ -29,7 +31,18 @@ class User(AbstractUser):
     password = models.CharField(
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False,
+    )
 
+    COUNTER_FIELDS = ('recipes_count', 'followers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 